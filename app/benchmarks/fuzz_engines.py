@@ -0,0 +1,540 @@
+"""
+Differential fuzz harness for the MRP engines.
+
+Random BOMs, GHP production rows and planned deliveries are run through a
+frozen copy of the original MRP netting algorithm and through every engine
+and incremental path of the planning core. Any difference fails the run;
+the failing case is shrunk to a small reproduction first. Engines on a
+non-uniform bucket calendar are checked against an oracle of their own,
+written out from the bucket start days. Every engine's
+speedup over the reference on the same inputs is reported at the end.
+
+Run from the ``app`` directory:
+
+    python benchmarks/fuzz_engines.py --cases 500 --seed 1
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from multiprocessing import shared_memory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.buckets import BucketCalendar
+from src.ghp import GHP
+from src.mrp import MRP, MRPTable
+from src.multisite import SCALAR_SITES, MultiSiteMRP
+from src.net_change import InventoryTransaction, NetChangeMRP
+from src.history import PlanState
+from src.session import PlanningSession
+from src.snapshot import SnapshotStore
+from src.shared_store import SharedPlanView, write_shared_plan
+
+
+class Case:
+    """One generated planning input. materials holds (name, parent, quantity_needed,
+    stock, production_time, production_capacity) with parents listed before children."""
+
+    def __init__(self, materials, production, table_size, planned_deliveries):
+        self.materials = materials
+        self.production = production
+        self.table_size = table_size
+        self.planned_deliveries = planned_deliveries
+
+    def build(self):
+        """ Return a fresh (BOM, GHP) pair for the case. """
+        bom = BOM()
+        by_name = {}
+        for name, parent, quantity_needed, stock, production_time, production_capacity in self.materials:
+            material = Material(name, parent, quantity_needed, stock, production_time, production_capacity)
+            if parent is not None:
+                by_name[parent].add_child(material)
+            bom.add_material(material)
+            by_name[name] = material
+        ghp_system = GHP(bom)
+        ghp_system.calculate_ghp([0] * self.table_size, list(self.production), self.table_size)
+        return bom, ghp_system
+
+    def deliveries(self):
+        """ Return a fresh copy of the planned deliveries. """
+        return {name: list(row) for name, row in self.planned_deliveries.items()}
+
+    def __repr__(self):
+        return (
+            f"Case(materials={self.materials!r},\n     production={self.production!r},\n"
+            f"     table_size={self.table_size!r},\n     planned_deliveries={self.planned_deliveries!r})"
+        )
+
+
+def generate_case(rng, max_items, max_periods):
+    """ Generate a random case. """
+    table_size = rng.randint(1, max_periods)
+    materials = [("m0", None, 0, rng.randint(0, 50), rng.randint(0, 4), 0)]
+    for i in range(1, rng.randint(2, max_items)):
+        parent = rng.choice(materials)[0]
+        materials.append((
+            f"m{i}",
+            parent,
+            rng.randint(1, 5),
+            rng.randint(0, 150),
+            rng.randint(0, 5),
+            rng.choice([0, rng.randint(1, 200)]),
+        ))
+    production = [rng.choice([0, 0, 0, rng.randint(1, 60)]) for _ in range(table_size)]
+    planned_deliveries = {}
+    for name, parent, *_ in materials[1:]:
+        if rng.random() < 0.3:
+            planned_deliveries[name] = [rng.choice([0, 0, 0, 0, rng.randint(1, 80)]) for _ in range(table_size)]
+    return Case(materials, production, table_size, planned_deliveries)
+
+
+def reference_calculate_mrp(case):
+    """
+    The original MRP.calculate_mrp netting rules, kept verbatim as the oracle: lead-time
+    offset of level 1 demand by the level 0 production time, the no-overlap release rule
+    and single-batch receipts.
+    """
+    bom, ghp_system = case.build()
+    table_size = case.table_size
+    planned_delivery = case.deliveries()
+    level_0_material = bom.level_0_material
+    mrp_tables = {}
+
+    ordered_materials = []
+    level = 0
+    while True:
+        materials_at_level = bom.get_materials_by_level(level)
+        if not materials_at_level:
+            break
+        ordered_materials.extend(materials_at_level)
+        level += 1
+
+    for material in ordered_materials:
+        if material.parent is None:
+            continue
+        mrp_table = MRPTable(material.name, table_size)
+        mrp_table.planned_delivery = planned_delivery.get(material.name, [0] * table_size)
+        if level_0_material and material.parent == level_0_material.name:
+            ghp_production = ghp_system.get_tables()["production"]
+            offset = level_0_material.production_time
+            mrp_table.demand = [
+                (ghp_production[i + offset] if i + offset < table_size else 0) * material.quantity_needed
+                for i in range(table_size)
+            ]
+        else:
+            parent_table = mrp_tables[material.parent]
+            mrp_table.demand = [parent_table.planned_order[i] * material.quantity_needed for i in range(table_size)]
+
+        for t in range(table_size):
+            if t == 0:
+                available = material.stock + mrp_table.planned_delivery[t] + mrp_table.planned_receipt[t] - mrp_table.demand[t]
+            else:
+                available = mrp_table.available[t - 1] + mrp_table.planned_delivery[t] + mrp_table.planned_receipt[t] - mrp_table.demand[t]
+            if available < 0:
+                mrp_table.net_requirement[t] = abs(available)
+                latest_planned_order_index = -1
+                for i in range(t, -1, -1):
+                    if mrp_table.planned_order[i] != 0:
+                        latest_planned_order_index = i
+                        break
+                if latest_planned_order_index == -1 or latest_planned_order_index + material.production_time <= t:
+                    release_time = max(0, t - material.production_time)
+                    if latest_planned_order_index != -1 and release_time < latest_planned_order_index + material.production_time:
+                        release_time = latest_planned_order_index + material.production_time
+                    mrp_table.planned_order[release_time] += material.production_capacity
+                    receipt_time = release_time + material.production_time
+                    if receipt_time < table_size:
+                        mrp_table.planned_receipt[receipt_time] += material.production_capacity
+            if t == 0:
+                available = material.stock + mrp_table.planned_delivery[t] + mrp_table.planned_receipt[t] - mrp_table.demand[t]
+            else:
+                available = mrp_table.available[t - 1] + mrp_table.planned_delivery[t] + mrp_table.planned_receipt[t] - mrp_table.demand[t]
+            mrp_table.available[t] = available
+        mrp_tables[material.name] = mrp_table
+    return tables_as_rows(mrp_tables)
+
+
+# Bucket lengths of the calendar engines, repeated over the horizon: days mixed with longer buckets
+BUCKET_PATTERN = (1, 1, 2, 1, 7, 3, 30)
+
+
+def bucket_lengths(table_size):
+    """ Return the non-uniform calendar of a case; shortening the horizon keeps its first buckets. """
+    return [BUCKET_PATTERN[i % len(BUCKET_PATTERN)] for i in range(table_size)]
+
+
+def reference_calendar_mrp(case):
+    """
+    The netting rules of reference_calculate_mrp on a non-uniform calendar, written out
+    from the bucket start days: a receipt lands in the first bucket starting once the
+    production time has elapsed since its release, and a release is offset to the bucket
+    containing the day the production time before its need begins.
+    """
+    bom, ghp_system = case.build()
+    table_size = case.table_size
+    planned_delivery = case.deliveries()
+    level_0_material = bom.level_0_material
+    starts = [sum(bucket_lengths(table_size)[:i]) for i in range(table_size)]
+
+    def receipt_bucket(release, time):
+        day = starts[release] + time
+        return next((i for i in range(table_size) if starts[i] >= day), table_size)
+
+    def release_bucket(need, time):
+        day = starts[need] - time
+        return max([i for i in range(table_size) if starts[i] <= day], default=0)
+
+    mrp_tables = {}
+    ordered_materials = []
+    level = 0
+    while True:
+        materials_at_level = bom.get_materials_by_level(level)
+        if not materials_at_level:
+            break
+        ordered_materials.extend(materials_at_level)
+        level += 1
+
+    for material in ordered_materials:
+        if material.parent is None:
+            continue
+        time = material.production_time
+        mrp_table = MRPTable(material.name, table_size)
+        mrp_table.planned_delivery = planned_delivery.get(material.name, [0] * table_size)
+        if level_0_material and material.parent == level_0_material.name:
+            ghp_production = ghp_system.get_tables()["production"]
+            offset = level_0_material.production_time
+            mrp_table.demand = [0] * table_size
+            for j in range(table_size):
+                if ghp_production[j] and starts[j] - offset >= 0:
+                    mrp_table.demand[release_bucket(j, offset)] += ghp_production[j] * material.quantity_needed
+        else:
+            parent_table = mrp_tables[material.parent]
+            mrp_table.demand = [parent_table.planned_order[i] * material.quantity_needed for i in range(table_size)]
+
+        for t in range(table_size):
+            previous = material.stock if t == 0 else mrp_table.available[t - 1]
+            available = previous + mrp_table.planned_delivery[t] + mrp_table.planned_receipt[t] - mrp_table.demand[t]
+            if available < 0:
+                mrp_table.net_requirement[t] = -available
+                latest = max([i for i in range(t + 1) if mrp_table.planned_order[i]], default=-1)
+                if latest == -1 or receipt_bucket(latest, time) <= t:
+                    release_time = release_bucket(t, time)
+                    if latest != -1:
+                        release_time = max(release_time, receipt_bucket(latest, time))
+                    mrp_table.planned_order[release_time] += material.production_capacity
+                    receipt_time = receipt_bucket(release_time, time)
+                    if receipt_time < table_size:
+                        mrp_table.planned_receipt[receipt_time] += material.production_capacity
+            mrp_table.available[t] = previous + mrp_table.planned_delivery[t] + mrp_table.planned_receipt[t] - mrp_table.demand[t]
+        mrp_tables[material.name] = mrp_table
+    return tables_as_rows(mrp_tables)
+
+
+def tables_as_rows(mrp_tables):
+    """ Normalize tables of any engine to {name: tuple of row tuples}. """
+    return {name: tuple(tuple(row) for row in table.rows()) for name, table in mrp_tables.items()}
+
+
+def run_mrp(case):
+    bom, ghp_system = case.build()
+    mrp_system = MRP(bom, ghp_system, case.table_size, case.deliveries())
+    mrp_system.calculate_mrp()
+    return tables_as_rows(mrp_system.mrp_tables)
+
+
+def run_session_cold(case):
+    bom, ghp_system = case.build()
+    mrp_system = MRP(bom, ghp_system, case.table_size, case.deliveries())
+    PlanningSession().recalculate(mrp_system)
+    return tables_as_rows(mrp_system.mrp_tables)
+
+
+def run_session_warm(case):
+    session = PlanningSession()
+    bom, ghp_system = case.build()
+    session.recalculate(MRP(bom, ghp_system, case.table_size, case.deliveries()))
+    # A rebuilt BOM with equal content must be answered from the cache
+    bom, ghp_system = case.build()
+    mrp_system = MRP(bom, ghp_system, case.table_size, case.deliveries())
+    session.recalculate(mrp_system)
+    return tables_as_rows(mrp_system.mrp_tables)
+
+
+def run_streaming(case):
+    bom, ghp_system = case.build()
+    mrp_system = MRP(bom, ghp_system, case.table_size, case.deliveries())
+    mrp_tables = {}
+    mrp_system.calculate_mrp_streaming(lambda table: mrp_tables.__setitem__(table.material_name, table))
+    return tables_as_rows(mrp_tables)
+
+
+def run_uniform_calendar(case):
+    bom, ghp_system = case.build()
+    calendar = BucketCalendar.uniform(case.table_size)
+    mrp_system = MRP(bom, ghp_system, case.table_size, case.deliveries(), calendar)
+    mrp_system.calculate_mrp()
+    return tables_as_rows(mrp_system.mrp_tables)
+
+
+def run_ghp_incremental(case):
+    # Enter the production cell by cell into an empty GHP, passing through extra demand
+    bom, calculated = case.build()
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp([0] * case.table_size, [0] * case.table_size, case.table_size)
+    for period, value in enumerate(case.production):
+        ghp_system.update_cell("demand", period, value)
+        ghp_system.update_cell("production", period, value)
+        ghp_system.update_cell("demand", period, 0)
+
+    # The incrementally shifted availability and its index must match a full calculation
+    tables = ghp_system.get_tables()
+    expected = calculated.get_tables()
+    if tables["availability"] != expected["availability"]:
+        raise AssertionError(f"GHP availability {tables['availability']} != {expected['availability']}")
+    if ghp_system.get_atp() != calculated.get_atp():
+        raise AssertionError(f"GHP ATP {ghp_system.get_atp()} != {calculated.get_atp()}")
+
+    mrp_system = MRP(bom, ghp_system, case.table_size, case.deliveries())
+    mrp_system.calculate_mrp()
+    for name, table in mrp_system.mrp_tables.items():
+        index = mrp_system.get_availability_index(name)
+        first_shortage = next((t for t, value in enumerate(table.available) if value < 0), None)
+        if index.values() != table.available or index.first_shortage() != first_shortage:
+            raise AssertionError(f"availability index of {name} disagrees with {table.available}")
+        if table.available and index.min_between(0, case.table_size - 1) != min(table.available):
+            raise AssertionError(f"minimum availability of {name} is wrong")
+    return tables_as_rows(mrp_system.mrp_tables)
+
+
+def run_tiered_calendar(case):
+    bom, ghp_system = case.build()
+    calendar = BucketCalendar(bucket_lengths(case.table_size))
+    mrp_system = MRP(bom, ghp_system, case.table_size, case.deliveries(), calendar)
+    mrp_system.calculate_mrp()
+    return tables_as_rows(mrp_system.mrp_tables)
+
+
+def run_shared_memory(case):
+    bom, ghp_system = case.build()
+    mrp_system = MRP(bom, ghp_system, case.table_size, case.deliveries())
+    mrp_system.calculate_mrp()
+    shm = write_shared_plan(mrp_system.mrp_tables, case.table_size)
+    block_name = shm.name
+    shm.close()
+
+    view = SharedPlanView(block_name)
+    rows = tables_as_rows(view.mrp_tables)
+    view.close()
+
+    # Attaching in the writer's process already dropped the writer's cleanup registration,
+    # so the block is unlinked through a handle of its own (as a separate reader would)
+    shm = shared_memory.SharedMemory(name=block_name)
+    shm.close()
+    shm.unlink()
+    return rows
+
+
+def run_net_change(case):
+    # Plan without deliveries, then post every delivery as a receipt transaction
+    bom, ghp_system = case.build()
+    mrp_system = MRP(bom, ghp_system, case.table_size, {})
+    net_change = NetChangeMRP(mrp_system)
+    for name, row in case.planned_deliveries.items():
+        for period, quantity in enumerate(row):
+            if quantity:
+                net_change.apply(InventoryTransaction(name, period, quantity, "receipt"))
+    return tables_as_rows(mrp_system.mrp_tables)
+
+
+def run_snapshot(case):
+    bom, _ = case.build()
+    state = PlanState.from_lists([0] * case.table_size, case.production, case.planned_deliveries)
+    snapshot = SnapshotStore().publish(bom, state, case.table_size)
+    return tables_as_rows(snapshot.calculate().mrp_tables)
+
+
+def run_multi_site(case, site_count=1, scalar_sites=0):
+    # scalar_sites=0 nets the sites with the array operations, however few they are
+    bom, _ = case.build()
+    sites = [f"site{i}" for i in range(site_count)]
+    mrp_system = MultiSiteMRP(
+        bom,
+        case.table_size,
+        sites,
+        production={site: case.production for site in sites},
+        stock={name: {site: stock for site in sites} for name, _, _, stock, *_ in case.materials},
+        planned_deliveries={name: {site: row for site in sites} for name, row in case.planned_deliveries.items()},
+        scalar_sites=scalar_sites,
+    )
+    mrp_system.calculate_mrp()
+
+    # Identical sites without lanes must each match a single-site run
+    tables = [tables_as_rows(mrp_system.site_tables(site)) for site in sites]
+    return next((rows for rows in tables[1:] if rows != tables[0]), tables[0])
+
+
+def run_multi_site_replicated(case):
+    return run_multi_site(case, site_count=3)
+
+
+def run_multi_site_per_site(case):
+    return run_multi_site(case, site_count=3, scalar_sites=SCALAR_SITES)
+
+
+# Engine name -> callable(case) returning normalized tables
+ENGINES = {
+    "mrp": run_mrp,
+    "session-cold": run_session_cold,
+    "session-warm": run_session_warm,
+    "streaming": run_streaming,
+    "uniform-calendar": run_uniform_calendar,
+    "tiered-calendar": run_tiered_calendar,
+    "ghp-incremental": run_ghp_incremental,
+    "shared-memory": run_shared_memory,
+    "net-change": run_net_change,
+    "snapshot": run_snapshot,
+    "multi-site": run_multi_site,
+    "multi-site-replicated": run_multi_site_replicated,
+    "multi-site-per-site": run_multi_site_per_site,
+}
+
+
+# Engines checked against another oracle than reference_calculate_mrp
+REFERENCES = {
+    "tiered-calendar": reference_calendar_mrp,
+}
+
+
+def reference_of(engine):
+    """ Return the oracle an engine is compared with. """
+    name = next((name for name, candidate in ENGINES.items() if candidate is engine), None)
+    return REFERENCES.get(name, reference_calculate_mrp)
+
+
+def run_engine(engine, case):
+    """ Run an engine on a case; an exception counts as a result which matches nothing. """
+    try:
+        return engine(case)
+    except Exception as e:
+        return f"raised {type(e).__name__}: {e}"
+
+
+def fails(engine, case):
+    """ Return a description of the difference between an engine and its reference, or None. """
+    expected = reference_of(engine)(case)
+    actual = run_engine(engine, case)
+    if actual == expected:
+        return None
+    if isinstance(actual, str):
+        return actual
+    for name in expected:
+        if actual.get(name) != expected[name]:
+            return f"table of {name} differs:\n  expected {expected[name]}\n  actual   {actual.get(name)}"
+    return f"unexpected tables {sorted(set(actual) - set(expected))}"
+
+
+def shrink_candidates(case):
+    """ Yield smaller variants of a case. """
+    # Remove a leaf material
+    parents = {parent for _, parent, *_ in case.materials}
+    for material in case.materials[1:]:
+        if material[0] not in parents:
+            materials = [m for m in case.materials if m is not material]
+            deliveries = {n: r for n, r in case.planned_deliveries.items() if n != material[0]}
+            yield Case(materials, case.production, case.table_size, deliveries)
+
+    # Shorten the horizon
+    if case.table_size > 1:
+        size = case.table_size - 1
+        deliveries = {n: r[:size] for n, r in case.planned_deliveries.items()}
+        yield Case(case.materials, case.production[:size], size, deliveries)
+
+    # Drop planned deliveries
+    for name in case.planned_deliveries:
+        deliveries = {n: r for n, r in case.planned_deliveries.items() if n != name}
+        yield Case(case.materials, case.production, case.table_size, deliveries)
+
+    # Zero production periods
+    for t, value in enumerate(case.production):
+        if value:
+            production = list(case.production)
+            production[t] = 0
+            yield Case(case.materials, production, case.table_size, case.planned_deliveries)
+
+    # Simplify material parameters
+    for index, material in enumerate(case.materials):
+        for field in range(2, 6):
+            if material[field] not in (0, 1):
+                simpler = list(material)
+                simpler[field] = 1 if field == 2 else 0
+                materials = list(case.materials)
+                materials[index] = tuple(simpler)
+                yield Case(materials, case.production, case.table_size, case.planned_deliveries)
+
+
+def shrink(engine, case):
+    """ Greedily reduce a failing case while it keeps failing. """
+    shrunk = True
+    while shrunk:
+        shrunk = False
+        for candidate in shrink_candidates(case):
+            if fails(engine, candidate):
+                case = candidate
+                shrunk = True
+                break
+    return case
+
+
+def best_time(function, cases, repeat):
+    """ Run a function over all cases repeat times; return its results and the fastest run in seconds. """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [function(case) for case in cases]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return results, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=300, help="number of random cases")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--max-items", type=int, default=12, help="maximum number of materials per BOM")
+    parser.add_argument("--max-periods", type=int, default=20, help="maximum number of periods")
+    parser.add_argument("--engine", action="append", choices=sorted(ENGINES), help="engines to test (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per engine; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    engines = {name: ENGINES[name] for name in (args.engine or ENGINES)}
+    cases = [generate_case(rng, args.max_items, args.max_periods) for _ in range(args.cases)]
+
+    expected, reference_time = best_time(reference_calculate_mrp, cases, args.repeat)
+
+    failed = False
+    timings = {}
+    for name, engine in engines.items():
+        results, timings[name] = best_time(lambda case: run_engine(engine, case), cases, args.repeat)
+
+        wanted_results = expected
+        if name in REFERENCES:
+            wanted_results = [REFERENCES[name](case) for case in cases]
+        for case, actual, wanted in zip(cases, results, wanted_results):
+            if actual != wanted:
+                failed = True
+                small = shrink(engine, case)
+                print(f"FAIL {name}: {fails(engine, small)}\nShrunk case:\n{small!r}\n")
+                break
+
+    print(f"{len(cases)} cases, reference {reference_time * 1000:.1f} ms")
+    for name, elapsed in timings.items():
+        print(f"  {name:<22} {elapsed * 1000:9.1f} ms  speedup {reference_time / elapsed:5.2f}x")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
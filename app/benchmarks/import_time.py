@@ -0,0 +1,74 @@
+"""
+Measure how long it takes a fresh interpreter to import the planning core.
+
+Run from the ``app`` directory:
+
+    python benchmarks/import_time.py
+
+Every measurement starts a new process, so the numbers include nothing
+cached by an earlier import. The script fails if the core pulls in a GUI
+library or NumPy, or if an import exceeds its budget.
+"""
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules which must never be loaded by the planning core
+FORBIDDEN_MODULES = ("tkinter", "ttkbootstrap", "tksheet", "PIL", "numpy")
+
+# Import statement -> budget in milliseconds (on top of the bare interpreter start)
+IMPORT_BUDGETS_MS = {
+    "import src": 5,
+    "from src import MRP": 30,
+    "from src.session import PlanningSession": 40,
+}
+
+REPEATS = 5
+
+MEASURE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = (time.perf_counter() - start) * 1000
+loaded = [name for name in {forbidden!r} if name in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(statement):
+    """ Return the best import time in ms over REPEATS fresh processes and the forbidden modules loaded. """
+    best = None
+    loaded = ""
+    for _ in range(REPEATS):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE.format(statement=statement, forbidden=FORBIDDEN_MODULES)],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split(" ", 1)
+        elapsed = float(output[0])
+        loaded = output[1].strip() if len(output) > 1 else ""
+        best = elapsed if best is None else min(best, elapsed)
+    return best, loaded
+
+
+def main():
+    failed = False
+    for statement, budget in IMPORT_BUDGETS_MS.items():
+        elapsed, loaded = measure(statement)
+        status = "ok"
+        if loaded:
+            status = f"FAIL (loaded {loaded})"
+            failed = True
+        elif elapsed > budget:
+            status = f"FAIL (budget {budget} ms)"
+            failed = True
+        print(f"{statement:<45} {elapsed:8.2f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
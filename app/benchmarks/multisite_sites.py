@@ -0,0 +1,124 @@
+"""
+Compare one MultiSiteMRP run with separate single-site MRP runs as the number
+of sites grows.
+
+Run from the ``app`` directory:
+
+    python benchmarks/multisite_sites.py --sites 1 10 100
+
+Every site gets its own GHP production over the same random BOM, without
+transfer lanes, so each site of the multi-site run must equal the
+single-site plan of that site. The array run costs a fixed number of array
+operations per period whatever the number of sites; with a handful of sites
+the single-site runs are faster, so MultiSiteMRP falls back to them below
+SCALAR_SITES sites. Both multi-site paths are timed, the "array" column with
+the fallback switched off; where they cross is the value SCALAR_SITES should
+have. The script fails on any difference.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.ghp import GHP
+from src.mrp import MRP
+from src.multisite import SCALAR_SITES, MultiSiteMRP
+
+
+def build_bom(rng, item_count):
+    """ Return a random BOM whose components hang below the first third of the items. """
+    bom = BOM()
+    root = Material(name="Product", stock=20, production_time=1)
+    bom.add_material(root)
+    materials = [root]
+    for i in range(item_count):
+        parent = rng.choice(materials[:max(1, len(materials) // 3)])
+        material = Material(
+            name=f"Item {i}", parent=parent.name, quantity_needed=rng.randint(1, 3), stock=rng.randint(0, 100),
+            production_time=rng.randint(1, 3), production_capacity=rng.randint(50, 300),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+    return bom
+
+
+def best_time(function, repeat):
+    """ Call a function repeat times; return its last result and the fastest call in seconds. """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def compare(bom, table_size, production, repeat):
+    """ Return (multi-site seconds, array seconds, single-site seconds, sites which differ). """
+    sites = list(production)
+    # Material.stock covers only the first site unless given for every site
+    stock = {material.name: {site: material.stock for site in sites} for material in bom.materials}
+
+    def multi_site(scalar_sites):
+        mrp_system = MultiSiteMRP(bom, table_size, sites, production, stock, scalar_sites=scalar_sites)
+        mrp_system.calculate_mrp()
+        return mrp_system
+
+    def single_site():
+        single_site_tables = {}
+        for site in sites:
+            ghp_system = GHP(bom)
+            ghp_system.calculate_ghp([0] * table_size, production[site], table_size)
+            mrp_system = MRP(bom, ghp_system, table_size, {})
+            mrp_system.calculate_mrp()
+            single_site_tables[site] = mrp_system.mrp_tables
+        return single_site_tables
+
+    mrp_system, multi_site_time = best_time(lambda: multi_site(SCALAR_SITES), repeat)
+    array_system, array_time = best_time(lambda: multi_site(0), repeat)
+    single_site_tables, single_site_time = best_time(single_site, repeat)
+
+    differing = [
+        site for site in sites
+        if any(table.rows() != single_site_tables[site][name].rows()
+               for system in (mrp_system, array_system)
+               for name, table in system.site_tables(site).items())
+    ]
+    return multi_site_time, array_time, single_site_time, differing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, nargs="+", default=[1, 10, 25, 100], help="site counts to compare")
+    parser.add_argument("--items", type=int, default=200, help="number of components in the BOM")
+    parser.add_argument("--periods", type=int, default=52, help="number of periods")
+    parser.add_argument("--seed", type=int, default=4, help="random seed")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs of each variant; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    bom = build_bom(rng, args.items)
+    failed = False
+    for site_count in args.sites:
+        production = {
+            f"Site {i}": [rng.choice([0, 0, 10, 30, 60]) for _ in range(args.periods)] for i in range(site_count)
+        }
+        multi_site_time, array_time, single_site_time, differing = compare(bom, args.periods, production, args.repeat)
+        status = "ok"
+        if differing:
+            status = f"FAIL ({len(differing)} sites differ)"
+            failed = True
+        path = "per site" if site_count < SCALAR_SITES else "array"
+        print(f"{site_count:4} sites  multi-site ({path:8}) {multi_site_time * 1000:8.1f} ms  "
+              f"array {array_time * 1000:8.1f} ms  single-site {single_site_time * 1000:8.1f} ms  "
+              f"speedup {single_site_time / multi_site_time:5.2f}x  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Check that ProductionSolver finds a plan without shortages within a time budget.
+
+Run from the ``app`` directory:
+
+    python benchmarks/solver_budget.py --items 500 --seeds 1 2 3 4 --budget 3
+
+Every seed builds a random BOM like the solver demo, whose lot-for-lot production
+leaves shortages: components are made in lots at least as large as their parent's,
+and a lot takes up to two periods. The solver gets the budget as its time limit, so
+it returns the best production found by then; the script fails when that production
+still leaves shortages, or when the solve overran the budget by more than a tenth.
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.solver import ProductionSolver
+
+
+def build_bom(rng, item_count):
+    """ Return a random BOM whose components hang below the first quarter of the items. """
+    bom = BOM()
+    root = Material(name="Product", stock=20, production_time=1)
+    bom.add_material(root)
+    materials = [root]
+    for i in range(item_count - 1):
+        parent = rng.choice(materials[:max(1, len(materials) // 4)])
+        material = Material(
+            name=f"Item {i}", parent=parent.name, quantity_needed=1, stock=rng.randint(0, 100),
+            production_time=rng.randint(1, 2),
+            production_capacity=max(parent.production_capacity, 80) * rng.choice([1, 2]),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+    return bom
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=500, help="number of materials in the BOM")
+    parser.add_argument("--periods", type=int, default=52, help="number of periods")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1, 2, 3, 4], help="random seeds of the BOM and demand")
+    parser.add_argument("--budget", type=float, default=3.0, help="most seconds a solve may take")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for seed in args.seeds:
+        rng = random.Random(seed)
+        bom = build_bom(rng, args.items)
+        demand = [0] * 10 + [rng.choice([0, 10, 20, 40, 60, 80]) for _ in range(args.periods - 10)]
+        lot_for_lot = ProductionSolver(bom, demand, args.periods, max_iterations=0, levelling=False).solve()
+        result = ProductionSolver(bom, demand, args.periods, time_limit=args.budget).solve()
+
+        status = "ok"
+        if not result.feasible:
+            status = "FAIL (shortages left)"
+            failed = True
+        elif result.elapsed > args.budget * 1.1:
+            # The time limit is checked between evaluations
+            status = "FAIL (over budget)"
+            failed = True
+        # Shortages are in unit-periods
+        print(f"seed {seed:3}  lot-for-lot short {lot_for_lot.shortage:6}  solved short {result.shortage:5}  "
+              f"production {result.total_production:5}  inventory {result.inventory:5}  "
+              f"{result.evaluations:4} evaluations  {result.elapsed:5.2f} s  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
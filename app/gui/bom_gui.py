@@ -7,7 +7,6 @@ from .collapsing_frame import CollapsingFrame
 class BOMGUI(ttk.Frame):
     def __init__(self, master, bom, on_material_added):
         super().__init__(master, padding=(10, 10))
-        self.i = 0
         self.pack(fill=BOTH, expand=YES)
 
         self.bom = bom
@@ -31,11 +30,13 @@ class BOMGUI(ttk.Frame):
         self.product_list_frame.pack(fill=BOTH, expand=YES, pady=10)
 
         self.bus_frm = ttk.Frame(self.product_list_frame, padding=5)
-        self.bus_frm.columnconfigure(5, weight=1)
+        self.bus_frm.columnconfigure(0, weight=1)
+        self.bus_frm.rowconfigure(0, weight=1)
         self.product_list_frame.add(
             child=self.bus_frm, 
             title='Produkty:', 
             bootstyle=SECONDARY)
+        self.create_product_tree()
 
     def create_initial_form(self):
         """Create the initial form for level 0 material input."""
@@ -98,6 +99,11 @@ class BOMGUI(ttk.Frame):
             stock = self.stock.get()
             production_time = self.production_time.get()
 
+            # Names identify materials in the BOM and in the product tree
+            if self.bom.get_material_by_name(name) is not None:
+                self.display_message(f"Error: Material '{name}' already exists.")
+                return
+
             # Check if this is the first material (level 0 material)
             if self.bom.level_0_material is None:
                 if not name:
@@ -113,6 +119,7 @@ class BOMGUI(ttk.Frame):
 
                 # Notify the main window
                 self.on_material_added(material)
+                self.insert_product(material)
 
                 # Clear input fields
                 self.material_name.set("")
@@ -146,6 +153,7 @@ class BOMGUI(ttk.Frame):
 
                 # Notify the main window
                 self.on_material_added(material)
+                self.insert_product(material)
 
                 # Clear input fields
                 self.material_name.set("")
@@ -157,49 +165,52 @@ class BOMGUI(ttk.Frame):
 
                 # Refresh parent combobox values
                 self.create_additional_form()
-
-            # Update the product list
-            self.update_product_list()
         except Exception as e:
             self.display_message(f"Error: {str(e)}")
 
-    def update_product_list(self):
-        """Update the collapsible frame with the latest materials."""
-        # Clear existing entries
-        for widget in self.bus_frm.winfo_children():
-            widget.destroy()
+    def create_product_tree(self):
+        """Create the tree view listing the BOM. Tk only draws the visible rows."""
+        columns = ("quantity_needed", "stock", "production_time", "production_capacity")
+        self.product_tree = ttk.Treeview(self.bus_frm, columns=columns, height=10)
+        self.product_tree.heading("#0", text="Name", anchor=W)
+        self.product_tree.heading("quantity_needed", text="Quantity needed")
+        self.product_tree.heading("stock", text="Stock")
+        self.product_tree.heading("production_time", text="Production time")
+        self.product_tree.heading("production_capacity", text="Production capacity")
+        self.product_tree.column("#0", width=160, stretch=YES)
+        for column in columns:
+            self.product_tree.column(column, width=110, anchor=CENTER, stretch=NO)
+
+        scrollbar = ttk.Scrollbar(self.bus_frm, orient=VERTICAL, command=self.product_tree.yview)
+        self.product_tree.configure(yscrollcommand=scrollbar.set)
+        self.product_tree.grid(row=0, column=0, sticky=NSEW)
+        scrollbar.grid(row=0, column=1, sticky=NS)
+
+    def insert_product(self, material):
+        """Insert a single material under its parent in the product tree."""
+        # Materials are identified by their names, which are unique in the BOM
+        parent_iid = material.parent if material.parent is not None else ""
+        self.product_tree.insert(
+            parent_iid,
+            END,
+            iid=material.name,
+            text=material.name,
+            values=(material.quantity_needed, material.stock, material.production_time, material.production_capacity),
+            open=material.parent is None,
+        )
 
-        # Add each material to the collapsible frame
-        lbl = ttk.Label(self.bus_frm, text="Name")
-        lbl.grid(row=0, column=0, sticky=W, pady=2)
-        lbl = ttk.Label(self.bus_frm, text="Parent")
-        lbl.grid(row=0, column=1, sticky=EW, pady=2, padx=(7,7))
-        lbl = ttk.Label(self.bus_frm, text="Quantity needed")
-        lbl.grid(row=0, column=2, sticky=EW, pady=2, padx=(7,7))
-        lbl = ttk.Label(self.bus_frm, text="Stock")
-        lbl.grid(row=0, column=3, sticky=EW, pady=2, padx=(7,7))
-        lbl = ttk.Label(self.bus_frm, text="Production time")
-        lbl.grid(row=0, column=4, sticky=EW, pady=2, padx=(7,7))
-        lbl = ttk.Label(self.bus_frm, text="Production capacity")
-        lbl.grid(row=0, column=5, sticky=EW, pady=2, padx=(7,7))
-        sep = ttk.Separator(self.bus_frm, bootstyle=SECONDARY, orient="horizontal")
-        sep.grid(row=1, column=0, columnspan=6, pady=10, sticky=EW)
-        for material in self.bom.materials:
-            self.i = self.i+1
-            lbl = ttk.Label(self.bus_frm, text=material.name)
-            lbl.grid(row=self.i*2, column=0, sticky=W, pady=2)
-            lbl = ttk.Label(self.bus_frm, text=material.parent)
-            lbl.grid(row=self.i*2, column=1, sticky=W, pady=2, padx=(7,7))
-            lbl = ttk.Label(self.bus_frm, text=material.quantity_needed)
-            lbl.grid(row=self.i*2, column=2, sticky=W, pady=2, padx=(7,7))
-            lbl = ttk.Label(self.bus_frm, text=material.stock)
-            lbl.grid(row=self.i*2, column=3, sticky=W, padx=(7,7), pady=2)
-            lbl = ttk.Label(self.bus_frm, text=material.production_time)
-            lbl.grid(row=self.i*2, column=4, sticky=W, padx=(7,7), pady=2)
-            lbl = ttk.Label(self.bus_frm, text=material.production_capacity)
-            lbl.grid(row=self.i*2, column=5, sticky=W, padx=(7,7), pady=2)
-            sep = ttk.Separator(self.bus_frm, bootstyle=SECONDARY, orient="horizontal")
-            sep.grid(row=self.i*2+1, column=0, columnspan=6, pady=10, sticky=EW)
+    def update_product_list(self):
+        """Rebuild the product tree from the whole BOM (e.g. after the BOM is replaced)."""
+        self.product_tree.delete(*self.product_tree.get_children())
+
+        # Insert parents before their children
+        if self.bom.level_0_material is None:
+            return
+        stack = [self.bom.level_0_material]
+        while stack:
+            material = stack.pop()
+            self.insert_product(material)
+            stack.extend(reversed(material.children))
 
     def display_message(self, message):
         """Display a message in the collapsible frame."""
@@ -1,72 +1,124 @@
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tksheet import Sheet
+from gui.telemetry import LatencyRecorder
 
 
 
+# GHP rows which are edited by the user, in display order
+INPUT_ROWS = ("demand", "production")
+
+
 class GHPGUI(ttk.Frame):
-    def __init__(self, master, ghp_system, time_periods_var, display_message):
+    def __init__(self, master, ghp_system, time_periods_var, show_status, on_edit=None, telemetry=None):
         super().__init__(master, padding=(10, 10))
         self.pack(fill=BOTH, expand=YES)
 
         self.ghp_system = ghp_system
         self.time_periods_var = time_periods_var
-        self.display_message = display_message
+        self.show_status = show_status  # Reports errors in the status line, keeping the sheet
+        self.on_edit = on_edit  # Called with (row name, None, period, value) after each edit
+        self.telemetry = telemetry if telemetry is not None else LatencyRecorder(self)  # Times each edit until repainted
         self.result_frame = ttk.Frame(self)
         self.result_frame.pack(fill=BOTH, expand=YES, pady=10)
         self.sheet = None  # Initialize the sheet variable
 
-    def display_ghp_table(self, demand, production, availability, time_periods):
-        """Display GHP results in a table and dynamically update availability."""
+    def display_ghp_table(self, demand, production, availability, time_periods, labels=None):
+        """Display GHP results in a table and dynamically update availability.
+        labels optionally names the columns (e.g. bucket calendar labels)."""
         # Clear any existing widgets in the result frame
         for widget in self.result_frame.winfo_children():
             widget.destroy()
 
         # Define table headers and data
-        headers = [str(i + 1) for i in range(time_periods)]
-        indexes = ["Demand", "Production", "Availability"]
+        headers = labels if labels is not None else [str(i + 1) for i in range(time_periods)]
+        indexes = ["Demand", "Production", "Availability", "ATP"]
         data = [
             [value if value != 0 else "" for value in demand],  # Hide zeros in demand
             [value if value != 0 else "" for value in production],  # Hide zeros in production
-            availability  # Keep zeros in availability
+            availability,  # Keep zeros in availability
+            self.ghp_system.get_atp()  # Available to promise
         ]
 
         # Create the Sheet widget and store it as an instance variable
         self.sheet = Sheet(self.result_frame, data=data, headers=headers, row_index=indexes, 
                         default_column_width=35, default_row_index_width=90, 
-                        row_index_align="e", align=CENTER, height=150, width=550)
+                        row_index_align="e", align=CENTER, height=175, width=550)
         self.sheet.enable_bindings()
 
         # Event listener for cell edits
         def on_cell_edit(event):
+            # Get the modified cell's row and column
+            row = event["row"]
+            col = event["column"]
+            interaction = self.telemetry.begin("GHP edit", row=row, period=col)
             try:
-                # Get the modified cell's row and column
-                row = event["row"]
-                col = event["column"]
 
                 # Get the cell data and convert it to an integer (default to 0 if empty)
                 cell_data = self.sheet.get_cell_data(row, col)
                 value = int(cell_data) if cell_data.strip() else 0
 
-                # Update the corresponding demand or production value
-                if row == 0:  # Demand row
-                    demand[col] = value
-                elif row == 1:  # Production row
-                    production[col] = value
+                # Only demand and production rows are inputs; calculated rows are restored
+                if row >= len(INPUT_ROWS):
+                    self.restore_cell(row, col)
+                    return
 
-                # Recalculate availability
-                new_availability = self.ghp_system.calculate_ghp(demand, production, time_periods)
-
-                # Update the availability row in the table
-                for i in range(time_periods):
-                    self.sheet.set_cell_data(2, i, new_availability[i])  # Row 2 is the availability row
+                interaction.mark("input")
+                self.set_value(INPUT_ROWS[row], col, value, interaction)
+                if self.on_edit is not None:
+                    self.on_edit(INPUT_ROWS[row], None, col, value)
             except ValueError:
-                self.display_message("Error: Please enter a valid integer.")
+                # Restore the value which is still in effect
+                self.restore_cell(row, col)
+                self.report_error("Error: Please enter a valid integer.")
             except Exception as e:
-                self.display_message(f"Error: {str(e)}")
+                self.report_error(f"Error: {str(e)}")
+            finally:
+                self.telemetry.finish(interaction)
 
         # Bind the "edit_cell" event to the on_cell_edit function
         self.sheet.extra_bindings("edit_cell", on_cell_edit)
 
         # Pack the Sheet widget into the result frame
-        self.sheet.pack(fill=BOTH, expand=YES)
\ No newline at end of file
+        self.sheet.pack(fill=BOTH, expand=YES)
+
+    def report_error(self, message):
+        """Show an error in the status line and record it in the telemetry."""
+        self.telemetry.record_error(message)
+        self.show_status(message)
+
+    def restore_cell(self, row, period):
+        """Show the value of a cell as the GHP holds it, discarding what was typed."""
+        if row < len(INPUT_ROWS):
+            value = self.ghp_system.get_tables()[INPUT_ROWS[row]][period]
+            self.sheet.set_cell_data(row, period, value if value != 0 else "")
+        elif row == 2:
+            self.sheet.set_cell_data(row, period, self.ghp_system.get_availability()[period])
+        else:
+            self.sheet.set_cell_data(row, period, self.ghp_system.get_atp()[period])
+        self.sheet.redraw()
+
+    def set_value(self, row_name, period, value, interaction=None):
+        """
+        Set a demand or production value and update the availability and ATP rows.
+        :param row_name: Either "demand" or "production".
+        :param period: The period of the value.
+        :param value: The new value.
+        :param interaction: Optional Interaction of the edit, timed until the sheet is repainted.
+        """
+        # Update the corresponding demand or production value and shift availability
+        self.ghp_system.update_cell(row_name, period, value)
+        new_availability = self.ghp_system.get_availability()
+        atp = self.ghp_system.get_atp()
+        if interaction is not None:
+            interaction.mark("calculation")
+        self.sheet.set_cell_data(INPUT_ROWS.index(row_name), period, value if value != 0 else "")
+
+        # Update the availability and ATP rows from the changed period onwards
+        for i in range(len(new_availability)):
+            if i >= period:
+                self.sheet.set_cell_data(2, i, new_availability[i])  # Row 2 is the availability row
+            self.sheet.set_cell_data(3, i, atp[i])  # Row 3 is the ATP row
+        self.sheet.redraw()
+        if interaction is not None:
+            interaction.mark("sheet update")
@@ -1,11 +1,40 @@
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from tkinter import filedialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from src.bom import BOM, Material
 from src.ghp import GHP
-from src.mrp import MRP
+from src.session import PlanningSession
+from src.history import EditHistory, PlanState
+from src.buckets import BucketCalendar
+from src.orders import aggregate_orders
+from src.mrp import MRP, CalculationCancelled
+from src.repository import PlanRepository
+from src.shared_store import (
+    SharedPlanMRP, SharedPlanView, calculate_snapshot_to_shared_memory, release_shared_plan, unlink_shared_plan,
+)
+from src.snapshot import BOMSnapshot, SnapshotStore
+from src.solver import ProductionSolver
 from gui.bom_gui import BOMGUI
 from gui.ghp_gui import GHPGUI
 from gui.mrp_gui import MRPGUI
+from gui.planning_worker import PlanningWorker
+from gui.telemetry import LatencyRecorder, TelemetryPanel
+
+
+UNIFORM_BUCKETS = "Uniform periods"
+TIERED_BUCKETS = "Days / weeks / months"
+
+# Saved plan runs are kept in a SQLite database; this is the one first offered
+PLANS_DATABASE = os.path.join(os.path.expanduser("~"), "mrp_plans.sqlite")
+
+# Plans with at least this many MRP cells (materials x periods) are calculated in a worker
+# process, which hands the tables back in shared memory instead of pickling them
+SHARED_PLAN_CELLS = 200_000
 
 
 class MainWindow(ttk.Frame):
@@ -23,6 +52,33 @@ class MainWindow(ttk.Frame):
         self.bom = BOM()
         self.ghp_system = GHP(self.bom)
         self.time_periods = 10  # Default value, user can change this later
+        self.calendar = None  # Bucket calendar of the GHP and MRP columns (None for uniform periods)
+
+        # Planning calculations run in the background to keep the window responsive
+        self.worker = PlanningWorker(self)
+
+        # Calculated plans are cached, so repeated or reverted inputs return instantly
+        self.planning_session = PlanningSession()
+
+        # Calculations read frozen, versioned copies of the BOM and inputs, never the live objects
+        self.snapshots = SnapshotStore()
+
+        # Started on the first large plan (see SHARED_PLAN_CELLS)
+        self.process_pool = None
+
+        # Plans are saved on their own threads, which report back through this queue
+        self.plans_database = PLANS_DATABASE
+        self.saved_plans = queue.Queue()
+        self.pending_saves = 0
+        self.save_lock = threading.Lock()  # One save at a time, so a new BOM version is stored once
+
+        # Latency of every edit, from the cell edit until the sheets are repainted
+        self.telemetry = LatencyRecorder(self)
+        self.telemetry_window = None
+
+        # Undo/redo history of GHP and MRP inputs
+        self.history = EditHistory()
+        self.mrp_gui = None
 
         # Create BOM GUI
         self.bom_gui = BOMGUI(self.LEFT_FRAME, self.bom, self.on_material_added)
@@ -33,8 +89,16 @@ class MainWindow(ttk.Frame):
         # Create input for "Number of Time Periods"
         self.create_time_period_input()
 
+        # Create "Undo" and "Redo" buttons
+        self.create_history_buttons()
+
+        # Warnings and reports which must not replace the GHP table
+        self.status_var = ttk.StringVar(value="")
+        self.status_label = ttk.Label(self.RIGHT_FRAME, textvariable=self.status_var, bootstyle=INFO, wraplength=550)
+        self.status_label.pack(side=TOP, fill=X)
+
         # Create GHP GUI
-        self.ghp_gui = GHPGUI(self.RIGHT_FRAME, self.ghp_system, self.time_periods_var, self.display_message)
+        self.ghp_gui = GHPGUI(self.RIGHT_FRAME, self.ghp_system, self.time_periods_var, self.show_status, self.record_edit, self.telemetry)
 
         # Create "Calculate GHP" button
         self.create_calculate_ghp_button()
@@ -51,6 +115,44 @@ class MainWindow(ttk.Frame):
         time_periods_entry = ttk.Entry(action_frame, textvariable=self.time_periods_var, width=5)
         time_periods_entry.pack(side=LEFT, padx=5)
 
+        # Uniform periods, or days near-term followed by weeks and months (periods are then days of horizon)
+        buckets_frame = ttk.Frame(master=self.LEFT_FRAME)
+        buckets_frame.pack(fill=X, pady=10)
+
+        buckets_label = ttk.Label(buckets_frame, text="Time Buckets")
+        buckets_label.pack(side=LEFT, padx=5)
+
+        self.buckets_var = ttk.StringVar(value=UNIFORM_BUCKETS)
+        buckets_combobox = ttk.Combobox(buckets_frame, textvariable=self.buckets_var, state="readonly", width=22)
+        buckets_combobox["values"] = [UNIFORM_BUCKETS, TIERED_BUCKETS]
+        buckets_combobox.pack(side=LEFT, padx=5)
+
+    def create_history_buttons(self):
+        """Create the 'Undo' and 'Redo' buttons."""
+        history_frame = ttk.Frame(master=self.LEFT_FRAME)
+        history_frame.pack(fill=X, pady=10)
+
+        undo_button = ttk.Button(history_frame, text="Undo", bootstyle=SECONDARY, command=self.undo)
+        undo_button.pack(side=LEFT, padx=5)
+        redo_button = ttk.Button(history_frame, text="Redo", bootstyle=SECONDARY, command=self.redo)
+        redo_button.pack(side=LEFT, padx=5)
+        latency_button = ttk.Button(history_frame, text="Latency", bootstyle=SECONDARY, command=self.open_telemetry)
+        latency_button.pack(side=LEFT, padx=5)
+
+    def open_telemetry(self):
+        """Show the debug panel with the latency percentiles of edits."""
+        if self.telemetry_window is not None:
+            self.telemetry_window.lift()
+            return
+        self.telemetry_window = ttk.Toplevel(title="Edit latency", size=(520, 300))
+        TelemetryPanel(self.telemetry_window, self.telemetry)
+
+        def on_close():
+            self.telemetry_window.destroy()
+            self.telemetry_window = None
+
+        self.telemetry_window.protocol("WM_DELETE_WINDOW", on_close)
+
     def create_calculate_ghp_button(self):
         """Create the 'Calculate GHP' button."""
         self.calculate_ghp_button = ttk.Button(
@@ -102,8 +204,9 @@ class MainWindow(ttk.Frame):
 
             self.calculate_ghp_button.pack(side=TOP, pady=10)
             self.ghp_system = GHP(self.bom)
-            self.ghp_gui = GHPGUI(self.RIGHT_FRAME, self.ghp_system, self.time_periods_var, self.display_message)
+            self.ghp_gui = GHPGUI(self.RIGHT_FRAME, self.ghp_system, self.time_periods_var, self.show_status, self.record_edit, self.telemetry)
             self.bom_gui.create_additional_form()
+            self.history.clear()
             
 
 
@@ -127,15 +230,29 @@ class MainWindow(ttk.Frame):
             if time_periods <= 0:
                 raise ValueError("Number of time periods must be a positive integer.")
 
+            # With tiered buckets the number of periods is the horizon in days
+            if self.buckets_var.get() == TIERED_BUCKETS:
+                self.calendar = BucketCalendar.for_horizon(time_periods)
+                time_periods = len(self.calendar)
+            else:
+                self.calendar = None
+
             # Initialize demand and production arrays
             demand = [0] * time_periods
             production = [0] * time_periods
 
             # Calculate availability using the GHP system
-            availability = self.ghp_system.calculate_ghp(demand, production, time_periods)
+            availability = self.ghp_system.calculate_ghp(demand, production, time_periods, calendar=self.calendar)
 
             # Display the GHP table
-            self.ghp_gui.display_ghp_table(demand, production, availability, time_periods)
+            labels = self.calendar.labels() if self.calendar is not None else None
+            self.ghp_gui.display_ghp_table(demand, production, availability, time_periods, labels)
+
+            # Warn early if the horizon is too short for the BOM's cumulative lead time
+            self.show_status(" ".join(self.ghp_system.warnings))
+
+            # Start a new edit history
+            self.history.reset(PlanState.from_lists(demand, production, {}))
 
             try:
                 self.calculate_mrp_button.destroy()  # Destroy the old button if it exists
@@ -150,6 +267,32 @@ class MainWindow(ttk.Frame):
             command=self.calculate_mrp    # Placeholder for MRP calculation
             )
             self.calculate_mrp_button.pack(side=TOP, pady=10)
+
+            try:
+                self.load_orders_button.destroy()  # Destroy the old button if it exists
+            except AttributeError:
+                pass
+
+            self.load_orders_button = ttk.Button(
+            master=self.RIGHT_FRAME,
+            text="Load customer orders",
+            bootstyle=SECONDARY,
+            command=self.load_orders
+            )
+            self.load_orders_button.pack(side=TOP, pady=(0, 10))
+
+            try:
+                self.solve_button.destroy()  # Destroy the old button if it exists
+            except AttributeError:
+                pass
+
+            self.solve_button = ttk.Button(
+            master=self.RIGHT_FRAME,
+            text="Solve production",
+            bootstyle=SECONDARY,
+            command=self.solve_production
+            )
+            self.solve_button.pack(side=TOP, pady=(0, 10))
             
             
 
@@ -157,43 +300,296 @@ class MainWindow(ttk.Frame):
         except Exception as e:
             self.display_message(f"Error: {str(e)}")
 
+    def load_orders(self):
+        """Fill the GHP demand from a file of customer order lines (item,day,quantity)."""
+        try:
+            path = filedialog.askopenfilename(
+                title="Customer orders", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            )
+            if not path:
+                return
+
+            # Only the demand changes; production and planned deliveries entered so far are kept
+            demand = self.ghp_system.get_tables()["demand"]
+            table_size = len(demand)
+            item = self.bom.level_0_material.name if self.bom.level_0_material is not None else None
+            orders = aggregate_orders(path, table_size, self.calendar, item)
+
+            # The load is one undoable edit
+            state = self.history.current()
+            for period, value in enumerate(orders):
+                if demand[period] != value:
+                    self.ghp_gui.set_value("demand", period, value)
+                    if state is not None:
+                        state = state.with_ghp_value("demand", period, value)
+            if state is not None:
+                self.history.push(state)
+        except Exception as e:
+            self.display_message(f"Error: {str(e)}")
+
     def calculate_mrp(self):
         """Calculate and display MRP results."""
         try:
-            # Get the number of time periods from the input field
-            time_periods = self.time_periods_var.get()
-            if time_periods <= 0:
-                raise ValueError("Number of time periods must be a positive integer.")
-
             # Convert GHP data to numeric values
             demand = [int(value) if str(value).strip().isdigit() else 0 for value in self.ghp_gui.sheet.data[0]]
             production = [int(value) if str(value).strip().isdigit() else 0 for value in self.ghp_gui.sheet.data[1]]
             table_size = len(demand)  # Determine table size from demand
 
-            # Recalculate GHP with sanitized data
-            ghp_system = GHP(self.bom)
-            ghp_system.calculate_ghp(demand, production, table_size)
+            planned_deliveries = self.current_planned_deliveries(table_size)
 
-            # Initialize planned deliveries with zeros
-            planned_deliveries = {
-                material.name: [0] * table_size for material in self.bom.materials
-            }
+            # Publish the inputs as a new version; the BOM may be edited while the calculation runs
+            snapshot = self.snapshots.publish(
+                self.bom, PlanState.from_lists(demand, production, planned_deliveries), table_size, self.calendar
+            )
+
+            def job(is_cancelled):
+                if len(snapshot.bom.materials) * table_size >= SHARED_PLAN_CELLS:
+                    return self.calculate_in_process(snapshot, is_cancelled)
+                # Recalculate GHP with sanitized data, then MRP (through the plan cache)
+                return snapshot.calculate(self.planning_session, is_cancelled)
+
+            self.worker.submit(
+                job,
+                on_done=lambda mrp_system: self.show_mrp(mrp_system, table_size),
+                on_error=lambda e: self.display_message(f"Error: {str(e)}"),
+                debounce=False,
+            )
+        except Exception as e:
+            self.display_message(f"Error: {str(e)}")
+
+    def calculate_in_process(self, snapshot, is_cancelled):
+        """
+        Calculate a snapshot in the worker process; runs on the PlanningWorker thread.
+        Only the name of the shared memory block comes back, and the MRP tables are
+        shown straight from the block.
+        :return: A SharedPlanMRP over the block.
+        """
+        if self.process_pool is None:
+            # Tk does not survive fork(), so the process starts from scratch
+            self.process_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        future = self.process_pool.submit(calculate_snapshot_to_shared_memory, snapshot)
+
+        def discard(done):
+            # A cancelled calculation cannot be interrupted; its block is removed once written
+            if done.exception() is None:
+                unlink_shared_plan(done.result())
+                self.process_pool.submit(release_shared_plan, done.result())
+
+        while not future.done():
+            if is_cancelled():
+                future.add_done_callback(discard)
+                raise CalculationCancelled("MRP calculation cancelled.")
+            wait([future], timeout=0.05)
+
+        block_name = future.result()
+        view = SharedPlanView(block_name)
+        # The view keeps the memory mapped until it is closed; the name is no longer needed,
+        # and on Windows the worker process may now close the handle which kept the block alive
+        unlink_shared_plan(block_name)
+        self.process_pool.submit(release_shared_plan, block_name)
+        return SharedPlanMRP.from_snapshot(view, snapshot)
+
+    def current_planned_deliveries(self, table_size):
+        """Return planned deliveries with zeros, keeping the ones entered so far."""
+        state = self.history.current()
+        planned_deliveries = {
+            material.name: [0] * table_size for material in self.bom.materials
+        }
+        if state is not None:
+            for material_name, row in state.planned_deliveries.items():
+                if material_name in planned_deliveries and len(row) == table_size:
+                    planned_deliveries[material_name] = row.to_list()
+        return planned_deliveries
+
+    def solver_inputs(self):
+        """Return everything a production search reads or overwrites, to tell whether it was edited since."""
+        demand = [int(value) if str(value).strip().isdigit() else 0 for value in self.ghp_gui.sheet.data[0]]
+        production = [int(value) if str(value).strip().isdigit() else 0 for value in self.ghp_gui.sheet.data[1]]
+        planned_deliveries = self.current_planned_deliveries(len(demand))
+        return demand, production, planned_deliveries, BOMSnapshot.capture(self.bom), self.calendar
+
+    def solve_production(self):
+        """Search for the GHP production which avoids shortages with the least production."""
+        try:
+            inputs = self.solver_inputs()
+            demand, _, planned_deliveries, bom, calendar = inputs
+            table_size = len(demand)
+
+            def job(is_cancelled):
+                # The search works on its own copy of the BOM
+                solver = ProductionSolver(bom.materialize(), demand, table_size, planned_deliveries, calendar)
+                return solver.solve(is_cancelled=is_cancelled)
+
+            self.show_status("Searching for the production plan...")
+            self.worker.submit(
+                job,
+                on_done=lambda result: self.apply_solution(result, table_size, inputs),
+                on_error=lambda e: self.show_status(f"Error: the production search failed: {str(e)}"),
+                debounce=False,
+                on_cancel=lambda: self.show_status("Production search cancelled."),
+            )
+        except Exception as e:
+            self.show_status(f"Error: {str(e)}")
 
-            # Create and calculate MRP system
-            mrp_system = MRP(self.bom, ghp_system, table_size, planned_deliveries)
-            mrp_system.calculate_mrp()
+    def apply_solution(self, result, table_size, inputs):
+        """
+        Enter a solved production row into the GHP as one undoable edit and show its MRP.
+        The result is discarded when the inputs it was searched for were edited meanwhile.
+        """
+        try:
+            if self.solver_inputs() != inputs:
+                self.show_status("Production search discarded: the inputs were edited while it ran.")
+                return
+
+            state = self.history.current()
+            production = self.ghp_system.get_production()
+            for period, value in enumerate(result.production):
+                if production[period] != value:
+                    self.ghp_gui.set_value("production", period, value)
+                    if state is not None:
+                        state = state.with_ghp_value("production", period, value)
+            if state is not None:
+                self.history.push(state)
+
+            self.show_mrp(result.mrp_system, table_size)
+            outcome = "No shortages." if result.feasible else f"{result.shortage} unit-periods still short."
+            self.show_status(
+                f"{outcome} Total production {result.total_production}, inventory {result.inventory}; "
+                f"{result.iterations} moves and {result.evaluations} evaluations in {result.elapsed:.2f} s. "
+                + " ".join(result.mrp_system.warnings)
+            )
+        except Exception as e:
+            self.show_status(f"Error: {str(e)}")
 
+    def show_mrp(self, mrp_system, time_periods):
+        """Display calculated MRP results."""
+        try:
             # Initialize MRP GUI
             for widget in self.MRP_frame.winfo_children():
                 widget.destroy()
 
-            mrp_gui = MRPGUI(self.MRP_frame, mrp_system, time_periods)
+            save_button = ttk.Button(
+                self.MRP_frame, text="Save plan", bootstyle=SECONDARY, command=self.save_plan
+            )
+            save_button.pack(side=TOP, anchor=E, pady=(0, 5))
+
+            self.mrp_gui = MRPGUI(
+                self.MRP_frame, mrp_system, time_periods, self.worker, self.planning_session, self.record_edit,
+                self.telemetry,
+            )
 
             # Display MRP tables
-            mrp_gui.display_mrp_tables()
+            self.mrp_gui.display_mrp_tables()
+
+            # Production or horizon infeasible for the cumulative lead time
+            self.show_status(" ".join(mrp_system.warnings))
         except Exception as e:
             self.display_message(f"Error: {str(e)}")
 
+    def save_plan(self):
+        """Save the displayed GHP and MRP tables as a new plan run, in a database chosen by the user."""
+        try:
+            if self.mrp_gui is None:
+                raise ValueError("Please calculate MRP first.")
+            path = filedialog.asksaveasfilename(
+                title="Save plan", initialdir=os.path.dirname(self.plans_database),
+                initialfile=os.path.basename(self.plans_database), defaultextension=".sqlite",
+                filetypes=[("SQLite databases", "*.sqlite *.db"), ("All files", "*.*")],
+                confirmoverwrite=False,  # Runs are added to an existing database
+            )
+            if not path:
+                return
+            self.plans_database = path
+
+            # Freeze the inputs here; published MRP tables are never modified, so they are shared
+            mrp_system = self.mrp_gui.mrp_system
+            ghp_tables = mrp_system.ghp.get_tables()
+            bom = BOMSnapshot.capture(mrp_system.bom)
+            demand, production = list(ghp_tables["demand"]), list(ghp_tables["production"])
+            planned_deliveries = {name: list(row) for name, row in mrp_system.planned_delivery.items()}
+            mrp_tables, table_size, calendar = mrp_system.mrp_tables, mrp_system.table_size, mrp_system.calendar
+
+            def save():
+                try:
+                    ghp_system = GHP(bom.materialize())
+                    ghp_system.calculate_ghp(demand, production, table_size, calendar=calendar)
+                    plan = MRP(ghp_system.bom, ghp_system, table_size, planned_deliveries, calendar)
+                    plan.mrp_tables = mrp_tables
+                    plan.is_current = True
+                    with self.save_lock, PlanRepository(path) as repository:
+                        self.saved_plans.put((path, repository.save_plan(plan), None))
+                except Exception as e:
+                    self.saved_plans.put((path, None, e))
+
+            self.show_status(f"Saving the plan in {path}...")
+            threading.Thread(target=save, name="PlanSaver", daemon=True).start()
+            self.pending_saves += 1
+            if self.pending_saves == 1:
+                self.after(50, self.poll_saved_plans)
+        except Exception as e:
+            self.display_message(f"Error: {str(e)}")
+
+    def poll_saved_plans(self):
+        """Report plans saved in the background."""
+        while True:
+            try:
+                path, run_id, error = self.saved_plans.get_nowait()
+            except queue.Empty:
+                break
+            self.pending_saves -= 1
+            if error is None:
+                self.show_status(f"Plan saved as run {run_id} in {path}.")
+            else:
+                self.show_status(f"Error: the plan could not be saved in {path}: {error}")
+        if self.pending_saves:
+            self.after(50, self.poll_saved_plans)
+
+    def record_edit(self, row, material_name, period, value):
+        """Record an edit of the GHP or MRP inputs in the history."""
+        state = self.history.current()
+        if state is None:
+            return
+        if row == "planned_delivery":
+            self.history.push(state.with_planned_delivery(material_name, period, value))
+        else:
+            self.history.push(state.with_ghp_value(row, period, value))
+
+    def undo(self):
+        """Restore the inputs before the last edit."""
+        current = self.history.current()
+        state = self.history.undo()
+        if state is not None:
+            self.apply_changes(state.changes_from(current))
+
+    def redo(self):
+        """Restore the inputs after the last undone edit."""
+        current = self.history.current()
+        state = self.history.redo()
+        if state is not None:
+            self.apply_changes(state.changes_from(current))
+
+    def apply_changes(self, changes):
+        """Apply changed input cells to the GHP and MRP views."""
+        try:
+            mrp_changed = False
+            for row, material_name, period, value in changes:
+                if row == "planned_delivery":
+                    if self.mrp_gui is not None:
+                        self.mrp_gui.set_planned_delivery(material_name, period, value)
+                        mrp_changed = True
+                else:
+                    self.ghp_gui.set_value(row, period, value)
+
+            # Reverted deliveries are usually answered from the plan cache
+            if mrp_changed:
+                self.mrp_gui.recalculate()
+        except Exception as e:
+            self.display_message(f"Error: {str(e)}")
+
+    def show_status(self, message):
+        """Show a warning or report above the GHP table; an empty message hides it."""
+        self.status_var.set(message)
+
     def display_message(self, message):
         """Display a message in the result frame."""
         for widget in self.ghp_gui.result_frame.winfo_children():
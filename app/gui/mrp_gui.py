@@ -1,142 +1,400 @@
+from collections import OrderedDict
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from tksheet import Sheet   
+from gui.timeline_gui import TimelineGUI
+from gui.telemetry import LatencyRecorder
+from src.shared_store import SharedPlanMRP
+
+
+# Index of the "Available" row, the only row which keeps zeros visible
+AVAILABLE_ROW = 2
+
+# Above this many materials the notebook is replaced by the item picker alone
+MAX_TABS = 30
+
+# Number of Sheet widgets kept alive; the least recently viewed ones are destroyed
+MAX_LIVE_SHEETS = 8
+
+# Number of matches offered by the item picker
+MAX_PICKER_VALUES = 200
 
 
 class MRPGUI(ttk.Frame):
-    def __init__(self, master, mrp_system, time_periods_var):
+    def __init__(self, master, mrp_system, time_periods_var, worker=None, planning_session=None, on_edit=None,
+                 telemetry=None):
         """
         Initialize the MRP GUI.
         :param master: Parent widget.
         :param mrp_system: The MRP system object.
         :param time_periods_var: Variable for the number of time periods.
+        :param worker: Optional PlanningWorker used to recalculate in the background.
+        :param planning_session: Optional PlanningSession used to reuse cached results.
+        :param on_edit: Optional callback called with ("planned_delivery", material name, period, value) after each edit.
+        :param telemetry: Optional LatencyRecorder timing each edit until the sheets are repainted.
         """
         super().__init__(master, padding=(10, 10))
         self.pack(fill=BOTH, expand=YES)
 
         self.mrp_system = mrp_system
         self.time_periods_var = time_periods_var
+        self.worker = worker
+        self.planning_session = planning_session
+        self.on_edit = on_edit
+        self.telemetry = telemetry if telemetry is not None else LatencyRecorder(self)
+        self.pending_interactions = []  # Timed edits waiting for their recalculation
+
+        # Errors of edits and recalculations are shown above the tables
+        self.message_var = ttk.StringVar(value="")
+        self.message_label = ttk.Label(self, textvariable=self.message_var, bootstyle=DANGER)
+        self.message_label.pack(fill=X)
+
         self.mrp_frame = ttk.Frame(self)
         self.mrp_frame.pack(fill=BOTH, expand=YES, pady=10)
 
-        # Store references to Sheet widgets for each material
-        self.sheets = {}
+        # Store references to the Sheet widgets which currently exist, least recently viewed first
+        self.sheets = OrderedDict()
+        self.tab_frames = {}
+        self.material_names = []
+        self.notebook = None
+        self.sheet_host = None
+        self.current_material = None
+        self.picker_var = ttk.StringVar(value="")
+        self.timeline = None
 
     def display_mrp_tables(self):
         """
         Display MRP tables for all materials in the BOM.
+        Tabs start as empty placeholders; a Sheet is built when its material is first shown.
         """
         # Clear any existing widgets in the result frame
         for widget in self.mrp_frame.winfo_children():
             widget.destroy()
+        self.sheets = OrderedDict()
+        self.tab_frames = {}
+        self.current_material = None
+
+        # The tables are usually already calculated by the main window
+        if not self.mrp_system.is_current:
+            self.mrp_system.calculate_mrp()
+        self.material_names = list(self.mrp_system.mrp_tables)
+
+        self.create_item_picker()
+
+        if len(self.material_names) <= MAX_TABS:
+            # Create a tabbed interface with a placeholder frame for each material
+            self.notebook = ttk.Notebook(self.mrp_frame)
+            self.notebook.pack(fill=BOTH, expand=YES)
+            self.sheet_host = None
+            for material_name in self.material_names:
+                frame = ttk.Frame(self.notebook, padding=(10, 10))
+                self.notebook.add(frame, text=material_name)
+                self.tab_frames[material_name] = frame
+            self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        else:
+            # Too many materials for tabs: show one material at a time, chosen in the picker
+            self.notebook = None
+            self.sheet_host = ttk.Frame(self.mrp_frame)
+            self.sheet_host.pack(fill=BOTH, expand=YES)
+
+        if self.material_names:
+            self.show_material(self.material_names[0])
+
+    def create_item_picker(self):
+        """Create a searchable combobox for jumping to a material."""
+        picker_frame = ttk.Frame(self.mrp_frame)
+        picker_frame.pack(fill=X, pady=(0, 5))
+
+        lbl = ttk.Label(picker_frame, text="Material")
+        lbl.pack(side=LEFT, padx=5)
+
+        self.picker_var.set("")
+        picker = ttk.Combobox(picker_frame, textvariable=self.picker_var)
+        picker["values"] = self.material_names[:MAX_PICKER_VALUES]
+        picker.pack(side=LEFT, padx=5, fill=X, expand=YES)
+
+        def on_key_release(event):
+            # Offer only the materials matching the typed text
+            text = self.picker_var.get().strip().lower()
+            matches = [name for name in self.material_names if text in name.lower()]
+            picker["values"] = matches[:MAX_PICKER_VALUES]
 
-        self.mrp_system.calculate_mrp()
-        mrp_tables = self.mrp_system.mrp_tables
+        def on_select(event=None):
+            text = self.picker_var.get().strip()
+            if text in self.mrp_system.mrp_tables:
+                self.show_material(text)
+            elif picker["values"]:
+                self.picker_var.set(picker["values"][0])
+                self.show_material(picker["values"][0])
 
-        # Create a tabbed interface for each material's MRP table
-        notebook = ttk.Notebook(self.mrp_frame)
-        notebook.pack(fill=BOTH, expand=YES)
+        picker.bind("<KeyRelease>", on_key_release)
+        picker.bind("<Return>", on_select)
+        picker.bind("<<ComboboxSelected>>", on_select)
 
-        for material_name, table in mrp_tables.items():
-            # Create a frame for each material
-            frame = ttk.Frame(notebook, padding=(10, 10))
-            notebook.add(frame, text=material_name)
+        timeline_button = ttk.Button(picker_frame, text="Timeline", bootstyle=SECONDARY, command=self.open_timeline)
+        timeline_button.pack(side=LEFT, padx=5)
 
-            # Define table headers and data
+    def open_timeline(self):
+        """Show the planned orders of all materials in a timeline window."""
+        if self.timeline is not None:
+            self.timeline.winfo_toplevel().lift()
+            return
+        window = ttk.Toplevel(title="Planned orders timeline", size=(1000, 600))
+        self.timeline = TimelineGUI(window, self.mrp_system)
+
+        def on_close():
+            self.timeline = None
+            window.destroy()
+
+        window.protocol("WM_DELETE_WINDOW", on_close)
+
+    def on_tab_changed(self, event):
+        """Build the sheet of a tab when it is selected."""
+        selected = self.notebook.select()
+        if selected:
+            self.show_material(self.notebook.tab(selected, "text"))
+
+    def show_material(self, material_name):
+        """Bring the MRP table of a material into view, building its sheet if needed."""
+        if material_name == self.current_material and material_name in self.sheets:
+            return
+        self.current_material = material_name
+
+        if self.notebook is not None:
+            if self.notebook.select() != str(self.tab_frames[material_name]):
+                self.notebook.select(self.tab_frames[material_name])
+            self.materialize_sheet(material_name)
+        else:
+            for sheet in self.sheets.values():
+                sheet.master.pack_forget()
+            sheet = self.materialize_sheet(material_name)
+            sheet.master.pack(fill=BOTH, expand=YES)
+
+    def materialize_sheet(self, material_name):
+        """
+        Return the Sheet of a material, creating it from the current MRP table when it
+        does not exist. Sheets beyond MAX_LIVE_SHEETS are destroyed, least recently viewed first.
+        """
+        if material_name in self.sheets:
+            self.sheets.move_to_end(material_name)
+            return self.sheets[material_name]
+
+        if self.notebook is not None:
+            container = self.tab_frames[material_name]
+        else:
+            container = ttk.Frame(self.sheet_host, padding=(10, 10))
+
+        sheet = self.create_sheet(container, material_name)
+        self.sheets[material_name] = sheet
+
+        while len(self.sheets) > MAX_LIVE_SHEETS:
+            _, old_sheet = self.sheets.popitem(last=False)
+            if self.notebook is None:
+                old_sheet.master.destroy()
+            else:
+                old_sheet.destroy()
+        return sheet
+
+    def create_sheet(self, frame, material_name):
+        """Create the Sheet widget showing the MRP table of a material."""
+        table = self.mrp_system.mrp_tables[material_name]
+
+        # Define table headers and data
+        calendar = getattr(self.mrp_system, "calendar", None)
+        if calendar is not None:
+            headers = calendar.labels()
+        else:
             headers = [str(i + 1) for i in range(self.time_periods_var)]
-            indexes = [
-                "Demand",
-                "Planned Delivery",
-                "Available",
-                "Net Requirement",
-                "Planned Order",
-                "Planned Receipt",
-            ]
-            data = [
-                [value if value != 0 else "" for value in table.demand],  # Hide zeros in demand
-                [value if value != 0 else "" for value in table.planned_delivery],  # Hide zeros in planned delivery
-                table.available,  # Keep zeros in availability
-                [value if value != 0 else "" for value in table.net_requirement],  # Hide zeros in net requirement
-                [value if value != 0 else "" for value in table.planned_order],  # Hide zeros in planned order
-                [value if value != 0 else "" for value in table.planned_receipt],  # Hide zeros in planned receipt
-            ]
-
-            # Create the Sheet widget and store it in the sheets dictionary
-            sheet = Sheet(
-                frame,
-                data=data,
-                headers=headers,
-                row_index=indexes,
-                default_column_width=35,
-                default_row_index_width=150,
-                row_index_align="e",
-                align=CENTER,
-                height=230,
-                width=550,
-            )
-            sheet.enable_bindings()
-            sheet.pack(fill=BOTH, expand=YES)
-
-            # Store the sheet reference for this material
-            self.sheets[material_name] = sheet
-
-            # Bind the "edit_cell" event to the on_cell_edit function
-            self.bind_sheet_events(sheet, material_name)
+        indexes = [
+            "Demand",
+            "Planned Delivery",
+            "Available",
+            "Net Requirement",
+            "Planned Order",
+            "Planned Receipt",
+        ]
+        data = self.sheet_data(table)
+
+        sheet = Sheet(
+            frame,
+            data=data,
+            headers=headers,
+            row_index=indexes,
+            default_column_width=35,
+            default_row_index_width=150,
+            row_index_align="e",
+            align=CENTER,
+            height=230,
+            width=550,
+        )
+        sheet.enable_bindings()
+        sheet.pack(fill=BOTH, expand=YES)
+
+        # Bind the "edit_cell" event to the on_cell_edit function
+        self.bind_sheet_events(sheet, material_name)
+        return sheet
 
     def bind_sheet_events(self, sheet, material_name):
         """Bind events to the Sheet widget for editing."""
         def on_cell_edit(event):
+            # Get the modified cell's row and column
+            row = event["row"]
+            col = event["column"]
+            interaction = self.telemetry.begin("MRP edit", material=material_name, row=row, period=col)
             try:
-                # Get the modified cell's row and column
-                row = event["row"]
-                col = event["column"]
-
                 # Get the cell data and convert it to an integer (default to 0 if empty)
                 cell_data = sheet.get_cell_data(row, col)
                 value = int(cell_data) if cell_data.strip() else 0
 
-                # Update the corresponding MRP table data
-                table = self.mrp_system.mrp_tables[material_name]
-                if row == 0:  # Demand row
-                    table.demand[col] = value
-                elif row == 1:  # Planned Delivery row
-                    table.planned_delivery[col] = value
-
-                # Recalculate MRP
-                self.mrp_system.calculate_mrp()
+                # Only planned deliveries are inputs; calculated rows are restored
+                if row != 1:  # Not the Planned Delivery row
+                    table = self.mrp_system.mrp_tables[material_name]
+                    sheet.set_cell_data(row, col, self.format_cell(row, table.rows()[row][col]))
+                    self.telemetry.finish(interaction)
+                    return
+                self.mrp_system.set_planned_delivery(material_name, col, value)
+                if self.on_edit is not None:
+                    self.on_edit("planned_delivery", material_name, col, value)
 
-                # Refresh the table data
-                self.refresh_mrp_data()
+                # Recalculate MRP and refresh the table data
+                self.display_message("")
+                self.recalculate(interaction)
             except ValueError:
-                print("Error: Please enter a valid integer.")
+                # Restore the value which is still in effect
+                table = self.mrp_system.mrp_tables[material_name]
+                sheet.set_cell_data(row, col, self.format_cell(row, table.rows()[row][col]))
+                self.display_message("Error: Please enter a valid integer.")
+                self.telemetry.finish(interaction)
             except Exception as e:
-                print(f"Error: {str(e)}")
+                self.display_message(f"Error: {str(e)}")
+                if interaction not in self.pending_interactions:
+                    self.telemetry.finish(interaction)
 
         # Bind the "edit_cell" event to the on_cell_edit function
         sheet.extra_bindings("edit_cell", on_cell_edit)
 
-    
-    def refresh_mrp_data(self):
- 
+    def set_planned_delivery(self, material_name, period, value):
         """
-        Refresh the data in all MRP tables without recreating the widgets.
+        Set a planned delivery from outside the sheet (e.g. undo). Call recalculate() afterwards.
         """
- 
-        for material_name, sheet in self.sheets.items():
-            table = self.mrp_system.mrp_tables[material_name]
-            # Update the data in the existing Sheet widget
-
-
-            sheet_data = [
-                [value if value != 0 else "" for value in table.demand],  # Hide zeros in demand
-                [value if value != 0 else "" for value in table.planned_delivery],  # Hide zeros in planned delivery
-                table.available,  # Keep zeros in availability
-                [value if value != 0 else "" for value in table.net_requirement],  # Hide zeros in net requirement
-                [value if value != 0 else "" for value in table.planned_order],  # Hide zeros in planned order
-                [value if value != 0 else "" for value in table.planned_receipt],  # Hide zeros in planned receipt
-            ]
- 
-
-            sheet.set_sheet_data(
-                data = sheet_data
-            )
\ No newline at end of file
+        self.mrp_system.set_planned_delivery(material_name, period, value)
+        sheet = self.sheets.get(material_name)
+        if sheet is not None:
+            sheet.set_cell_data(1, period, self.format_cell(1, value))
+
+    def display_message(self, message):
+        """Show an error above the tables; an empty message hides it."""
+        if message:
+            self.telemetry.record_error(message)
+        self.message_var.set(message)
+
+    def recalculate(self, interaction=None):
+        """
+        Recalculate MRP after an edit. With a worker, successive edits are coalesced
+        and the calculation runs in the background.
+        :param interaction: Optional Interaction of the edit, timed until the sheets are repainted.
+        """
+        # The calculation works on a fork, so the displayed system stays consistent until it is replaced
+        mrp_system = self.mrp_system.fork()
+        if self.planning_session is not None:
+            calculate = lambda is_cancelled=None: self.planning_session.recalculate(mrp_system, is_cancelled)
+        else:
+            calculate = mrp_system.calculate_mrp
+
+        def job(is_cancelled=None):
+            if interaction is not None:
+                interaction.mark("queue")
+            changed_cells = calculate(is_cancelled)
+            if interaction is not None:
+                interaction.mark("calculation")
+            return changed_cells
+
+        if interaction is not None:
+            interaction.mark("input")
+            self.pending_interactions.append(interaction)
+
+        if self.worker is None:
+            self.publish(mrp_system, job(), interaction)
+            return
+
+        self.worker.submit(
+            job,
+            on_done=lambda changed_cells: self.publish(mrp_system, changed_cells, interaction),
+            on_error=self.on_recalculate_error,
+        )
+
+    def on_recalculate_error(self, error):
+        """Report a failed recalculation; the edits waiting for it are not timed."""
+        self.pending_interactions = []
+        self.display_message(f"Error: {str(error)}")
+
+    def publish(self, mrp_system, changed_cells, interaction=None):
+        """
+        Replace the displayed MRP system with a recalculated one and refresh the sheets.
+        :param interaction: The Interaction of the edit which started the recalculation, if timed.
+        """
+        interactions, self.pending_interactions = self.pending_interactions, []
+        for pending in interactions:
+            if pending is interaction:
+                pending.mark("delivery")
+            else:
+                pending.coalesce()
+
+        previous, self.mrp_system = self.mrp_system, mrp_system
+        self.refresh_mrp_data(changed_cells)
+        if self.timeline is not None:
+            self.timeline.set_mrp_system(mrp_system)
+        if previous is not mrp_system:
+            self.release(previous)
+
+        # Edits coalesced into this recalculation are repainted by it as well
+        for pending in interactions:
+            pending.mark("sheet update")
+            self.telemetry.finish(pending)
+
+    @staticmethod
+    def release(mrp_system):
+        """Detach a replaced system whose tables were shown from shared memory."""
+        if isinstance(mrp_system, SharedPlanMRP):
+            mrp_system.close()
+
+    def destroy(self):
+        self.release(self.mrp_system)
+        super().destroy()
+
+    @staticmethod
+    def format_cell(row, value):
+        """Format a value for display, hiding zeros in every row except Available."""
+        if value == 0 and row != AVAILABLE_ROW:
+            return ""
+        return value
+
+    def sheet_data(self, table):
+        """Build the display rows of an MRP table."""
+        return [
+            [self.format_cell(row, value) for value in values]
+            for row, values in enumerate(table.rows())
+        ]
+
+    def refresh_mrp_data(self, changed_cells=None):
+        """
+        Refresh the data in the MRP tables without recreating the widgets.
+        :param changed_cells: The changed cells reported by MRP.calculate_mrp. Only these
+                              cells of the affected sheets are updated; without it every
+                              sheet is rebuilt.
+        """
+        if changed_cells is None:
+            for material_name, sheet in self.sheets.items():
+                table = self.mrp_system.mrp_tables[material_name]
+                sheet.set_sheet_data(data=self.sheet_data(table))
+            return
+
+        for material_name, cells in changed_cells.items():
+            # Sheets which do not exist yet are built from the current tables when shown
+            sheet = self.sheets.get(material_name)
+            if sheet is None:
+                continue
+            rows = self.mrp_system.mrp_tables[material_name].rows()
+            for row, col in cells:
+                sheet.set_cell_data(row, col, self.format_cell(row, rows[row][col]))
+            sheet.redraw()
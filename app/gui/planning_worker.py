@@ -0,0 +1,134 @@
+import queue
+import threading
+
+
+class PlanningWorker:
+    """Runs planning calculations on a background thread and hands the
+    results back to the Tk main loop.
+
+    Submitted jobs are debounced, so a burst of edits results in a single
+    calculation for the latest input. Submitting a new job cancels the one
+    that is still running: the job receives an ``is_cancelled`` callable
+    which it should pass on to the calculation (e.g. ``MRP.calculate_mrp``).
+    Results of stale jobs are dropped and never reach the callbacks; a job
+    submitted with ``on_cancel`` is told when it is superseded instead.
+    """
+
+    def __init__(self, widget, debounce_ms=150, poll_ms=16):
+        """
+        Initializes the worker.
+        :param widget: Any Tk widget, used to schedule callbacks with after().
+        :param debounce_ms: Time to wait for further edits before a job is started.
+        :param poll_ms: Interval at which finished results are collected (16 ms keeps 60 fps).
+        """
+        self.widget = widget
+        self.debounce_ms = debounce_ms
+        self.poll_ms = poll_ms
+
+        self.generation = 0
+        self.pending_job = None
+        self.on_cancel = None  # Called when the pending job is superseded or cancelled
+        self.debounce_id = None
+        self.poll_id = None
+        self.cancel_event = None
+
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="PlanningWorker", daemon=True)
+        self.thread.start()
+
+    def submit(self, job, on_done, on_error=None, debounce=True, on_cancel=None):
+        """
+        Schedule a calculation.
+        :param job: Callable taking an is_cancelled callable and returning the result.
+        :param on_done: Called on the main loop with the result of the latest job.
+        :param on_error: Called on the main loop with the exception raised by the latest job.
+        :param debounce: Wait for debounce_ms of quiet before starting the job.
+        :param on_cancel: Called on the main loop when the job is superseded by a newer one or cancelled.
+        """
+        self.generation += 1
+        self._notify_cancelled()
+
+        # Stop the calculation which is running for older input
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
+        # Coalesce with a job that is still waiting for its debounce delay
+        if self.debounce_id is not None:
+            self.widget.after_cancel(self.debounce_id)
+            self.debounce_id = None
+
+        self.pending_job = (self.generation, job, on_done, on_error)
+        self.on_cancel = on_cancel
+        if debounce and self.debounce_ms > 0:
+            self.debounce_id = self.widget.after(self.debounce_ms, self._dispatch)
+        else:
+            self._dispatch()
+
+    def cancel(self):
+        """ Cancel the waiting and the running job. """
+        self.generation += 1
+        self._notify_cancelled()
+        if self.debounce_id is not None:
+            self.widget.after_cancel(self.debounce_id)
+            self.debounce_id = None
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.pending_job = None
+
+    def _notify_cancelled(self):
+        """ Tell the pending job, if any, that its result will be dropped. """
+        on_cancel = self.on_cancel
+        self.on_cancel = None
+        if self.pending_job is not None and on_cancel is not None:
+            on_cancel()
+
+    def is_busy(self):
+        """ Return True while a job is waiting or running. """
+        return self.pending_job is not None
+
+    def _dispatch(self):
+        """ Hand the latest job to the background thread. """
+        self.debounce_id = None
+        if self.pending_job is None:
+            return
+        generation, job, on_done, on_error = self.pending_job
+        self.cancel_event = threading.Event()
+        self.jobs.put((generation, job, on_done, on_error, self.cancel_event))
+        if self.poll_id is None:
+            self.poll_id = self.widget.after(self.poll_ms, self._poll)
+
+    def _run(self):
+        """ Background thread: execute jobs one by one. """
+        while True:
+            generation, job, on_done, on_error, cancel_event = self.jobs.get()
+            if cancel_event.is_set():
+                continue
+            try:
+                result = job(cancel_event.is_set)
+                self.results.put((generation, on_done, result, None))
+            except Exception as e:
+                self.results.put((generation, on_error, None, e))
+
+    def _poll(self):
+        """ Main loop: deliver finished results of the latest job. """
+        self.poll_id = None
+        while True:
+            try:
+                generation, callback, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+
+            # Results computed for older input are dropped
+            if generation != self.generation:
+                continue
+            self.pending_job = None
+            self.on_cancel = None
+
+            if error is None:
+                callback(result)
+            elif callback is not None:
+                callback(error)
+
+        if self.pending_job is not None and self.debounce_id is None:
+            self.poll_id = self.widget.after(self.poll_ms, self._poll)
@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from tkinter import filedialog
+import ttkbootstrap as ttk
+from ttkbootstrap.constants import *
+
+
+# Stages of an interaction, in the order they happen
+STAGES = ("input", "queue", "calculation", "delivery", "sheet update", "idle")
+
+# Name of the measurement from the start of an interaction to the end of its last stage
+TOTAL = "total"
+
+PERCENTILES = (50, 95, 99)
+
+
+class Interaction:
+    """One user edit, timed from the event handler until Tk is idle again.
+
+    Stages are recorded with mark(): each call closes the stage which began
+    at the previous mark (or at the start). Marks may come from the worker
+    thread, as long as they happen one after another.
+    """
+
+    def __init__(self, name, args=None):
+        self.name = name
+        self.args = args or {}
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.end = None
+        self.spans = []  # (stage, start, end, thread name)
+
+    def mark(self, stage):
+        """ Close a stage at the current time. """
+        now = time.perf_counter()
+        self.spans.append((stage, self.last, now, threading.current_thread().name))
+        self.last = now
+
+    def coalesce(self):
+        """
+        Mark an edit whose own calculation was superseded by a later edit: everything
+        after its input stage counts as waiting in the queue.
+        """
+        del self.spans[1:]
+        self.last = self.spans[-1][2]
+        self.mark("queue")
+        self.args["coalesced"] = True
+
+    def duration(self):
+        return (self.end if self.end is not None else self.last) - self.start
+
+
+class LatencyRecorder:
+    def __init__(self, widget, window=500):
+        """
+        Initializes the recorder of GUI interaction latencies.
+        Durations are kept per stage for the last window interactions, from which
+        the rolling percentiles are calculated.
+        :param widget: Any Tk widget, used to detect when Tk becomes idle.
+        :param window: Number of interactions kept for percentiles and the trace.
+        """
+        self.widget = widget
+        self.window = window
+        self.origin = time.perf_counter()
+        self.durations = {}  # Stage -> deque of durations in seconds
+        self.interactions = deque(maxlen=window)
+        self.errors = deque(maxlen=window)  # (time, message)
+
+    def begin(self, name, **args):
+        """
+        Start timing an interaction; its first stage ("input") begins now.
+        :param name: The kind of interaction, e.g. "MRP edit".
+        :param args: Details shown in the trace (material, period, ...).
+        """
+        return Interaction(name, args)
+
+    def finish(self, interaction):
+        """
+        Close the interaction once Tk has processed the pending redraws. Call it on the
+        main loop right after the sheets were updated.
+        """
+        self.widget.after_idle(lambda: self._complete(interaction))
+
+    def _complete(self, interaction):
+        interaction.mark("idle")
+        interaction.end = interaction.last
+        for stage, start, end, _ in interaction.spans:
+            self._add(stage, end - start)
+        self._add(TOTAL, interaction.duration())
+        self.interactions.append(interaction)
+
+    def _add(self, stage, duration):
+        if stage not in self.durations:
+            self.durations[stage] = deque(maxlen=self.window)
+        self.durations[stage].append(duration)
+
+    def record_error(self, message):
+        """ Remember an error reported to the user, so it shows up in the trace. """
+        self.errors.append((time.perf_counter(), message))
+
+    def clear(self):
+        """ Forget all measurements. """
+        self.durations = {}
+        self.interactions.clear()
+        self.errors.clear()
+
+    def percentiles(self, stage):
+        """
+        Return the rolling percentiles of a stage.
+        :return: A dictionary of percentile -> duration in milliseconds (nearest rank),
+                 empty before the first measurement.
+        """
+        values = sorted(self.durations.get(stage, ()))
+        if not values:
+            return {}
+        result = {}
+        for percentile in PERCENTILES:
+            rank = max(-(-percentile * len(values) // 100), 1)  # Ceiling of p% of n
+            result[percentile] = values[rank - 1] * 1000
+        return result
+
+    def summary(self):
+        """
+        Return one row per measured stage, in stage order followed by the total:
+        (stage, count, p50, p95, p99, max), durations in milliseconds.
+        """
+        rows = []
+        for stage in STAGES + (TOTAL,):
+            values = self.durations.get(stage)
+            if not values:
+                continue
+            p = self.percentiles(stage)
+            rows.append((stage, len(values)) + tuple(p[percentile] for percentile in PERCENTILES) + (max(values) * 1000,))
+        return rows
+
+    def trace_events(self):
+        """
+        Return the recorded interactions in the Chrome trace event format: one complete
+        event per interaction and per stage, and an instant event per error.
+        """
+        pid = os.getpid()
+        threads = {}
+        events = []
+
+        def tid(thread_name):
+            if thread_name not in threads:
+                threads[thread_name] = len(threads) + 1
+                events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": threads[thread_name],
+                               "args": {"name": thread_name}})
+            return threads[thread_name]
+
+        def microseconds(seconds):
+            return round((seconds - self.origin) * 1e6, 1)
+
+        main_thread = threading.main_thread().name
+        for interaction in self.interactions:
+            events.append({
+                "name": interaction.name, "cat": "interaction", "ph": "X", "pid": pid, "tid": tid(main_thread),
+                "ts": microseconds(interaction.start), "dur": round(interaction.duration() * 1e6, 1),
+                "args": interaction.args,
+            })
+            for stage, start, end, thread_name in interaction.spans:
+                events.append({
+                    "name": stage, "cat": "stage", "ph": "X", "pid": pid, "tid": tid(thread_name),
+                    "ts": microseconds(start), "dur": round((end - start) * 1e6, 1),
+                })
+        for moment, message in self.errors:
+            events.append({
+                "name": "error", "cat": "error", "ph": "i", "s": "p", "pid": pid, "tid": tid(main_thread),
+                "ts": microseconds(moment), "args": {"message": message},
+            })
+        return events
+
+    def export_trace(self, path):
+        """ Write the trace to a JSON file, which chrome://tracing or Perfetto can open. """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, file)
+
+
+class TelemetryPanel(ttk.Frame):
+    def __init__(self, master, recorder, refresh_ms=500):
+        """
+        Initialize the debug panel showing the rolling latency percentiles.
+        :param master: Parent widget.
+        :param recorder: The LatencyRecorder to show.
+        :param refresh_ms: Interval at which the table is refreshed.
+        """
+        super().__init__(master, padding=(10, 10))
+        self.pack(fill=BOTH, expand=YES)
+        self.recorder = recorder
+        self.refresh_ms = refresh_ms
+        self.refresh_id = None
+
+        columns = ("count", "p50", "p95", "p99", "max")
+        self.table = ttk.Treeview(self, columns=columns, height=len(STAGES) + 1)
+        self.table.heading("#0", text="Stage")
+        self.table.column("#0", width=110)
+        for column in columns:
+            self.table.heading(column, text=column if column == "count" else f"{column} (ms)")
+            self.table.column(column, width=80, anchor=E)
+        self.table.pack(fill=BOTH, expand=YES)
+
+        self.errors_var = ttk.StringVar(value="")
+        errors_label = ttk.Label(self, textvariable=self.errors_var, bootstyle=DANGER)
+        errors_label.pack(fill=X, pady=(5, 0))
+
+        button_frame = ttk.Frame(self)
+        button_frame.pack(fill=X, pady=(10, 0))
+        export_button = ttk.Button(button_frame, text="Export trace", bootstyle=PRIMARY, command=self.export_trace)
+        export_button.pack(side=LEFT, padx=5)
+        clear_button = ttk.Button(button_frame, text="Clear", bootstyle=SECONDARY, command=self.clear)
+        clear_button.pack(side=LEFT, padx=5)
+
+        self.refresh()
+
+    def refresh(self):
+        """Show the current percentiles and schedule the next refresh."""
+        self.table.delete(*self.table.get_children())
+        for stage, count, p50, p95, p99, longest in self.recorder.summary():
+            self.table.insert("", END, text=stage, values=(count, f"{p50:.1f}", f"{p95:.1f}", f"{p99:.1f}", f"{longest:.1f}"))
+        if self.recorder.errors:
+            self.errors_var.set(f"{len(self.recorder.errors)} errors, last: {self.recorder.errors[-1][1]}")
+        else:
+            self.errors_var.set("")
+        self.refresh_id = self.after(self.refresh_ms, self.refresh)
+
+    def destroy(self):
+        if self.refresh_id is not None:
+            self.after_cancel(self.refresh_id)
+            self.refresh_id = None
+        super().destroy()
+
+    def export_trace(self):
+        """Save the trace of the recorded interactions to a file."""
+        path = filedialog.asksaveasfilename(
+            title="Export trace", defaultextension=".json", filetypes=[("Trace files", "*.json")]
+        )
+        if path:
+            self.recorder.export_trace(path)
+
+    def clear(self):
+        self.recorder.clear()
+        self.refresh()
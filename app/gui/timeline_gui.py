@@ -0,0 +1,247 @@
+import math
+import ttkbootstrap as ttk
+from ttkbootstrap.constants import *
+from src.timeline import TimelineIndex
+
+
+ROW_HEIGHT = 22
+LABEL_WIDTH = 150
+HEADER_HEIGHT = 22
+
+# Below this many pixels per period orders are drawn as aggregated buckets
+MIN_BAR_PERIOD_WIDTH = 4
+
+# Minimum width of an aggregated bucket in pixels
+MIN_BUCKET_WIDTH = 6
+
+# Minimum distance between period labels in the header, in pixels
+MIN_TICK_SPACING = 60
+
+# Zoom limits, in pixels per period
+MIN_ZOOM = 0.01
+MAX_ZOOM = 120.0
+
+
+class TimelineGUI(ttk.Frame):
+    def __init__(self, master, mrp_system):
+        """
+        Initialize the timeline (Gantt) view of planned orders.
+        Every item is one row of a single canvas; an order is a bar from its release to
+        its receipt. Only the rows and periods inside the viewport are drawn, and when
+        zoomed out the orders are drawn as buckets instead of single bars.
+        Drag to pan, scroll to move between items, Shift+scroll to move in time and
+        Ctrl+scroll to zoom.
+        :param master: Parent widget.
+        :param mrp_system: The calculated MRP system.
+        """
+        super().__init__(master, padding=(10, 10))
+        self.pack(fill=BOTH, expand=YES)
+
+        self.index = TimelineIndex(mrp_system)
+        self.first_period = 0.0
+        self.first_row = 0.0
+        self.zoom = None  # Pixels per period; fitted to the width on the first draw
+        self.drag_start = None
+        self.redraw_id = None
+
+        colors = ttk.Style().colors
+        self.bar_color = colors.primary
+        self.receipt_color = colors.success
+        self.grid_color = colors.border
+        self.text_color = colors.fg
+
+        self.canvas = ttk.Canvas(self, highlightthickness=0, background=colors.bg)
+        self.vertical_scrollbar = ttk.Scrollbar(self, orient=VERTICAL, command=self.yview)
+        self.horizontal_scrollbar = ttk.Scrollbar(self, orient=HORIZONTAL, command=self.xview)
+        self.canvas.grid(row=0, column=0, sticky=NSEW)
+        self.vertical_scrollbar.grid(row=0, column=1, sticky=NS)
+        self.horizontal_scrollbar.grid(row=1, column=0, sticky=EW)
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.canvas.bind("<Configure>", lambda event: self.schedule_redraw())
+        self.canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Shift-MouseWheel>", self.on_wheel)
+        self.canvas.bind("<Control-MouseWheel>", self.on_wheel)
+        for button in (4, 5):  # Mouse wheel on X11
+            self.canvas.bind(f"<Button-{button}>", self.on_wheel)
+            self.canvas.bind(f"<Shift-Button-{button}>", self.on_wheel)
+            self.canvas.bind(f"<Control-Button-{button}>", self.on_wheel)
+
+    def set_mrp_system(self, mrp_system):
+        """Show the orders of a recalculated MRP system, keeping the viewport."""
+        self.index = TimelineIndex(mrp_system)
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        """Redraw once the pending events are handled, coalescing bursts of pan and zoom events."""
+        if self.redraw_id is None:
+            self.redraw_id = self.after_idle(self.redraw)
+
+    def viewport(self):
+        """Return the canvas size and the number of visible periods and rows."""
+        width = max(self.canvas.winfo_width(), LABEL_WIDTH + 1)
+        height = max(self.canvas.winfo_height(), HEADER_HEIGHT + 1)
+        return width, height, (width - LABEL_WIDTH) / self.zoom, (height - HEADER_HEIGHT) / ROW_HEIGHT
+
+    def clamp(self):
+        """Keep the viewport inside the plan."""
+        _, _, periods, rows = self.viewport()
+        self.first_period = min(max(self.first_period, 0.0), max(self.index.table_size - periods, 0.0))
+        self.first_row = min(max(self.first_row, 0.0), max(len(self.index) - rows, 0.0))
+
+    def x_of(self, period):
+        return LABEL_WIDTH + (period - self.first_period) * self.zoom
+
+    def redraw(self):
+        """Draw the rows and periods inside the viewport."""
+        self.redraw_id = None
+        if self.zoom is None:
+            if self.canvas.winfo_width() <= 1:
+                return  # Not mapped yet; <Configure> schedules the first draw
+            # Fit the whole horizon into the window
+            self.zoom = 1.0
+            width, _, _, _ = self.viewport()
+            self.zoom = min(max((width - LABEL_WIDTH) / max(self.index.table_size, 1), MIN_ZOOM), MAX_ZOOM)
+        self.clamp()
+
+        canvas = self.canvas
+        canvas.delete("all")
+        width, height, periods, rows = self.viewport()
+        first = max(int(self.first_period), 0)
+        last = min(int(math.ceil(self.first_period + periods)), self.index.table_size - 1)
+        first_row = int(self.first_row)
+        last_row = min(int(math.ceil(self.first_row + rows)), len(self.index) - 1)
+
+        self.draw_header(first, last, width)
+
+        bucket_size = 1
+        if self.zoom < MIN_BAR_PERIOD_WIDTH:
+            bucket_size = int(math.ceil(MIN_BUCKET_WIDTH / self.zoom))
+
+        for row in range(first_row, last_row + 1):
+            top = HEADER_HEIGHT + (row - self.first_row) * ROW_HEIGHT
+            canvas.create_line(0, top + ROW_HEIGHT, width, top + ROW_HEIGHT, fill=self.grid_color)
+            if bucket_size == 1:
+                self.draw_bars(row, first, last, top, width)
+            else:
+                self.draw_buckets(row, first, last, top, width, bucket_size)
+
+        # Item names are drawn last, over bars which start before the viewport
+        canvas.create_rectangle(0, 0, LABEL_WIDTH, height, fill=canvas["background"], outline="")
+        for row in range(first_row, last_row + 1):
+            top = HEADER_HEIGHT + (row - self.first_row) * ROW_HEIGHT
+            canvas.create_text(
+                5, top + ROW_HEIGHT / 2, text=self.index.items[row], anchor=W, fill=self.text_color,
+                width=LABEL_WIDTH - 10,
+            )
+        canvas.create_line(LABEL_WIDTH, 0, LABEL_WIDTH, height, fill=self.grid_color)
+
+        self.update_scrollbars(periods, rows)
+
+    def draw_header(self, first, last, width):
+        """Draw period numbers at a spacing which keeps them readable."""
+        step = max(1, int(math.ceil(MIN_TICK_SPACING / self.zoom)))
+        # Round the step to 1, 2 or 5 times a power of ten
+        magnitude = 10 ** int(math.log10(step))
+        step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= step)
+        for period in range(first - first % step, last + 1, step):
+            x = self.x_of(period)
+            if x < LABEL_WIDTH:
+                continue
+            self.canvas.create_line(x, HEADER_HEIGHT - 5, x, HEADER_HEIGHT, fill=self.grid_color)
+            self.canvas.create_text(x + 2, HEADER_HEIGHT / 2, text=str(period + 1), anchor=W, fill=self.text_color)
+        self.canvas.create_line(0, HEADER_HEIGHT, width, HEADER_HEIGHT, fill=self.grid_color)
+
+    def draw_bars(self, row, first, last, top, width):
+        """Draw every order of a row as a bar from release to receipt."""
+        for bar in self.index.visible_bars(row, first, last):
+            left = max(self.x_of(bar.release), LABEL_WIDTH)
+            right = min(max(self.x_of(bar.receipt), self.x_of(bar.release) + 2), width)
+            self.canvas.create_rectangle(
+                left, top + 4, right, top + ROW_HEIGHT - 4, fill=self.bar_color, outline=""
+            )
+            if bar.receipt < self.index.table_size:
+                # Receipt marker
+                self.canvas.create_rectangle(
+                    right - 2, top + 2, right, top + ROW_HEIGHT - 2, fill=self.receipt_color, outline=""
+                )
+            if right - left > 40:
+                self.canvas.create_text(
+                    left + 3, top + ROW_HEIGHT / 2, text=str(bar.quantity), anchor=W, fill="white"
+                )
+
+    def draw_buckets(self, row, first, last, top, width, bucket_size):
+        """Draw the orders of a row aggregated into buckets; the bar height shows the number of orders."""
+        buckets = self.index.buckets(row, first, last, bucket_size)
+        if not buckets:
+            return
+        most = max(count for _, count, _ in buckets)
+        inner = ROW_HEIGHT - 6
+        for start, count, _ in buckets:
+            left = max(self.x_of(start), LABEL_WIDTH)
+            right = min(self.x_of(start + bucket_size), width)
+            bar_height = max(2, inner * count / most)
+            self.canvas.create_rectangle(
+                left, top + 3 + inner - bar_height, right - 1, top + 3 + inner, fill=self.bar_color, outline=""
+            )
+
+    def update_scrollbars(self, periods, rows):
+        table_size = max(self.index.table_size, 1)
+        row_count = max(len(self.index), 1)
+        self.horizontal_scrollbar.set(self.first_period / table_size, min((self.first_period + periods) / table_size, 1.0))
+        self.vertical_scrollbar.set(self.first_row / row_count, min((self.first_row + rows) / row_count, 1.0))
+
+    def xview(self, action, amount, unit=None):
+        """Scrollbar command for the time axis."""
+        if self.zoom is None:
+            return
+        _, _, periods, _ = self.viewport()
+        if action == "moveto":
+            self.first_period = float(amount) * self.index.table_size
+        elif action == "scroll":
+            self.first_period += int(amount) * (periods * 0.9 if unit == "pages" else max(periods / 20, 1))
+        self.schedule_redraw()
+
+    def yview(self, action, amount, unit=None):
+        """Scrollbar command for the item axis."""
+        if self.zoom is None:
+            return
+        _, _, _, rows = self.viewport()
+        if action == "moveto":
+            self.first_row = float(amount) * len(self.index)
+        elif action == "scroll":
+            self.first_row += int(amount) * (rows * 0.9 if unit == "pages" else 1)
+        self.schedule_redraw()
+
+    def on_drag_start(self, event):
+        self.drag_start = (event.x, event.y, self.first_period, self.first_row)
+
+    def on_drag(self, event):
+        if self.drag_start is None or self.zoom is None:
+            return
+        x, y, first_period, first_row = self.drag_start
+        self.first_period = first_period - (event.x - x) / self.zoom
+        self.first_row = first_row - (event.y - y) / ROW_HEIGHT
+        self.schedule_redraw()
+
+    def on_wheel(self, event):
+        if self.zoom is None:
+            return
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            direction = 1
+        else:
+            direction = -1
+
+        if event.state & 0x0004:  # Control: zoom around the pointer
+            anchor = self.first_period + max(event.x - LABEL_WIDTH, 0) / self.zoom
+            self.zoom = min(max(self.zoom * (1.25 if direction > 0 else 0.8), MIN_ZOOM), MAX_ZOOM)
+            self.first_period = anchor - max(event.x - LABEL_WIDTH, 0) / self.zoom
+        elif event.state & 0x0001:  # Shift: move in time
+            _, _, periods, _ = self.viewport()
+            self.first_period -= direction * max(periods / 10, 1)
+        else:
+            self.first_row -= direction * 3
+        self.schedule_redraw()
@@ -1,7 +1,3 @@
-import sys
-import os
-sys.path.append(os.path.join(os.path.dirname(__file__), "src"))
-
 import ttkbootstrap as ttk
 from gui.main_window import MainWindow
 
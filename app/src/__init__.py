@@ -0,0 +1,47 @@
+"""
+GUI-free planning core: BOM, GHP and MRP calculations.
+
+Nothing here imports Tk, ttkbootstrap, tksheet or PIL. Submodules are loaded
+on first use, so ``import src`` costs almost nothing and ``from src import MRP``
+loads only what MRP needs. Optional backends such as NumPy are imported
+lazily by the engines which use them (see ``src._optional``).
+"""
+import importlib
+
+# Public names and the submodules which define them
+_EXPORTS = {
+    "Material": "bom",
+    "BOM": "bom",
+    "GHP": "ghp",
+    "MRP": "mrp",
+    "MRPTable": "mrp",
+    "CalculationCancelled": "mrp",
+    "AvailabilityIndex": "atp",
+    "PlanningSession": "session",
+    "EditHistory": "history",
+    "PlanState": "history",
+    "SharedPlanView": "shared_store",
+    "BucketCalendar": "buckets",
+    "NetChangeMRP": "net_change",
+    "InventoryTransaction": "net_change",
+    "MultiSiteMRP": "multisite",
+    "TransferLane": "multisite",
+    "PlanRepository": "repository",
+    "PlanSnapshot": "snapshot",
+    "SnapshotStore": "snapshot",
+    "ProductionSolver": "solver",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,11 @@
+def import_numpy():
+    """
+    Import NumPy on first use. Engines which need it call this inside their
+    functions, so importing the planning core never pays for NumPy.
+    :return: The numpy module.
+    """
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("This feature requires NumPy. Install it with 'pip install numpy'.") from e
+    return numpy
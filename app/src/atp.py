@@ -0,0 +1,156 @@
+class AvailabilityIndex:
+    def __init__(self, availability):
+        """
+        Initializes a range-query index over a projected availability row.
+        Backed by a segment tree of minimums with lazy range additions, so that
+        a change of demand, production or delivery in one period (which shifts
+        every later availability value) is applied in O(log T).
+        :param availability: The computed availability row (GHP availability or MRPTable.available).
+        """
+        self.size = len(availability)
+        self.tree_size = 1
+        while self.tree_size < max(1, self.size):
+            self.tree_size *= 2
+
+        # Leaves past the end of the row never win a minimum query
+        self.min_values = [float("inf")] * (2 * self.tree_size)
+        self.pending = [0] * (2 * self.tree_size)
+
+        for i, value in enumerate(availability):
+            self.min_values[self.tree_size + i] = value
+        for node in range(self.tree_size - 1, 0, -1):
+            self.min_values[node] = min(self.min_values[2 * node], self.min_values[2 * node + 1])
+
+    def _check_range(self, start, end):
+        """ Validate a half-open period range [start, end). """
+        if start < 0 or end > self.size or start >= end:
+            raise ValueError(f"Invalid period range [{start}, {end}) for a table of size {self.size}.")
+
+    def _push(self, node):
+        """ Propagate a pending addition of a node to its children. """
+        if self.pending[node]:
+            for child in (2 * node, 2 * node + 1):
+                self.min_values[child] += self.pending[node]
+                self.pending[child] += self.pending[node]
+            self.pending[node] = 0
+
+    def _add(self, node, node_start, node_end, start, end, delta):
+        if end <= node_start or node_end <= start:
+            return
+        if start <= node_start and node_end <= end:
+            self.min_values[node] += delta
+            self.pending[node] += delta
+            return
+        self._push(node)
+        middle = (node_start + node_end) // 2
+        self._add(2 * node, node_start, middle, start, end, delta)
+        self._add(2 * node + 1, middle, node_end, start, end, delta)
+        self.min_values[node] = min(self.min_values[2 * node], self.min_values[2 * node + 1])
+
+    def _min(self, node, node_start, node_end, start, end):
+        if end <= node_start or node_end <= start:
+            return float("inf")
+        if start <= node_start and node_end <= end:
+            return self.min_values[node]
+        self._push(node)
+        middle = (node_start + node_end) // 2
+        return min(
+            self._min(2 * node, node_start, middle, start, end),
+            self._min(2 * node + 1, middle, node_end, start, end),
+        )
+
+    def _first_below(self, node, node_start, node_end, start, threshold):
+        if node_end <= start or self.min_values[node] >= threshold:
+            return -1
+        if node_end - node_start == 1:
+            return node_start
+        self._push(node)
+        middle = (node_start + node_end) // 2
+        found = self._first_below(2 * node, node_start, middle, start, threshold)
+        if found == -1:
+            found = self._first_below(2 * node + 1, middle, node_end, start, threshold)
+        return found
+
+    def add(self, start, end, delta):
+        """
+        Add delta to the availability of periods [start, end).
+        :param start: The first period to change.
+        :param end: The period after the last one to change.
+        :param delta: The value added to every period in the range.
+        """
+        self._check_range(start, end)
+        self._add(1, 0, self.tree_size, start, end, delta)
+
+    def apply_change(self, period, delta):
+        """
+        Apply a change of inflow (production, delivery, receipt) or outflow (demand)
+        in a single period. Availability is cumulative, so every later period shifts too.
+        :param period: The period where the inflow grew by delta (use a negative delta for extra demand).
+        :param delta: The change of the net inflow in that period.
+        """
+        self.add(period, self.size, delta)
+
+    def get(self, period):
+        """ Return the availability of a single period. """
+        return self.min_between(period, period)
+
+    def set(self, period, value):
+        """ Overwrite the availability of a single period (without shifting later periods). """
+        self.add(period, period + 1, value - self.get(period))
+
+    def min_between(self, first, last):
+        """
+        Return the minimum projected availability over periods first..last (inclusive).
+        :param first: The first period of the range.
+        :param last: The last period of the range.
+        """
+        self._check_range(first, last + 1)
+        return self._min(1, 0, self.tree_size, first, last + 1)
+
+    def first_below(self, threshold=0, start=0):
+        """
+        Return the first period (at or after start) whose availability is below threshold,
+        or None when there is no such period.
+        """
+        if self.size == 0 or start >= self.size:
+            return None
+        found = self._first_below(1, 0, self.tree_size, start, threshold)
+        return found if found != -1 else None
+
+    def first_shortage(self, start=0):
+        """ Return the first period where availability goes negative, or None. """
+        return self.first_below(0, start)
+
+    def available_to_promise(self, period):
+        """
+        Return how much can still be promised at the given period without making
+        availability negative in that period or any later one.
+        """
+        return max(0, self.min_between(period, self.size - 1))
+
+    def values(self):
+        """ Return the current availability row as a list, pushing every pending addition down in one pass. """
+        for node in range(1, self.tree_size):
+            self._push(node)
+        return self.min_values[self.tree_size:self.tree_size + self.size]
+
+    def atp_row(self):
+        """ Return the available-to-promise quantity for every period (computed in one backward pass). """
+        availability = self.values()
+        atp = [0] * self.size
+        running_min = float("inf")
+        for t in range(self.size - 1, -1, -1):
+            running_min = min(running_min, availability[t])
+            atp[t] = max(0, running_min)
+        return atp
+
+
+# Example Usage:
+if __name__ == "__main__":
+    index = AvailabilityIndex([2, 2, 2, 2, 10, 10, 0, 0, 0, 0])
+    print("First shortage:", index.first_shortage())  # None
+    print("ATP in period 5:", index.available_to_promise(4))  # 0
+    index.apply_change(6, -5)  # 5 more units of demand in period 7
+    print("First shortage:", index.first_shortage())  # 6
+    print("Minimum over periods 1..5:", index.min_between(0, 4))  # 2
+    print("ATP row:", index.atp_row())
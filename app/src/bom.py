@@ -16,10 +16,13 @@ class Material:
         self.production_time = production_time
         self.production_capacity = production_capacity
         self.children = []
+        self.bom = None  # The BOM the material was added to
 
     def add_child(self, material):
         """ Add a child material to this material (used for BOM). """
         self.children.append(material)
+        if self.bom is not None:
+            self.bom.invalidate_lead_times()
 
 
 class BOM:
@@ -27,6 +30,8 @@ class BOM:
         """ Initialize BOM with a materials list. """
         self.materials = []
         self.level_0_material = None # Track the single level 0 material
+        self.lead_times = None  # Cached cumulative lead times by material name
+        self.warnings_cache = None  # (inputs, warnings) of the last lead time check, see ghp.cached_lead_time_warnings
 
     def add_material(self, material):
         """ Add a material to BOM. """
@@ -35,6 +40,52 @@ class BOM:
                 raise ValueError("Only one level 0 material is allowed in the BOM.")
             self.level_0_material = material
         self.materials.append(material)
+        material.bom = self
+        self.invalidate_lead_times()
+
+    def invalidate_lead_times(self):
+        """ Drop the cached cumulative lead times and lead time warnings (call after changing a production time or stock). """
+        self.lead_times = None
+        self.warnings_cache = None
+
+    def get_cumulative_lead_times(self):
+        """
+        Return the cumulative lead time of every material: its own production time plus
+        the longest cumulative lead time among its children, i.e. the critical path from
+        releasing the deepest component to finishing the material. Computed in one pass
+        over the BOM and cached until a material or child is added.
+        """
+        if self.lead_times is None:
+            lead_times = {}
+            for root in self.materials:
+                # Iterative post-order, so deep BOMs do not hit the recursion limit
+                stack = [(root, False)]
+                while stack:
+                    material, children_done = stack.pop()
+                    if material.name in lead_times:
+                        continue
+                    if children_done:
+                        lead_times[material.name] = material.production_time + max(
+                            (lead_times[child.name] for child in material.children), default=0
+                        )
+                    else:
+                        stack.append((material, True))
+                        stack.extend((child, False) for child in material.children)
+            self.lead_times = lead_times
+        return self.lead_times
+
+    def get_cumulative_lead_time(self, name):
+        """ Return the cumulative lead time of a material by its name. """
+        return self.get_cumulative_lead_times().get(name)
+
+    def get_minimum_horizon(self):
+        """
+        Return the smallest number of unit periods in which the level 0 material can be
+        produced without releasing any order before the first period.
+        """
+        if self.level_0_material is None:
+            return 0
+        return self.get_cumulative_lead_time(self.level_0_material.name) + 1
 
     def get_material_by_name(self, name):
         """ Return a single material by its name. """
@@ -121,3 +172,7 @@ if __name__ == "__main__":
 
     # Display BOM structure
     bom.display_bom()
+
+    # Critical path of the whole table: Table (1) + Countertop (3) + Wooden Plate (1)
+    print("Cumulative lead times:", bom.get_cumulative_lead_times())
+    print("Minimum horizon:", bom.get_minimum_horizon())
@@ -0,0 +1,99 @@
+from bisect import bisect_left, bisect_right
+
+DAYS_PER_WEEK = 7
+DAYS_PER_MONTH = 30
+
+
+class BucketCalendar:
+    def __init__(self, bucket_lengths):
+        """
+        Initializes a calendar of time buckets of varying length. Lengths are given in
+        base time units (days), the unit of Material.production_time; GHP and MRP tables
+        then hold one column per bucket.
+        :param bucket_lengths: The length of every bucket, in order.
+        """
+        if any(length <= 0 for length in bucket_lengths):
+            raise ValueError("Bucket lengths must be positive.")
+        self.lengths = tuple(bucket_lengths)
+        self.starts = []
+        day = 0
+        for length in self.lengths:
+            self.starts.append(day)
+            day += length
+        self.horizon = day
+
+    @classmethod
+    def uniform(cls, count, length=1):
+        """ Create a calendar of count buckets of equal length. """
+        return cls([length] * count)
+
+    @classmethod
+    def tiered(cls, days, weeks, months):
+        """ Create a calendar of day buckets, followed by week buckets, followed by month buckets. """
+        return cls([1] * days + [DAYS_PER_WEEK] * weeks + [DAYS_PER_MONTH] * months)
+
+    @classmethod
+    def for_horizon(cls, horizon_days, daily_days=14, weekly_until=91):
+        """
+        Create a tiered calendar covering at least horizon_days: day buckets for the first
+        daily_days, week buckets until day weekly_until, month buckets afterwards.
+        """
+        days = min(horizon_days, daily_days)
+        remaining = horizon_days - days
+        weeks = min(-(-remaining // DAYS_PER_WEEK), max(0, (weekly_until - days) // DAYS_PER_WEEK))
+        remaining -= weeks * DAYS_PER_WEEK
+        months = max(0, -(-remaining // DAYS_PER_MONTH))
+        return cls.tiered(days, weeks, months)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def is_uniform(self):
+        """ Return True if every bucket is one time unit long. """
+        return all(length == 1 for length in self.lengths)
+
+    def start(self, bucket):
+        """ Return the first day of a bucket. """
+        return self.starts[bucket]
+
+    def bucket_of(self, day):
+        """
+        Return the bucket containing a day, clamped to 0 for days before the horizon
+        and to len(self) for days after it.
+        """
+        if day < 0:
+            return 0
+        if day >= self.horizon:
+            return len(self.lengths)
+        return bisect_right(self.starts, day) - 1
+
+    def shift(self, bucket, days):
+        """
+        Move a bucket by a span of days, clamped to 0..len(self).
+        Forwards (from an order's release to its receipt) the result is the first bucket
+        which starts once the span has elapsed, so it is a later bucket whenever days > 0.
+        Backwards (offsetting a release from its need) it is the bucket containing the day
+        the span begins: the latest bucket from which shifting forwards again still ends
+        in the given bucket.
+        """
+        day = self.starts[bucket] + days
+        if days >= 0:
+            return bisect_left(self.starts, day)
+        return self.bucket_of(day)
+
+    def labels(self):
+        """ Return column headers: the day number for one-day buckets, the day range otherwise. """
+        if self.is_uniform():
+            return [str(i + 1) for i in range(len(self.lengths))]
+        return [
+            str(start + 1) if length == 1 else f"{start + 1}-{start + length}"
+            for start, length in zip(self.starts, self.lengths)
+        ]
+
+
+# Example of usage:
+if __name__ == "__main__":
+    calendar = BucketCalendar.for_horizon(730)
+    print(f"{len(calendar)} buckets instead of {calendar.horizon} days")
+    print("Labels:", calendar.labels()[:16], "...")
+    print("3 days before bucket 15 starts:", calendar.shift(15, -3))
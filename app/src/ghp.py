@@ -1,5 +1,109 @@
-from bom import BOM
-from bom import Material
+import heapq
+from .bom import BOM, Material
+from .atp import AvailabilityIndex
+
+
+def lead_time_warnings(bom, production, table_size, calendar=None):
+    """
+    Check a production plan of the level 0 material against the cumulative lead time of
+    the BOM before anything is calculated. Production which starts earlier than the
+    cumulative lead time may need component orders released before the first period,
+    which MRP can only clamp to period 1. It is reported unless the on-hand stock of the
+    components covers those orders.
+    :param bom: The Bill of Materials object.
+    :param production: The production row of the level 0 material.
+    :param table_size: The number of time periods.
+    :param calendar: Optional BucketCalendar; lead times are then compared with bucket start days.
+    :return: A list of warning messages (empty if the plan is feasible).
+    """
+    level_0_material = bom.level_0_material
+    if level_0_material is None:
+        return []
+    lead_time = bom.get_cumulative_lead_time(level_0_material.name)
+    if lead_time == 0:
+        return []
+
+    def start(period):
+        return calendar.start(period) if calendar is not None else period
+
+    def release_day(day, time):
+        # Orders are released at the start of the bucket containing the day
+        day -= time
+        if calendar is not None and day >= 0:
+            return calendar.start(calendar.bucket_of(day))
+        return day
+
+    warnings = []
+    earliest = next((t for t in range(table_size) if start(t) >= lead_time), None)
+    if earliest is None:
+        unit = "days" if calendar is not None else "periods"
+        horizon = calendar.horizon if calendar is not None else table_size
+        warnings.append(
+            f"The horizon of {horizon} {unit} is shorter than the cumulative lead time of "
+            f"{level_0_material.name} ({lead_time}); at least {lead_time + 1} {unit} are needed."
+        )
+
+    # Only production within the cumulative lead time can be short of time. Its component
+    # requirements are netted against stock in the order they are needed, level by level;
+    # what stock does not cover must be ordered, and such an order may start too early.
+    infeasible = set()
+    requirements = []  # Heap of (day needed, production period, sequence, material, quantity)
+    for t, value in enumerate(production[:table_size]):
+        if not value or start(t) >= lead_time:
+            continue
+        day = release_day(start(t), level_0_material.production_time)
+        if day < 0:
+            infeasible.add(t)
+            continue
+        for child in level_0_material.children:
+            heapq.heappush(requirements, (day, t, len(requirements), child, value * child.quantity_needed))
+
+    stock = {}
+    sequence = len(requirements)
+    while requirements:
+        day, t, _, material, quantity = heapq.heappop(requirements)
+        if t in infeasible:
+            continue
+        available = stock.get(material.name, max(material.stock, 0))
+        covered = min(available, quantity)
+        stock[material.name] = available - covered
+        if covered == quantity:
+            continue
+        day = release_day(day, material.production_time)
+        if day < 0:
+            infeasible.add(t)
+            continue
+        for child in material.children:
+            sequence += 1
+            heapq.heappush(requirements, (day, t, sequence, child, (quantity - covered) * child.quantity_needed))
+
+    if infeasible:
+        periods = ", ".join(str(t + 1) for t in sorted(infeasible))
+        message = (
+            f"Production of {level_0_material.name} in period(s) {periods} needs orders released "
+            f"before the first period, which on-hand stock does not cover (cumulative lead time {lead_time})"
+        )
+        if earliest is not None:
+            message += f"; the earliest period feasible without stock is {earliest + 1}"
+        warnings.append(message + ".")
+    return warnings
+
+
+def cached_lead_time_warnings(bom, production, table_size, calendar=None):
+    """
+    Return lead_time_warnings, reusing the result of the previous check of the same BOM
+    when the production, table size and calendar are unchanged. GHP and MRP both check
+    every plan, so the second check costs one comparison of the production row. The
+    cache is dropped by BOM.invalidate_lead_times.
+    """
+    inputs = (tuple(production[:table_size]), table_size, calendar)
+    cache = bom.warnings_cache
+    if cache is not None and cache[0] == inputs:
+        return list(cache[1])
+    warnings = lead_time_warnings(bom, production, table_size, calendar)
+    bom.warnings_cache = (inputs, warnings)
+    return list(warnings)
+
 
 class GHP:
     def __init__(self, bom):
@@ -9,19 +113,27 @@ class GHP:
         """
         self.bom = bom
         self.production_schedule = {}
+        self.warnings = []
 
-    def calculate_ghp(self, demand, production, table_size):
+    def calculate_ghp(self, demand, production, table_size, strict=False, calendar=None):
         """
         Calculate the GHP for the level 0 material.
         :param demand: A list representing the demand for the level 0 product.
         :param production: A list representing the production for the level 0 product.
         :param table_size: The size of the demand and production tables.
+        :param strict: Reject production which is infeasible for the BOM's cumulative lead
+                       time with a ValueError instead of only listing it in self.warnings.
+        :param calendar: Optional BucketCalendar of the periods, used by the lead time check.
         """
         # Get the level 0 material from BOM
         level_0_material = next((m for m in self.bom.materials if m.parent is None), None)
         if not level_0_material:
             raise ValueError("No level 0 material found in BOM.")
 
+        self.warnings = cached_lead_time_warnings(self.bom, production, table_size, calendar)
+        if strict and self.warnings:
+            raise ValueError(" ".join(self.warnings))
+
         # Initialize the availability table
         availability = [0] * table_size
 
@@ -36,14 +148,73 @@ class GHP:
         self.production_schedule[level_0_material.name] = {
             "demand": demand,
             "production": production,
-            "availability": availability
+            "availability": availability,
+            "availability_index": AvailabilityIndex(availability)
         }
 
         return availability
 
+    def update_cell(self, row, period, value):
+        """
+        Update a single demand or production value and shift the availability
+        of that and every later period in O(log T), without recalculating the whole GHP.
+        The availability row is rebuilt from the index when it is next read.
+        :param row: Either "demand" or "production".
+        :param period: The period of the changed value.
+        :param value: The new value.
+        """
+        if row not in ("demand", "production"):
+            raise ValueError(f"Unknown GHP row '{row}'.")
+        if not self.production_schedule:
+            raise ValueError("No production schedule available. Please calculate GHP first.")
+        data = next(iter(self.production_schedule.values()))
+        delta = value - data[row][period]
+        data[row][period] = value
+        if row == "demand":
+            delta = -delta
+
+        if delta:
+            data["availability_index"].apply_change(period, delta)
+            data["availability"] = None
+
+    def get_availability(self):
+        """
+        Return the availability row of the level 0 material.
+        """
+        if not self.production_schedule:
+            raise ValueError("No production schedule available. Please calculate GHP first.")
+        data = next(iter(self.production_schedule.values()))
+        if data["availability"] is None:
+            data["availability"] = data["availability_index"].values()
+        return data["availability"]
+
+    def get_availability_index(self):
+        """
+        Return the range-query index over the availability of the level 0 material.
+        :return: An AvailabilityIndex answering shortage and available-to-promise queries.
+        """
+        if not self.production_schedule:
+            raise ValueError("No production schedule available. Please calculate GHP first.")
+        return next(iter(self.production_schedule.values()))["availability_index"]
+
+    def get_atp(self):
+        """
+        Return the available-to-promise row for the level 0 material.
+        """
+        return self.get_availability_index().atp_row()
+
+    def get_production(self):
+        """
+        Return the production row of the level 0 material.
+        """
+        if not self.production_schedule:
+            raise ValueError("No production schedule available. Please calculate GHP first.")
+        return next(iter(self.production_schedule.values()))["production"]
+
     def get_tables(self):
         """
         Retrieve the demand, production, and availability tables for the level 0 material.
+        The ATP row is built on demand by get_atp().
         :return: A dictionary containing the tables for the level 0 material.
         """
         if not self.production_schedule:
@@ -55,7 +226,7 @@ class GHP:
             "material_name": material_name,
             "demand": data["demand"],
             "production": data["production"],
-            "availability": data["availability"]
+            "availability": self.get_availability()
         }
 
     def display_ghp(self):
@@ -66,7 +237,8 @@ class GHP:
             print(f"GHP for {material_name}:")
             print(f"  Demand: {data['demand']}")
             print(f"  Production: {data['production']}")
-            print(f"  Availability: {data['availability']}")
+            print(f"  Availability: {self.get_availability()}")
+            print(f"  ATP: {data['availability_index'].atp_row()}")
             print()
 
 # Example of usage:
@@ -74,7 +246,10 @@ if __name__ == "__main__":
     # Create a Bill of Materials (BOM)
     bom = BOM()
     table = Material(name="Table", stock=2, production_time=1)
+    legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+    table.add_child(legs)
     bom.add_material(table)
+    bom.add_material(legs)
 
     # Create GHP system and calculate
     ghp_system = GHP(bom)
@@ -89,4 +264,13 @@ if __name__ == "__main__":
     ghp_system.display_ghp()
 
     # Print the availability table
-    print("Availability Table:", availability)
\ No newline at end of file
+    print("Availability Table:", availability)
+
+    # Query the availability without scanning the table
+    index = ghp_system.get_availability_index()
+    print("First shortage period:", index.first_shortage())
+    print("Available to promise in period 5:", index.available_to_promise(4))
+
+    # Production in period 2 is too early for the 3 periods of cumulative lead time
+    ghp_system.calculate_ghp(demand, [0, 5, 0, 0, 28, 0, 30, 0, 0, 0], table_size)
+    print("Warnings:", ghp_system.warnings)
\ No newline at end of file
@@ -0,0 +1,248 @@
+# Number of values stored in one chunk of a PersistentRow
+CHUNK_SIZE = 32
+
+# Number of buckets of a PersistentMap
+MAP_BUCKETS = 256
+
+
+class PersistentRow:
+    """An immutable row of values split into chunks.
+
+    Changing a value creates a new row which shares every chunk except the
+    changed one with the old row, so a version costs O(T / CHUNK_SIZE + CHUNK_SIZE)
+    memory instead of a full copy.
+    """
+
+    __slots__ = ("chunks", "length")
+
+    def __init__(self, chunks, length):
+        self.chunks = chunks
+        self.length = length
+
+    @classmethod
+    def from_list(cls, values):
+        """ Create a row from a list of values. """
+        values = list(values)
+        chunks = tuple(tuple(values[i:i + CHUNK_SIZE]) for i in range(0, len(values), CHUNK_SIZE))
+        return cls(chunks, len(values))
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0 or index >= self.length:
+            raise IndexError("PersistentRow index out of range")
+        return self.chunks[index // CHUNK_SIZE][index % CHUNK_SIZE]
+
+    def set(self, index, value):
+        """ Return a new row with one value changed; unchanged chunks are shared. """
+        if index < 0 or index >= self.length:
+            raise IndexError("PersistentRow index out of range")
+        chunk_index, offset = divmod(index, CHUNK_SIZE)
+        chunk = self.chunks[chunk_index]
+        if chunk[offset] == value:
+            return self
+        new_chunk = chunk[:offset] + (value,) + chunk[offset + 1:]
+        return PersistentRow(self.chunks[:chunk_index] + (new_chunk,) + self.chunks[chunk_index + 1:], self.length)
+
+    def to_list(self):
+        """ Return the values as a new list. """
+        return [value for chunk in self.chunks for value in chunk]
+
+    def changed_indexes(self, other):
+        """ Return the indexes whose values differ from another row of the same length. Shared chunks are skipped. """
+        changed = []
+        for chunk_index, (chunk, other_chunk) in enumerate(zip(self.chunks, other.chunks)):
+            if chunk is other_chunk:
+                continue
+            base = chunk_index * CHUNK_SIZE
+            changed.extend(base + i for i, (a, b) in enumerate(zip(chunk, other_chunk)) if a != b)
+        return changed
+
+
+class PersistentMap:
+    """An immutable mapping split into hash buckets.
+
+    Setting a key copies only the bucket holding it, so maps with many
+    materials can be versioned cheaply.
+    """
+
+    __slots__ = ("buckets",)
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets if buckets is not None else tuple({} for _ in range(MAP_BUCKETS))
+
+    @classmethod
+    def from_dict(cls, values):
+        """ Create a map from a dictionary. """
+        buckets = tuple({} for _ in range(MAP_BUCKETS))
+        for key, value in values.items():
+            buckets[hash(key) % MAP_BUCKETS][key] = value
+        return cls(buckets)
+
+    def get(self, key, default=None):
+        return self.buckets[hash(key) % MAP_BUCKETS].get(key, default)
+
+    def __getitem__(self, key):
+        return self.buckets[hash(key) % MAP_BUCKETS][key]
+
+    def __contains__(self, key):
+        return key in self.buckets[hash(key) % MAP_BUCKETS]
+
+    def items(self):
+        for bucket in self.buckets:
+            yield from bucket.items()
+
+    def set(self, key, value):
+        """ Return a new map with one key set; unchanged buckets are shared. """
+        bucket_index = hash(key) % MAP_BUCKETS
+        new_bucket = dict(self.buckets[bucket_index])
+        new_bucket[key] = value
+        return PersistentMap(self.buckets[:bucket_index] + (new_bucket,) + self.buckets[bucket_index + 1:])
+
+    def changed_keys(self, other):
+        """ Return the keys whose values are different objects in another map. Shared buckets are skipped. """
+        changed = []
+        for bucket, other_bucket in zip(self.buckets, other.buckets):
+            if bucket is other_bucket:
+                continue
+            for key in set(bucket) | set(other_bucket):
+                if bucket.get(key) is not other_bucket.get(key):
+                    changed.append(key)
+        return changed
+
+
+class PlanState:
+    """One immutable version of the planning inputs: GHP demand and production
+    and the planned deliveries of every material."""
+
+    __slots__ = ("demand", "production", "planned_deliveries")
+
+    def __init__(self, demand, production, planned_deliveries):
+        """
+        :param demand: PersistentRow with the GHP demand.
+        :param production: PersistentRow with the GHP production.
+        :param planned_deliveries: PersistentMap of material names to PersistentRows.
+        """
+        self.demand = demand
+        self.production = production
+        self.planned_deliveries = planned_deliveries
+
+    @classmethod
+    def from_lists(cls, demand, production, planned_deliveries):
+        """ Create a state from the lists used by GHP and MRP. """
+        return cls(
+            PersistentRow.from_list(demand),
+            PersistentRow.from_list(production),
+            PersistentMap.from_dict({name: PersistentRow.from_list(row) for name, row in planned_deliveries.items()}),
+        )
+
+    def with_ghp_value(self, row, period, value):
+        """
+        Return a new state with a changed GHP value.
+        :param row: Either "demand" or "production".
+        """
+        if row == "demand":
+            return PlanState(self.demand.set(period, value), self.production, self.planned_deliveries)
+        if row == "production":
+            return PlanState(self.demand, self.production.set(period, value), self.planned_deliveries)
+        raise ValueError(f"Unknown GHP row '{row}'.")
+
+    def with_planned_delivery(self, material_name, period, value):
+        """ Return a new state with a changed planned delivery. """
+        row = self.planned_deliveries.get(material_name)
+        if row is None:
+            row = PersistentRow.from_list([0] * len(self.demand))
+        return PlanState(self.demand, self.production, self.planned_deliveries.set(material_name, row.set(period, value)))
+
+    def changes_from(self, other):
+        """
+        Return the cells which have to be set to turn another state into this one.
+        :return: A list of (row, material name or None, period, value) tuples, where row is
+                 "demand", "production" or "planned_delivery".
+        """
+        changes = []
+        for row in ("demand", "production"):
+            new_row, old_row = getattr(self, row), getattr(other, row)
+            changes.extend((row, None, t, new_row[t]) for t in new_row.changed_indexes(old_row))
+
+        for material_name in self.planned_deliveries.changed_keys(other.planned_deliveries):
+            new_row = self.planned_deliveries.get(material_name)
+            old_row = other.planned_deliveries.get(material_name)
+            if new_row is None:
+                new_row = PersistentRow.from_list([0] * len(old_row))
+            if old_row is None:
+                old_row = PersistentRow.from_list([0] * len(new_row))
+            changes.extend(
+                ("planned_delivery", material_name, t, new_row[t]) for t in new_row.changed_indexes(old_row)
+            )
+        return changes
+
+
+class EditHistory:
+    def __init__(self, max_steps=500):
+        """
+        Initializes an undo/redo history of plan states.
+        Undo and redo only move a pointer; the states share unchanged data.
+        :param max_steps: Maximum number of states kept; the oldest are dropped.
+        """
+        self.max_steps = max_steps
+        self.states = []
+        self.position = -1
+
+    def reset(self, state):
+        """ Start a new history with the given state. """
+        self.states = [state]
+        self.position = 0
+
+    def clear(self):
+        """ Drop all states. """
+        self.states = []
+        self.position = -1
+
+    def current(self):
+        """ Return the current state, or None if the history is empty. """
+        return self.states[self.position] if self.states else None
+
+    def push(self, state):
+        """ Record a new state after an edit; any redo steps are discarded. """
+        del self.states[self.position + 1:]
+        self.states.append(state)
+        if len(self.states) > self.max_steps:
+            del self.states[0]
+        self.position = len(self.states) - 1
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.states) - 1
+
+    def undo(self):
+        """ Step back and return the restored state, or None if there is nothing to undo. """
+        if not self.can_undo():
+            return None
+        self.position -= 1
+        return self.states[self.position]
+
+    def redo(self):
+        """ Step forward and return the restored state, or None if there is nothing to redo. """
+        if not self.can_redo():
+            return None
+        self.position += 1
+        return self.states[self.position]
+
+
+# Example of usage:
+if __name__ == "__main__":
+    history = EditHistory()
+    history.reset(PlanState.from_lists([0] * 10, [0] * 10, {"Legs": [0] * 10}))
+
+    history.push(history.current().with_ghp_value("demand", 4, 20))
+    history.push(history.current().with_planned_delivery("Legs", 2, 50))
+
+    edited = history.current()
+    restored = history.undo()
+    print("Undo changes:", restored.changes_from(edited))  # [('planned_delivery', 'Legs', 2, 0)]
+    print("Demand shared:", restored.demand is edited.demand)  # True
+    print("Redo changes:", history.redo().changes_from(restored))
@@ -1,7 +1,23 @@
-from bom import BOM, Material
-from ghp import GHP
+from .bom import BOM, Material
+from .ghp import GHP, cached_lead_time_warnings
+from .atp import AvailabilityIndex
+
+def _last_nonzero(row):
+    """ Return the index of the last non-zero value of a row, or -1. """
+    for i in range(len(row) - 1, -1, -1):
+        if row[i]:
+            return i
+    return -1
+
+
+class CalculationCancelled(Exception):
+    """ Raised when a calculation is abandoned because its input became stale. """
+
 
 class MRPTable:
+    # Row attributes in the order they are displayed
+    ROWS = ("demand", "planned_delivery", "available", "net_requirement", "planned_order", "planned_receipt")
+
     def __init__(self, material_name, table_size):
         """
         Initializes an MRP table for a specific material.
@@ -15,20 +31,47 @@ class MRPTable:
         self.net_requirement = [0] * table_size
         self.planned_order = [0] * table_size
         self.planned_receipt = [0] * table_size
+        # (release time, quantity) of the order planned while netting each period, used by net-change
+        self.order_log = [None] * table_size
+
+    def rows(self):
+        """ Return the table rows in display order. """
+        return [getattr(self, row) for row in self.ROWS]
+
+    def copy(self):
+        """ Return a copy of the table which can be modified independently. """
+        table = MRPTable(self.material_name, 0)
+        for row in self.ROWS:
+            setattr(table, row, list(getattr(self, row)))
+        table.order_log = list(self.order_log)
+        return table
 
 class MRP:
-    def __init__(self, bom, ghp, table_size, planned_delivery):
+    def __init__(self, bom, ghp, table_size, planned_delivery, calendar=None, strict=False):
         """
         Initializes the MRP system with the given BOM, GHP, and table size.
         :param bom: The Bill of Materials object.
         :param ghp: The GHP object.
         :param table_size: The number of time periods.
+        :param calendar: Optional BucketCalendar with table_size buckets. Without it every
+                         period is one unit of production time long.
+        :param strict: Refuse to calculate (ValueError) when the horizon or the GHP production
+                       is infeasible for the BOM's cumulative lead time; otherwise the
+                       problems are listed in self.warnings.
         """
+        if calendar is not None and len(calendar) != table_size:
+            raise ValueError(f"The calendar has {len(calendar)} buckets but the table size is {table_size}.")
         self.bom = bom
         self.ghp = ghp
         self.table_size = table_size
         self.planned_delivery = planned_delivery
+        self.calendar = calendar
+        self.strict = strict
+        self.warnings = []
         self.mrp_tables = {}
+        self.availability_indexes = {}
+        self.changed_cells = {}
+        self.is_current = False
 
     def order_bom_by_level(self):
         """
@@ -44,91 +87,330 @@ class MRP:
             level += 1
         return ordered_materials
 
-    def calculate_mrp(self):
+    def calculate_mrp(self, is_cancelled=None):
         """
         Calculates the MRP tables for all materials in the BOM.
+        The previous tables are replaced only once the whole calculation succeeds.
+        :param is_cancelled: Optional callable checked before each material; when it
+                             returns True the calculation stops with CalculationCancelled.
+        :return: The cells that differ from the previous calculation (see diff_tables).
         """
+        self.check_lead_times()
+
         # Order materials by level
         ordered_materials = self.order_bom_by_level()
+        mrp_tables = {}
 
         # Process each material in order
         for material in ordered_materials:
+            if is_cancelled is not None and is_cancelled():
+                raise CalculationCancelled("MRP calculation cancelled.")
+
             if material.parent is None:
                 # Skip level 0 material (no MRP table needed)
                 continue
 
-            # Create an MRP table for the material
-            mrp_table = MRPTable(material.name, self.table_size)
-
-            # Use planned delivery if available
-            mrp_table.planned_delivery = self.planned_delivery.get(material.name, [0] * self.table_size)
-
-            # Calculate demand
-            if self.bom.level_0_material and material.parent == self.bom.level_0_material.name:
-                # Level 1 materials: demand comes from GHP production with left offset
-                ghp_production = self.ghp.get_tables()["production"]
-                offset = self.bom.level_0_material.production_time
-                mrp_table.demand = [
-                    (ghp_production[i + offset] if i + offset < self.table_size else 0) * material.quantity_needed
-                    for i in range(self.table_size)
-                ]
-            else:
-                # Level >= 2 materials: demand comes from parent's planned order
-                parent_table = self.mrp_tables[material.parent]
-                mrp_table.demand = [
-                    parent_table.planned_order[i] * material.quantity_needed
-                    for i in range(self.table_size)
-                ]
-
-            # Calculate net requirement, planned order, planned receipt, and availability
-            for t in range(self.table_size):
-                if t == 0:
-                    available = material.stock + mrp_table.planned_delivery[t] + mrp_table.planned_receipt[t] - mrp_table.demand[t]
+            # Calculate demand, then net it against stock and deliveries
+            demand = self.calculate_demand(material, mrp_tables)
+            mrp_table = self.net_material(material, demand)
+
+            # Store the MRP table
+            mrp_tables[material.name] = mrp_table
+
+        return self.replace_tables(mrp_tables)
+
+    def check_lead_times(self):
+        """
+        Check the horizon and the GHP production against the cumulative lead time of the
+        BOM before calculating. The messages are stored in self.warnings. The result of
+        the GHP's own check of the same production is reused (see cached_lead_time_warnings).
+        :return: The list of warnings.
+        """
+        production = self.ghp.get_production()
+        self.warnings = cached_lead_time_warnings(self.bom, production, self.table_size, self.calendar)
+        if self.strict and self.warnings:
+            raise ValueError(" ".join(self.warnings))
+        return self.warnings
+
+    def replace_tables(self, mrp_tables):
+        """
+        Install a complete set of calculated MRP tables (e.g. taken from a cache).
+        :param mrp_tables: The new tables by material name.
+        :return: The cells that differ from the previous tables (see diff_tables).
+        """
+        self.changed_cells = self.diff_tables(self.mrp_tables, mrp_tables)
+        self.mrp_tables = mrp_tables
+        self.is_current = True
+
+        # Indexes built over the previous results are no longer valid
+        self.availability_indexes = {}
+        return self.changed_cells
+
+    def calculate_demand(self, material, mrp_tables):
+        """
+        Calculates the demand row of a material.
+        :param material: The material (level 1 or deeper).
+        :param mrp_tables: The MRP tables calculated so far, including the material's parent.
+        :return: The demand for each time period.
+        """
+        if self.bom.level_0_material and material.parent == self.bom.level_0_material.name:
+            return self.ghp_demand(material)
+        return self.dependent_demand(material, mrp_tables[material.parent].planned_order)
+
+    def ghp_demand(self, material):
+        """
+        Level 1 materials: demand comes from GHP production with left offset.
+        """
+        ghp_production = self.ghp.get_production()
+        offset = self.bom.level_0_material.production_time
+        if self.calendar is not None:
+            # Production in a bucket needs the components in the bucket containing its start minus the offset
+            demand = [0] * self.table_size
+            for j in range(self.table_size):
+                if ghp_production[j] and self.calendar.start(j) - offset >= 0:
+                    demand[self.calendar.shift(j, -offset)] += ghp_production[j] * material.quantity_needed
+            return demand
+        return [
+            (ghp_production[i + offset] if i + offset < self.table_size else 0) * material.quantity_needed
+            for i in range(self.table_size)
+        ]
+
+    def dependent_demand(self, material, parent_planned_order):
+        """
+        Level >= 2 materials: demand comes from parent's planned order.
+        """
+        return [
+            parent_planned_order[i] * material.quantity_needed
+            for i in range(self.table_size)
+        ]
+
+    def calculate_mrp_streaming(self, sink, is_cancelled=None):
+        """
+        Calculates the MRP tables level by level and hands each finished table to a sink
+        instead of keeping it. Only the planned orders of the previous level's materials
+        which have components are held in memory, so peak memory follows the widest BOM
+        level rather than the whole BOM. self.mrp_tables is left untouched.
+        :param sink: Callable receiving each finished MRPTable (e.g. a streaming.JsonLinesSink).
+        :param is_cancelled: Optional callable; when it returns True the calculation stops with CalculationCancelled.
+        :return: The number of tables passed to the sink.
+        """
+        if self.bom.level_0_material is None:
+            return 0
+        self.check_lead_times()
+
+        count = 0
+        level = list(self.bom.level_0_material.children)
+        parent_orders = {}
+        while level:
+            next_orders = {}
+            next_level = []
+            for material in level:
+                if is_cancelled is not None and is_cancelled():
+                    raise CalculationCancelled("MRP calculation cancelled.")
+
+                if material.parent == self.bom.level_0_material.name:
+                    demand = self.ghp_demand(material)
                 else:
-                    available = (
-                        mrp_table.available[t - 1]
-                        + mrp_table.planned_delivery[t]
-                        + mrp_table.planned_receipt[t]  # Add planned receipt only at this index
-                        - mrp_table.demand[t]
-                    )
+                    demand = self.dependent_demand(material, parent_orders[material.parent])
+                mrp_table = self.net_material(material, demand)
+
+                # Keep only what the next level needs
+                if material.children:
+                    next_orders[material.name] = mrp_table.planned_order
+                    next_level.extend(material.children)
+
+                sink(mrp_table)
+                count += 1
+
+            parent_orders = next_orders
+            level = next_level
+        return count
 
-                if available < 0:
-                    mrp_table.net_requirement[t] = abs(available)
-                    # Find the latest planned order with value != 0
-                    latest_planned_order_index = -1
-                    for i in range(t, -1, -1):
-                        if mrp_table.planned_order[i] != 0:
-                            latest_planned_order_index = i
-                            break
-
-                    # Ensure no overlapping production
-                    if latest_planned_order_index == -1 or latest_planned_order_index + material.production_time <= t:
-                        release_time = max(0, t - material.production_time)
-
-                        # Check if the release time overlaps with the previous order's production
-                        if latest_planned_order_index != -1 and release_time < latest_planned_order_index + material.production_time:
-                            release_time = latest_planned_order_index + material.production_time
-
-                        # Create a new planned order
-                        mrp_table.planned_order[release_time] += material.production_capacity
-                        receipt_time = release_time + material.production_time
-                        if receipt_time < self.table_size:
-                            mrp_table.planned_receipt[receipt_time] += material.production_capacity
-
-                if t == 0:
-                    available = material.stock + mrp_table.planned_delivery[t] + mrp_table.planned_receipt[t] - mrp_table.demand[t]
+    def shift_period(self, period, time):
+        """
+        Return the period in which a span of production time started at the given period
+        ends (or, for a negative time, begins), clamped to 0..table_size. With a calendar the
+        span is measured in days across bucket boundaries (see BucketCalendar.shift): a
+        receipt never falls into its release bucket unless the time is 0.
+        """
+        if self.calendar is not None:
+            return self.calendar.shift(period, time)
+        return min(max(period + time, 0), self.table_size)
+
+    def net_material(self, material, demand):
+        """
+        Nets the demand of a single material against its stock and planned deliveries
+        and plans the orders which cover the shortages.
+        :param material: The material (level 1 or deeper).
+        :param demand: The demand row of the material.
+        :return: The calculated MRPTable.
+        """
+        # Create an MRP table for the material
+        mrp_table = MRPTable(material.name, self.table_size)
+        mrp_table.demand = demand
+
+        # Use planned delivery if available
+        mrp_table.planned_delivery = list(self.planned_delivery.get(material.name, [0] * self.table_size))
+
+        self.net_periods(material, mrp_table, 0)
+        return mrp_table
+
+    def renet_material(self, material, mrp_table, start):
+        """
+        Re-net an already calculated table from a given period onwards, after its demand,
+        planned delivery or stock changed only in that period or later ones. Orders planned
+        while netting earlier periods are kept; later ones are withdrawn and planned again.
+        :param material: The material of the table.
+        :param mrp_table: The table, with its demand and planned delivery already updated.
+        :param start: The first period whose inputs changed.
+        """
+        for t in range(start, self.table_size):
+            if mrp_table.order_log[t] is not None:
+                release_time, quantity = mrp_table.order_log[t]
+                mrp_table.planned_order[release_time] -= quantity
+                receipt_time = self.shift_period(release_time, material.production_time)
+                if receipt_time < self.table_size:
+                    mrp_table.planned_receipt[receipt_time] -= quantity
+                mrp_table.order_log[t] = None
+            mrp_table.net_requirement[t] = 0
+
+        self.net_periods(material, mrp_table, start)
+
+    def net_periods(self, material, mrp_table, start):
+        """
+        Run the netting loop over periods start..table_size-1 of a table.
+        The latest planned order is tracked while netting instead of being searched for at
+        every shortage.
+        """
+        table_size = self.table_size
+        calendar = self.calendar
+        production_time = material.production_time
+        capacity = material.production_capacity
+        demand = mrp_table.demand
+        planned_delivery = mrp_table.planned_delivery
+        planned_receipt = mrp_table.planned_receipt
+        planned_order = mrp_table.planned_order
+        available_row = mrp_table.available
+
+        # Orders kept from the periods before start were all released before it
+        latest_planned_order_index = _last_nonzero(planned_order[:start]) if start else -1
+        available = material.stock if start == 0 else available_row[start - 1]
+
+        # Calculate net requirement, planned order, planned receipt, and availability
+        for t in range(start, table_size):
+            available += planned_delivery[t] + planned_receipt[t] - demand[t]
+            if available < 0:
+                mrp_table.net_requirement[t] = -available
+
+                # Ensure no overlapping production (shift_period written out for uniform periods)
+                if latest_planned_order_index == -1:
+                    previous_receipt = -1
+                elif calendar is None:
+                    previous_receipt = min(latest_planned_order_index + production_time, table_size)
                 else:
-                    available = (
-                        mrp_table.available[t - 1]
-                        + mrp_table.planned_delivery[t]
-                        + mrp_table.planned_receipt[t]
-                        - mrp_table.demand[t]
+                    previous_receipt = calendar.shift(latest_planned_order_index, production_time)
+                if previous_receipt <= t:
+                    # Release no earlier than the previous order's receipt
+                    if calendar is None:
+                        release_time = max(t - production_time, previous_receipt, 0)
+                        receipt_time = release_time + production_time
+                    else:
+                        release_time = max(calendar.shift(t, -production_time), previous_receipt)
+                        receipt_time = calendar.shift(release_time, production_time)
+
+                    # Create a new planned order
+                    planned_order[release_time] += capacity
+                    if planned_order[release_time] != 0:
+                        latest_planned_order_index = release_time
+                    if receipt_time < table_size:
+                        planned_receipt[receipt_time] += capacity
+                        if receipt_time == t:
+                            # Received in the period it is needed (no production time)
+                            available += capacity
+                    mrp_table.order_log[t] = (release_time, capacity)
+
+            available_row[t] = available
+
+    @staticmethod
+    def diff_tables(old_tables, new_tables):
+        """
+        Compare two sets of MRP tables cell by cell.
+        :param old_tables: The previous tables by material name.
+        :param new_tables: The new tables by material name.
+        :return: A dictionary mapping material names to lists of changed (row, period) cells,
+                 with rows numbered as in MRPTable.ROWS. Materials without changes are omitted;
+                 materials missing from old_tables have every cell listed (in a list shared
+                 between them, which must not be modified).
+        """
+        changed_cells = {}
+        all_cells = {}  # One shared list of every cell by table size, for the new materials
+        for material_name, new_table in new_tables.items():
+            old_table = old_tables.get(material_name)
+            if old_table is new_table:
+                continue
+            if old_table is None:
+                table_size = len(new_table.demand)
+                if table_size not in all_cells:
+                    all_cells[table_size] = [
+                        (row, col) for row in range(len(MRPTable.ROWS)) for col in range(table_size)
+                    ]
+                changed_cells[material_name] = all_cells[table_size]
+                continue
+
+            changes = []
+            for row, (old_values, new_values) in enumerate(zip(old_table.rows(), new_table.rows())):
+                # Rows of tables in shared memory (SharedTable) are memoryviews, which never
+                # equal a list, so they are converted once instead of compared cell by cell
+                if isinstance(old_values, memoryview):
+                    old_values = old_values.tolist()
+                if isinstance(new_values, memoryview):
+                    new_values = new_values.tolist()
+                if old_values != new_values:
+                    changes.extend(
+                        (row, col) for col, (old, new) in enumerate(zip(old_values, new_values)) if old != new
                     )
+            if changes:
+                changed_cells[material_name] = changes
+        return changed_cells
+
+    def set_planned_delivery(self, material_name, period, value):
+        """
+        Change a planned delivery and mark the tables as outdated.
+        :param material_name: The name of the material.
+        :param period: The period of the delivery.
+        :param value: The delivered quantity.
+        """
+        if material_name not in self.planned_delivery:
+            self.planned_delivery[material_name] = [0] * self.table_size
+        self.planned_delivery[material_name][period] = value
+        self.is_current = False
 
-                mrp_table.available[t] = available
+    def fork(self):
+        """
+        Return a new MRP system over copies of the planned deliveries which holds the
+        current tables. It can be recalculated on another thread while this one is still
+        read and edited, then published by replacing this one.
+        """
+        mrp_system = MRP(
+            self.bom, self.ghp, self.table_size,
+            {name: list(row) for name, row in self.planned_delivery.items()},
+            self.calendar, self.strict,
+        )
+        mrp_system.mrp_tables = self.mrp_tables
+        mrp_system.warnings = self.warnings
+        return mrp_system
 
-            # Store the MRP table
-            self.mrp_tables[material.name] = mrp_table
+    def get_availability_index(self, material_name):
+        """
+        Return a range-query index over the projected availability of a material.
+        The index is built on first use and reused until the MRP is recalculated.
+        :param material_name: The name of the material.
+        """
+        if material_name not in self.availability_indexes:
+            if material_name not in self.mrp_tables:
+                raise ValueError(f"No MRP table for material '{material_name}'. Please calculate MRP first.")
+            self.availability_indexes[material_name] = AvailabilityIndex(self.mrp_tables[material_name].available)
+        return self.availability_indexes[material_name]
 
     def display_mrp(self):
         """
@@ -234,4 +516,8 @@ if __name__ == "__main__":
     ghp_production2 = ghp_system2.get_tables()['production']
     mrp_system2 = MRP(bom, ghp_system2, table_size, planned_deliveries)
     mrp_system2.calculate_mrp()
-    mrp_system2.display_mrp()
\ No newline at end of file
+    mrp_system2.display_mrp()
+
+    # Producing tables from period 1 on is too early for the 5 periods of cumulative lead time
+    for warning in mrp_system2.warnings:
+        print("Warning:", warning)
\ No newline at end of file
@@ -0,0 +1,313 @@
+from collections import namedtuple
+from ._optional import import_numpy
+from .bom import BOM, Material
+from .ghp import GHP
+from .mrp import MRP, MRPTable
+from .snapshot import BOMSnapshot
+
+# A route for moving a material between sites; lead_time is the number of periods in transit.
+TransferLane = namedtuple("TransferLane", ["source", "target", "lead_time"])
+
+# A planned stock transfer: shipped from source in ship_period, arriving at target in arrival_period.
+Transfer = namedtuple("Transfer", ["item", "source", "target", "ship_period", "arrival_period", "quantity"])
+
+# Without transfer lanes, fewer sites than this are netted by single-site MRP runs, one per
+# site: with 200 items over 52 periods the array operations only pay off from about 25 sites
+# (see benchmarks/multisite_sites.py)
+SCALAR_SITES = 25
+
+
+class MultiSiteMRP:
+    def __init__(self, bom, table_size, sites, production, stock=None, planned_deliveries=None,
+                 production_times=None, lanes=(), scalar_sites=SCALAR_SITES):
+        """
+        Initializes MRP over several plants and warehouses sharing one BOM.
+        Every row is an array with one line per site, so a single run nets all sites.
+        Each period costs a fixed number of array operations whatever the number of sites:
+        from a few dozen sites on this beats separate single-site runs by far, while with
+        a handful of sites it is slower, so with fewer sites and no transfer lanes every
+        site is calculated by single-site MRP instead (see scalar_sites).
+        :param bom: The Bill of Materials object.
+        :param table_size: The number of time periods.
+        :param sites: The site names.
+        :param production: GHP production of the level 0 material by site name; sites
+                           without an entry produce nothing.
+        :param stock: Stock by material name and site name ({material: {site: quantity}}).
+                      Without an entry Material.stock is the stock of the first site.
+        :param planned_deliveries: Planned deliveries by material name and site name.
+        :param production_times: Production times by material name and site name, where
+                                 they differ from Material.production_time.
+        :param lanes: TransferLane routes; shortages are covered from the first lane with
+                      enough surplus before new orders are planned.
+        :param scalar_sites: Without lanes, fewer sites than this are calculated one by one
+                             with single-site MRP (see calculate_per_site); 0 always uses arrays.
+        """
+        self.np = import_numpy()
+        self.bom = bom
+        self.table_size = table_size
+        self.sites = list(sites)
+        if not self.sites:
+            raise ValueError("At least one site is required.")
+        self.site_index = {site: i for i, site in enumerate(self.sites)}
+        for site in list(production) + [lane.source for lane in lanes] + [lane.target for lane in lanes]:
+            if site not in self.site_index:
+                raise ValueError(f"Unknown site '{site}'.")
+
+        self.production = production
+        self.stock = stock or {}
+        self.planned_deliveries = planned_deliveries or {}
+        self.production_times = production_times or {}
+        self.scalar_sites = scalar_sites
+
+        # Incoming lanes of every site, as (source index, lead time)
+        self.incoming = [[] for _ in self.sites]
+        for lane in lanes:
+            if lane.source != lane.target:
+                self.incoming[self.site_index[lane.target]].append((self.site_index[lane.source], lane.lead_time))
+
+        self.results = {}
+        self.transfers = []
+
+    def site_values(self, values, default_first, default_rest):
+        """ Return a per-site vector from a {site: value} dictionary. """
+        return self.np.array(
+            [values.get(site, default_first if i == 0 else default_rest) for i, site in enumerate(self.sites)],
+            dtype=self.np.int64,
+        )
+
+    def site_rows(self, rows):
+        """ Return a (sites, periods) array from a {site: row} dictionary. """
+        array = self.np.zeros((len(self.sites), self.table_size), dtype=self.np.int64)
+        for site, row in rows.items():
+            array[self.site_index[site], :] = row[:self.table_size]
+        return array
+
+    def calculate_mrp(self):
+        """
+        Calculates the MRP arrays of all materials at all sites.
+        :return: The results by material name; each is a dictionary of (sites, periods)
+                 arrays named as in MRPTable.ROWS plus "transfer_in" and "transfer_out".
+        """
+        np = self.np
+        level_0_material = self.bom.level_0_material
+        self.results = {}
+        self.transfers = []
+        if level_0_material is None:
+            return self.results
+        if len(self.sites) < self.scalar_sites and not any(self.incoming):
+            return self.calculate_per_site()
+
+        # Level 1 demand is the GHP production of each site, offset by the site's production time
+        production = self.site_rows(self.production)
+        offsets = self.site_values(self.production_times.get(level_0_material.name, {}),
+                                   level_0_material.production_time, level_0_material.production_time)
+
+        level = list(level_0_material.children)
+        while level:
+            next_level = []
+            for material in level:
+                if material.parent == level_0_material.name:
+                    demand = np.zeros_like(production)
+                    for s, offset in enumerate(offsets):
+                        if offset < self.table_size:
+                            demand[s, :self.table_size - offset] = production[s, offset:]
+                    demand *= material.quantity_needed
+                else:
+                    demand = self.results[material.parent]["planned_order"] * material.quantity_needed
+                self.results[material.name] = self.net_material(material, demand)
+                next_level.extend(material.children)
+            level = next_level
+        return self.results
+
+    def calculate_per_site(self):
+        """
+        Calculates the same results as calculate_mrp with one single-site MRP run per site,
+        on a copy of the BOM holding the site's stock and production times. Only valid
+        without transfer lanes.
+        """
+        np = self.np
+        bom = BOMSnapshot.capture(self.bom).materialize()
+        tables = []
+        for s, site in enumerate(self.sites):
+            changed = False
+            for original, material in zip(self.bom.materials, bom.materials):
+                stock = self.stock.get(original.name, {}).get(site, original.stock if s == 0 else 0)
+                production_time = self.production_times.get(original.name, {}).get(site, original.production_time)
+                if (stock, production_time) != (material.stock, material.production_time):
+                    material.stock = stock
+                    material.production_time = production_time
+                    changed = True
+            # The copy keeps its cached lead times for the next site unless these differ
+            if changed:
+                bom.invalidate_lead_times()
+            production = self.site_rows({site: self.production[site]})[s].tolist() if site in self.production \
+                else [0] * self.table_size
+            ghp_system = GHP(bom)
+            ghp_system.calculate_ghp([0] * self.table_size, production, self.table_size)
+            planned_deliveries = {
+                name: self.site_rows({site: rows[site]})[s].tolist()
+                for name, rows in self.planned_deliveries.items() if site in rows
+            }
+            mrp_system = MRP(bom, ghp_system, self.table_size, planned_deliveries)
+            mrp_system.calculate_mrp()
+            tables.append(mrp_system.mrp_tables)
+
+        # One conversion of every value into a (sites, materials, rows, periods) array
+        names = [material.name for material in self.bom.materials if material is not self.bom.level_0_material]
+        values = np.array([[site_tables[name].rows() for name in names] for site_tables in tables], dtype=np.int64)
+        empty = np.zeros((len(self.sites), self.table_size), dtype=np.int64)
+        for i, name in enumerate(names):
+            results = {row: values[:, i, r] for r, row in enumerate(MRPTable.ROWS)}
+            results["transfer_in"] = empty
+            results["transfer_out"] = empty
+            self.results[name] = results
+        return self.results
+
+    def net_material(self, material, demand):
+        """
+        Net one material at every site in a single pass over the periods. Each period
+        updates the balances of all sites at once; sites left short are rebalanced
+        through transfer lanes, and the remaining deficits of all sites are planned as
+        new orders together, with the single-site netting rules applied as array
+        operations over the site axis.
+        """
+        np = self.np
+        size = self.table_size
+        sites = len(self.sites)
+        stock = self.site_values(self.stock.get(material.name, {}), material.stock, 0)
+        times = self.site_values(self.production_times.get(material.name, {}),
+                                 material.production_time, material.production_time)
+        capacity = material.production_capacity
+
+        delivery = self.site_rows(self.planned_deliveries.get(material.name, {}))
+        available = np.zeros((sites, size), dtype=np.int64)
+        net_requirement = np.zeros((sites, size), dtype=np.int64)
+        planned_order = np.zeros((sites, size), dtype=np.int64)
+        planned_receipt = np.zeros((sites, size), dtype=np.int64)
+        transfer_in = np.zeros((sites, size), dtype=np.int64)
+        transfer_out = np.zeros((sites, size), dtype=np.int64)
+        latest_order = np.full(sites, -1, dtype=np.int64)  # Latest period with a non-zero planned order, per site
+        lanes = any(self.incoming)
+
+        # Inputs which do not depend on the netting, for all sites and periods
+        balance = delivery - demand
+        events = np.flatnonzero(balance.any(axis=0))
+        last_event = int(events[-1]) if len(events) else -1
+
+        for t in range(size):
+            previous = stock if t == 0 else available[:, t - 1]
+            if t > last_event and (previous >= 0).all():
+                # Nothing happens any more at any site and nothing is missing
+                available[:, t:] = previous[:, None]
+                break
+            available[:, t] = previous + balance[:, t] + planned_receipt[:, t]
+            short = np.flatnonzero(available[:, t] < 0)
+            if not len(short):
+                continue
+
+            if lanes:
+                # Rebalance: take surplus which the source can spare over the whole transit
+                for s in short.tolist():
+                    deficit = -int(available[s, t])
+                    for source, lead_time in self.incoming[s]:
+                        ship = t - lead_time
+                        if ship < 0:
+                            continue
+                        quantity = min(deficit, int(available[source, ship:t + 1].min()))
+                        if quantity <= 0:
+                            continue
+                        available[source, ship:t + 1] -= quantity
+                        transfer_out[source, ship] += quantity
+                        transfer_in[s, t] += quantity
+                        available[s, t] += quantity
+                        self.transfers.append(Transfer(material.name, self.sites[source], self.sites[s], ship, t, quantity))
+                        deficit -= quantity
+                        if deficit == 0:
+                            break
+                short = short[available[short, t] < 0]
+                if not len(short):
+                    continue
+            net_requirement[short, t] = -available[short, t]
+
+            # Plan new orders for the rest, as single-site MRP does, at all short sites at once:
+            # a site orders unless the receipt of its latest order is still to come
+            latest = latest_order[short]
+            time = times[short]
+            previous_receipt = latest + time
+            ordering = (latest == -1) | (previous_receipt <= t)
+            if not ordering.all():
+                short, latest, time, previous_receipt = (
+                    short[ordering], latest[ordering], time[ordering], previous_receipt[ordering]
+                )
+                if not len(short):
+                    continue
+
+            # Released the production time before the need, but not before the latest receipt
+            release_time = np.maximum(t - time, np.where(latest == -1, 0, previous_receipt))
+            planned_order[short, release_time] += capacity
+            if capacity:
+                latest_order[short] = np.maximum(latest, release_time)
+            receipt_time = release_time + time
+            arriving = receipt_time < size
+            if arriving.all():
+                planned_receipt[short, receipt_time] += capacity
+            else:
+                planned_receipt[short[arriving], receipt_time[arriving]] += capacity
+            if arriving.any():
+                last_event = max(last_event, int(receipt_time[arriving].max()))
+            # Orders released the production time before the need arrive in time
+            available[short[receipt_time == t], t] += capacity
+
+        return {
+            "demand": demand,
+            "planned_delivery": delivery,
+            "available": available,
+            "net_requirement": net_requirement,
+            "planned_order": planned_order,
+            "planned_receipt": planned_receipt,
+            "transfer_in": transfer_in,
+            "transfer_out": transfer_out,
+        }
+
+    def site_tables(self, site):
+        """
+        Return the calculated MRP tables of one site, as single-site MRP would present
+        them. Transfers are included in the available row.
+        :param site: The site name.
+        :return: MRPTable objects by material name.
+        """
+        s = self.site_index[site]
+        tables = {}
+        for material_name, arrays in self.results.items():
+            table = MRPTable(material_name, 0)
+            for row in MRPTable.ROWS:
+                setattr(table, row, arrays[row][s].tolist())
+            tables[material_name] = table
+        return tables
+
+
+# Example of usage:
+if __name__ == "__main__":
+    table = Material(name="Table", stock=2, production_time=1)
+    countertop = Material(name="Countertop", parent="Table", quantity_needed=1, stock=22, production_time=3, production_capacity=40)
+    legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+    table.add_child(countertop)
+    table.add_child(legs)
+    bom = BOM()
+    bom.add_material(table)
+    bom.add_material(countertop)
+    bom.add_material(legs)
+
+    # Two plants build tables; the warehouse only holds legs and ships them in one period
+    mrp_system = MultiSiteMRP(
+        bom, 10, ["Plant A", "Plant B", "Warehouse"],
+        production={"Plant A": [0, 0, 0, 0, 28, 0, 30, 0, 0, 0], "Plant B": [0, 0, 0, 10, 0, 0, 0, 0, 20, 0]},
+        stock={"Legs": {"Plant A": 40, "Warehouse": 200}},
+        production_times={"Legs": {"Plant B": 1}},
+        lanes=[TransferLane("Warehouse", "Plant A", 1), TransferLane("Warehouse", "Plant B", 1)],
+    )
+    mrp_system.calculate_mrp()
+    for site in mrp_system.sites:
+        print(f"{site} - Legs planned order:", mrp_system.site_tables(site)["Legs"].planned_order)
+    for transfer in mrp_system.transfers:
+        print(transfer)
@@ -0,0 +1,167 @@
+import csv
+import queue
+from collections import namedtuple
+from .bom import BOM, Material
+from .ghp import GHP
+from .mrp import MRP
+from .snapshot import BOMSnapshot
+
+# A posted inventory movement. kind is "receipt" or "issue" (delta added to the planned
+# delivery of the period; issues carry a negative delta) or "stock" (delta added to the
+# on-hand stock; the period is ignored).
+InventoryTransaction = namedtuple("InventoryTransaction", ["item", "period", "delta", "kind"], defaults=["receipt"])
+
+# One entry of the delta feed: the planned order of an item in a period changed from old to new.
+PlannedOrderChange = namedtuple("PlannedOrderChange", ["item", "period", "old", "new"])
+
+TRANSACTION_KINDS = ("receipt", "issue", "stock")
+
+
+def read_transactions(path):
+    """
+    Stream transactions from a CSV file with lines: item,period,delta[,kind].
+    Periods are zero-based indexes of the MRP tables. A header line is skipped.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        for line_number, fields in enumerate(csv.reader(file), start=1):
+            if not fields or fields[0].startswith("#"):
+                continue
+            try:
+                period, delta = int(fields[1]), int(fields[2])
+            except (IndexError, ValueError):
+                if line_number == 1:
+                    continue  # Header
+                raise ValueError(f"Invalid transaction on line {line_number} of {path}: {fields}")
+            kind = fields[3].strip() if len(fields) > 3 and fields[3].strip() else "receipt"
+            yield InventoryTransaction(fields[0].strip(), period, delta, kind)
+
+
+def queue_transactions(transaction_queue, timeout=None):
+    """
+    Stream transactions from a queue.Queue until None is received (or the timeout expires).
+    """
+    while True:
+        try:
+            transaction = transaction_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        if transaction is None:
+            return
+        yield transaction
+
+
+class NetChangeMRP:
+    def __init__(self, mrp_system):
+        """
+        Initializes net-change planning on top of a calculated MRP system.
+        The MRP system gets its own copies of the tables, the planned deliveries and the
+        BOM, which are then updated in place; transactions never change the caller's
+        tables, delivery rows or materials.
+        :param mrp_system: The MRP system (calculated if it is not current).
+        """
+        self.mrp_system = mrp_system
+        if not mrp_system.is_current:
+            mrp_system.calculate_mrp()
+
+        # Tables may be shared with a plan cache, so net-change works on copies
+        mrp_system.replace_tables({name: table.copy() for name, table in mrp_system.mrp_tables.items()})
+
+        # The caller may keep the planned deliveries (e.g. the GUI inputs), so receipts are posted to a copy
+        mrp_system.planned_delivery = {name: list(row) for name, row in mrp_system.planned_delivery.items()}
+
+        # The BOM may be shown and edited elsewhere, so stock is netted on a copy
+        mrp_system.bom = BOMSnapshot.capture(mrp_system.bom).materialize()
+        self.materials = {material.name: material for material in mrp_system.bom.materials}
+
+    def apply(self, transaction):
+        """
+        Apply one transaction and re-net the affected item and periods down the BOM.
+        :param transaction: An InventoryTransaction.
+        :return: The list of PlannedOrderChange entries caused by the transaction.
+        """
+        mrp = self.mrp_system
+        material = self.materials.get(transaction.item)
+        if material is None:
+            raise ValueError(f"Unknown item '{transaction.item}'.")
+        if material.parent is None:
+            raise ValueError(f"Item '{transaction.item}' is the level 0 material; its stock is planned by GHP.")
+        if transaction.kind not in TRANSACTION_KINDS:
+            raise ValueError(f"Unknown transaction kind '{transaction.kind}'.")
+
+        table = mrp.mrp_tables[material.name]
+        if transaction.kind == "stock":
+            material.stock += transaction.delta
+            mrp.bom.invalidate_lead_times()
+            start = 0
+        else:
+            if not 0 <= transaction.period < mrp.table_size:
+                raise ValueError(f"Period {transaction.period} is outside of the planning horizon.")
+            start = transaction.period
+            table.planned_delivery[start] += transaction.delta
+            mrp.planned_delivery.setdefault(material.name, [0] * mrp.table_size)
+            mrp.planned_delivery[material.name][start] += transaction.delta
+
+        changes = []
+        pending = [(material, start)]
+        while pending:
+            material, start = pending.pop()
+            table = mrp.mrp_tables[material.name]
+            old_orders = list(table.planned_order)
+            mrp.renet_material(material, table, start)
+            mrp.availability_indexes.pop(material.name, None)
+
+            changed_periods = [t for t, (old, new) in enumerate(zip(old_orders, table.planned_order)) if old != new]
+            changes.extend(
+                PlannedOrderChange(material.name, t, old_orders[t], table.planned_order[t]) for t in changed_periods
+            )
+            if not changed_periods:
+                continue
+
+            # Components see the changed orders as changed demand
+            first_changed = changed_periods[0]
+            for child in material.children:
+                child_table = mrp.mrp_tables[child.name]
+                for t in changed_periods:
+                    child_table.demand[t] = table.planned_order[t] * child.quantity_needed
+                pending.append((child, first_changed))
+
+        return changes
+
+    def run(self, transactions):
+        """
+        Apply a stream of transactions.
+        :param transactions: Any iterable of InventoryTransaction (e.g. read_transactions or queue_transactions).
+        :return: A generator yielding (transaction, changes) for every applied transaction.
+        """
+        for transaction in transactions:
+            yield transaction, self.apply(transaction)
+
+
+# Example of usage:
+if __name__ == "__main__":
+    table = Material(name="Table", stock=2, production_time=1)
+    countertop = Material(name="Countertop", parent="Table", quantity_needed=1, stock=22, production_time=3, production_capacity=40)
+    wooden_plate = Material(name="Wooden Plate", parent="Countertop", quantity_needed=1, stock=10, production_time=1, production_capacity=50)
+    legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+    table.add_child(countertop)
+    table.add_child(legs)
+    countertop.add_child(wooden_plate)
+    bom = BOM()
+    bom.add_material(table)
+    bom.add_material(countertop)
+    bom.add_material(wooden_plate)
+    bom.add_material(legs)
+
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp([0, 0, 0, 0, 20, 0, 40, 0, 0, 0], [0, 0, 0, 0, 28, 0, 30, 0, 0, 0], 10)
+    mrp_system = MRP(bom, ghp_system, 10, {})
+
+    net_change = NetChangeMRP(mrp_system)
+    transactions = [
+        InventoryTransaction("Countertop", 0, 10, "stock"),  # Stock count found 10 more countertops
+        InventoryTransaction("Legs", 3, 80, "receipt"),  # Legs delivered by a supplier
+    ]
+    for transaction, changes in net_change.run(transactions):
+        print(transaction)
+        for change in changes:
+            print("  ", change)
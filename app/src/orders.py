@@ -0,0 +1,133 @@
+import io
+from ._optional import import_numpy
+from .bom import BOM, Material
+from .buckets import BucketCalendar
+from .ghp import GHP
+
+# Bytes read from the order file per chunk
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+def _read_blocks(path, chunk_bytes):
+    """ Yield blocks of whole lines from a text file. """
+    with open(path, "rb") as file:
+        rest = b""
+        while True:
+            data = file.read(chunk_bytes)
+            if not data:
+                break
+            data = rest + data
+            end = data.rfind(b"\n")
+            if end == -1:
+                rest = data
+                continue
+            rest = data[end + 1:]
+            yield data[:end + 1]
+        if rest.strip():
+            yield rest
+
+
+def aggregate_orders(path, table_size=None, calendar=None, item=None, chunk_bytes=CHUNK_BYTES):
+    """
+    Stream customer order lines from a CSV file and sum them into GHP demand periods.
+    Each line is "item,day,quantity", where day is the zero-based day of the horizon
+    (equal to the period index when there is no calendar). A header line is skipped.
+    Lines are parsed and scattered into periods in NumPy arrays chunk by chunk, never as
+    Python objects per line. Orders outside the horizon are ignored.
+    :param path: The order file.
+    :param table_size: The number of periods (required without a calendar).
+    :param calendar: Optional BucketCalendar mapping days to buckets.
+    :param item: Only count lines of this item; all lines when None.
+    :param chunk_bytes: Size of the blocks read from the file.
+    :return: The demand for each period, as a list.
+    """
+    np = import_numpy()
+    if calendar is not None:
+        table_size = len(calendar)
+        starts = np.asarray(calendar.starts, dtype=np.int64)
+        horizon = calendar.horizon
+    elif table_size is None:
+        raise ValueError("Either table_size or calendar is required.")
+    else:
+        horizon = table_size
+
+    demand = np.zeros(table_size, dtype=np.int64)
+    first_block = True
+    for block in _read_blocks(path, chunk_bytes):
+        text = block.decode("utf-8")
+        if first_block:
+            first_block = False
+            first_line, _, rest = text.partition("\n")
+            fields = first_line.split(",")
+            if len(fields) > 1 and not fields[1].strip().lstrip("-").isdigit():
+                text = rest  # Header
+
+        # loadtxt warns about input without data (e.g. a block holding only the header)
+        if not text.strip():
+            continue
+
+        if item is None:
+            columns = np.loadtxt(io.StringIO(text), delimiter=",", usecols=(1, 2), dtype=np.int64, ndmin=2)
+            days, quantities = columns[:, 0], columns[:, 1]
+        else:
+            columns = np.loadtxt(
+                io.StringIO(text), delimiter=",", ndmin=1,
+                dtype=[("item", "U128"), ("day", np.int64), ("quantity", np.int64)],
+            )
+            selected = np.char.strip(columns["item"]) == item
+            days, quantities = columns["day"][selected], columns["quantity"][selected]
+
+        inside = (days >= 0) & (days < horizon)
+        days, quantities = days[inside], quantities[inside]
+        if calendar is not None:
+            periods = np.searchsorted(starts, days, side="right") - 1
+        else:
+            periods = days
+
+        # Scatter-add the quantities into their periods
+        np.add.at(demand, periods, quantities)
+
+    return demand.tolist()
+
+
+def calculate_ghp_from_orders(ghp_system, path, production=None, table_size=None, calendar=None, item=None):
+    """
+    Aggregate an order file into GHP demand and calculate the GHP.
+    :param ghp_system: The GHP object.
+    :param path: The order file (see aggregate_orders).
+    :param production: The production row; zeros when None.
+    :param table_size: The number of periods (taken from the calendar if given).
+    :param calendar: Optional BucketCalendar.
+    :param item: Only count lines of this item; all lines when None.
+    :return: The demand list (the availability is stored in the GHP).
+    """
+    demand = aggregate_orders(path, table_size, calendar, item)
+    if production is None:
+        production = [0] * len(demand)
+    ghp_system.calculate_ghp(demand, production, len(demand))
+    return demand
+
+
+# Example of usage:
+if __name__ == "__main__":
+    import os
+    import random
+    import tempfile
+    import time
+
+    path = os.path.join(tempfile.gettempdir(), "orders.csv")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("item,day,quantity\n")
+        for _ in range(1_000_000):
+            file.write(f"Table,{random.randrange(730)},{random.randint(1, 5)}\n")
+
+    bom = BOM()
+    bom.add_material(Material(name="Table", stock=2, production_time=1))
+    ghp_system = GHP(bom)
+
+    calendar = BucketCalendar.for_horizon(730)
+    start = time.perf_counter()
+    demand = calculate_ghp_from_orders(ghp_system, path, calendar=calendar, item="Table")
+    print(f"Aggregated 1,000,000 order lines into {len(demand)} buckets in {time.perf_counter() - start:.2f} s")
+    print("Demand of the first 3 buckets:", demand[:3])
+    os.remove(path)
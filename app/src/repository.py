@@ -0,0 +1,398 @@
+import json
+import sqlite3
+import time
+from .bom import BOM, Material
+from .buckets import BucketCalendar
+from .ghp import GHP
+from .mrp import MRP, MRPTable
+from .session import fingerprint
+from .snapshot import BOMSnapshot
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boms (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    created_at REAL NOT NULL,
+    fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS materials (
+    bom_id INTEGER NOT NULL REFERENCES boms(id),
+    name TEXT NOT NULL,
+    stock INTEGER NOT NULL,
+    production_time INTEGER NOT NULL,
+    production_capacity INTEGER NOT NULL,
+    PRIMARY KEY (bom_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS bom_edges (
+    bom_id INTEGER NOT NULL REFERENCES boms(id),
+    parent TEXT NOT NULL,
+    child TEXT NOT NULL,
+    quantity_needed INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (bom_id, parent, child)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bom_edges_child ON bom_edges (bom_id, child);
+CREATE TABLE IF NOT EXISTS plan_runs (
+    id INTEGER PRIMARY KEY,
+    bom_id INTEGER NOT NULL REFERENCES boms(id),
+    table_size INTEGER NOT NULL,
+    calendar TEXT,
+    note TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plan_runs_bom ON plan_runs (bom_id);
+CREATE TABLE IF NOT EXISTS ghp_rows (
+    run_id INTEGER NOT NULL REFERENCES plan_runs(id),
+    period INTEGER NOT NULL,
+    demand INTEGER NOT NULL,
+    production INTEGER NOT NULL,
+    availability INTEGER NOT NULL,
+    PRIMARY KEY (run_id, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mrp_cells (
+    run_id INTEGER NOT NULL REFERENCES plan_runs(id),
+    item TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    demand INTEGER NOT NULL,
+    planned_delivery INTEGER NOT NULL,
+    available INTEGER NOT NULL,
+    net_requirement INTEGER NOT NULL,
+    planned_order INTEGER NOT NULL,
+    planned_receipt INTEGER NOT NULL,
+    PRIMARY KEY (run_id, item, period)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mrp_cells_period ON mrp_cells (run_id, period);
+"""
+
+# Databases created before BOMs had fingerprints get the column on opening
+MIGRATIONS = (
+    ("boms", "fingerprint", "ALTER TABLE boms ADD COLUMN fingerprint TEXT"),
+)
+INDEXES = """
+CREATE INDEX IF NOT EXISTS boms_fingerprint ON boms (fingerprint);
+"""
+
+MEASURES = ", ".join(MRPTable.ROWS)
+
+# Materials reachable from a root, parents before children in depth-first order
+SUBTREE_QUERY = """
+WITH RECURSIVE subtree(name, parent, quantity_needed, path) AS (
+    SELECT ?, NULL, 0, ''
+    UNION ALL
+    SELECT e.child, e.parent, e.quantity_needed, s.path || printf('%06d', e.position)
+    FROM bom_edges e JOIN subtree s ON e.bom_id = ? AND e.parent = s.name
+)
+SELECT s.name, s.parent, s.quantity_needed, m.stock, m.production_time, m.production_capacity
+FROM subtree s JOIN materials m ON m.bom_id = ? AND m.name = s.name
+ORDER BY s.path
+"""
+
+# Cells whose values differ between two runs, or which exist in one run only
+DIFF_QUERY = f"""
+SELECT n.item, n.period, {", ".join(f"o.{m}" for m in MRPTable.ROWS)}, {", ".join(f"n.{m}" for m in MRPTable.ROWS)}
+FROM mrp_cells n LEFT JOIN mrp_cells o ON o.run_id = :old AND o.item = n.item AND o.period = n.period
+WHERE n.run_id = :new AND (o.item IS NULL OR {" OR ".join(f"o.{m} != n.{m}" for m in MRPTable.ROWS)})
+UNION ALL
+SELECT o.item, o.period, {", ".join(f"o.{m}" for m in MRPTable.ROWS)}, {", ".join("NULL" for _ in MRPTable.ROWS)}
+FROM mrp_cells o
+WHERE o.run_id = :old AND NOT EXISTS (
+    SELECT 1 FROM mrp_cells n WHERE n.run_id = :new AND n.item = o.item AND n.period = o.period
+)
+ORDER BY 1, 2
+"""
+
+
+def bom_fingerprint(bom):
+    """ Return the content hash of a BOM, under which its saved version is found again. """
+    return fingerprint(BOMSnapshot.capture(bom)).hex()
+
+
+class PlanRepository:
+    def __init__(self, path=":memory:"):
+        """
+        Opens (and creates if needed) a SQLite database of BOMs and plan runs.
+        Every save is one transaction of batched inserts; reads go through the
+        primary keys and indexes, so loading part of a BOM or comparing two runs
+        never reads whole plans.
+        :param path: The database file, or ":memory:".
+        """
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        for table, column, statement in MIGRATIONS:
+            columns = [row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")]
+            if column not in columns:
+                self.connection.execute(statement)
+        self.connection.executescript(INDEXES)
+
+    def close(self):
+        """ Close the database. """
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _insert_bom(self, bom, name):
+        cursor = self.connection.execute(
+            "INSERT INTO boms (name, created_at, fingerprint) VALUES (?, ?, ?)",
+            (name, time.time(), bom_fingerprint(bom)),
+        )
+        bom_id = cursor.lastrowid
+        self.connection.executemany(
+            "INSERT INTO materials VALUES (?, ?, ?, ?, ?)",
+            ((bom_id, m.name, m.stock, m.production_time, m.production_capacity) for m in bom.materials),
+        )
+        self.connection.executemany(
+            "INSERT INTO bom_edges VALUES (?, ?, ?, ?, ?)",
+            (
+                (bom_id, material.name, child.name, child.quantity_needed, position)
+                for material in bom.materials
+                for position, child in enumerate(material.children)
+            ),
+        )
+        return bom_id
+
+    def save_bom(self, bom, name=None):
+        """
+        Save a BOM as a new version.
+        :param bom: The Bill of Materials object.
+        :param name: Optional name of the version.
+        :return: The id of the saved BOM.
+        """
+        with self.connection:
+            return self._insert_bom(bom, name)
+
+    def find_bom(self, bom):
+        """
+        Return the id of the latest saved BOM version with the same content, or None.
+        :param bom: The Bill of Materials object.
+        """
+        row = self.connection.execute(
+            "SELECT id FROM boms WHERE fingerprint = ? ORDER BY id DESC LIMIT 1", (bom_fingerprint(bom),)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def load_bom(self, bom_id, root=None):
+        """
+        Load a saved BOM, or only the subtree below one of its materials.
+        :param bom_id: The id of the BOM.
+        :param root: Name of the material to start from (becomes level 0); the level 0
+                     material of the saved BOM when None.
+        :return: A new BOM object.
+        """
+        if root is None:
+            row = self.connection.execute(
+                "SELECT name FROM materials m WHERE bom_id = ? AND NOT EXISTS "
+                "(SELECT 1 FROM bom_edges e WHERE e.bom_id = m.bom_id AND e.child = m.name)",
+                (bom_id,),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"No BOM with id {bom_id}.")
+            root = row[0]
+
+        bom = BOM()
+        by_name = {}
+        for name, parent, quantity_needed, stock, production_time, production_capacity in self.connection.execute(
+            SUBTREE_QUERY, (root, bom_id, bom_id)
+        ):
+            material = Material(name, parent, quantity_needed, stock, production_time, production_capacity)
+            if parent is not None:
+                by_name[parent].add_child(material)
+            bom.add_material(material)
+            by_name[name] = material
+        if not by_name:
+            raise ValueError(f"Material '{root}' is not part of BOM {bom_id}.")
+        return bom
+
+    def save_plan(self, mrp_system, bom_id=None, note=None):
+        """
+        Save the GHP and MRP tables of a calculated MRP system as a new plan run.
+        :param mrp_system: The calculated MRP system.
+        :param bom_id: The id of an already saved BOM version. When None, the saved version
+                       with the same content is used, and the BOM is only stored if there
+                       is none yet.
+        :param note: Optional description of the run.
+        :return: The id of the plan run.
+        """
+        if not mrp_system.is_current:
+            mrp_system.calculate_mrp()
+        table_size = mrp_system.table_size
+        calendar = json.dumps(mrp_system.calendar.lengths) if mrp_system.calendar is not None else None
+
+        with self.connection:
+            if bom_id is None:
+                bom_id = self.find_bom(mrp_system.bom)
+            if bom_id is None:
+                bom_id = self._insert_bom(mrp_system.bom, None)
+            cursor = self.connection.execute(
+                "INSERT INTO plan_runs (bom_id, table_size, calendar, note, created_at) VALUES (?, ?, ?, ?, ?)",
+                (bom_id, table_size, calendar, note, time.time()),
+            )
+            run_id = cursor.lastrowid
+
+            ghp_tables = mrp_system.ghp.get_tables()
+            self.connection.executemany(
+                "INSERT INTO ghp_rows VALUES (?, ?, ?, ?, ?)",
+                (
+                    (run_id, t, demand, production, availability)
+                    for t, (demand, production, availability) in enumerate(
+                        zip(ghp_tables["demand"], ghp_tables["production"], ghp_tables["availability"])
+                    )
+                ),
+            )
+            self.connection.executemany(
+                f"INSERT INTO mrp_cells (run_id, item, period, {MEASURES}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (run_id, material_name, t, *values)
+                    for material_name, table in mrp_system.mrp_tables.items()
+                    for t, values in enumerate(zip(*table.rows()))
+                ),
+            )
+        return run_id
+
+    def list_runs(self, bom_id=None):
+        """
+        Return the saved plan runs, newest first.
+        :param bom_id: Only runs of this BOM version when given.
+        :return: A list of (run id, BOM id, table size, note, creation time) tuples.
+        """
+        query = "SELECT id, bom_id, table_size, note, created_at FROM plan_runs"
+        if bom_id is not None:
+            return self.connection.execute(query + " WHERE bom_id = ? ORDER BY id DESC", (bom_id,)).fetchall()
+        return self.connection.execute(query + " ORDER BY id DESC").fetchall()
+
+    def _run(self, run_id):
+        row = self.connection.execute(
+            "SELECT bom_id, table_size, calendar FROM plan_runs WHERE id = ?", (run_id,)
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"No plan run with id {run_id}.")
+        return row
+
+    def load_tables(self, run_id, material_names=None, first_period=0, last_period=None):
+        """
+        Load saved MRP tables, optionally only some materials or a window of periods.
+        :param run_id: The id of the plan run.
+        :param material_names: Names of the materials to load; all when None.
+        :param first_period: The first period to load.
+        :param last_period: The last period to load (inclusive); the end of the horizon when None.
+        :return: MRPTable objects by material name, holding the selected periods.
+        """
+        _, table_size, _ = self._run(run_id)
+        if last_period is None:
+            last_period = table_size - 1
+        query = f"SELECT item, {MEASURES} FROM mrp_cells WHERE run_id = ? AND item = ? AND period BETWEEN ? AND ? ORDER BY period"
+        if material_names is None:
+            material_names = [row[0] for row in self.connection.execute(
+                "SELECT DISTINCT item FROM mrp_cells WHERE run_id = ?", (run_id,)
+            )]
+
+        mrp_tables = {}
+        for material_name in material_names:
+            rows = self.connection.execute(query, (run_id, material_name, first_period, last_period)).fetchall()
+            if not rows:
+                continue
+            table = MRPTable(material_name, 0)
+            for measure, values in zip(MRPTable.ROWS, list(zip(*rows))[1:]):
+                setattr(table, measure, list(values))
+            mrp_tables[material_name] = table
+        return mrp_tables
+
+    def load_plan(self, run_id):
+        """
+        Rebuild a saved plan run as an MRP system with its BOM, GHP and tables.
+        :param run_id: The id of the plan run.
+        :return: The MRP system (current, so it is not recalculated).
+        """
+        bom_id, table_size, calendar = self._run(run_id)
+        bom = self.load_bom(bom_id)
+        rows = self.connection.execute(
+            "SELECT demand, production FROM ghp_rows WHERE run_id = ? ORDER BY period", (run_id,)
+        ).fetchall()
+        demand = [row[0] for row in rows]
+        production = [row[1] for row in rows]
+        ghp_system = GHP(bom)
+        ghp_system.calculate_ghp(demand, production, table_size)
+
+        mrp_tables = self.load_tables(run_id)
+        planned_deliveries = {name: list(table.planned_delivery) for name, table in mrp_tables.items()}
+        calendar = BucketCalendar(json.loads(calendar)) if calendar is not None else None
+        mrp_system = MRP(bom, ghp_system, table_size, planned_deliveries, calendar)
+        mrp_system.replace_tables(mrp_tables)
+        return mrp_system
+
+    def diff_runs(self, old_run_id, new_run_id):
+        """
+        Compare the MRP tables of two plan runs inside the database.
+        :param old_run_id: The id of the earlier run.
+        :param new_run_id: The id of the later run.
+        :return: A list of (item, period, measure, old value, new value) for every changed
+                 cell, with None for cells which exist in one of the runs only.
+        """
+        changes = []
+        count = len(MRPTable.ROWS)
+        for row in self.connection.execute(DIFF_QUERY, {"old": old_run_id, "new": new_run_id}):
+            item, period = row[0], row[1]
+            old_values, new_values = row[2:2 + count], row[2 + count:]
+            changes.extend(
+                (item, period, measure, old, new)
+                for measure, old, new in zip(MRPTable.ROWS, old_values, new_values)
+                if old != new
+            )
+        return changes
+
+
+# Example of usage:
+if __name__ == "__main__":
+    table = Material(name="Table", stock=2, production_time=1)
+    countertop = Material(name="Countertop", parent="Table", quantity_needed=1, stock=22, production_time=3, production_capacity=40)
+    wooden_plate = Material(name="Wooden Plate", parent="Countertop", quantity_needed=1, stock=10, production_time=1, production_capacity=50)
+    legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+    table.add_child(countertop)
+    table.add_child(legs)
+    countertop.add_child(wooden_plate)
+    bom = BOM()
+    bom.add_material(table)
+    bom.add_material(countertop)
+    bom.add_material(wooden_plate)
+    bom.add_material(legs)
+
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp([0, 0, 0, 0, 20, 0, 40, 0, 0, 0], [0, 0, 0, 0, 28, 0, 30, 0, 0, 0], 10)
+
+    with PlanRepository() as repository:
+        bom_id = repository.save_bom(bom, "Table v1")
+        mrp_system = MRP(bom, ghp_system, 10, {})
+        first_run = repository.save_plan(mrp_system, bom_id, "No deliveries")
+        mrp_system = MRP(bom, ghp_system, 10, {"Wooden Plate": [30, 0, 0, 0, 0, 0, 0, 0, 0, 0]})
+        second_run = repository.save_plan(mrp_system, bom_id, "Wooden plates delivered")
+
+        # Runs saved without a BOM id share the stored version of the same content
+        third_run = repository.save_plan(mrp_system, note="Same BOM")
+        print(f"Run {third_run} uses BOM {repository.list_runs()[0][1]}, the one saved as 'Table v1' ({bom_id})")
+
+        print("Countertop subtree:", [m.name for m in repository.load_bom(bom_id, "Countertop").materials])
+        for change in repository.diff_runs(first_run, second_run):
+            print(change)
+
+        # Bulk write: 1000 items x 1000 periods
+        big_bom = BOM()
+        root = Material(name="Root", production_time=0)
+        big_bom.add_material(root)
+        for i in range(1000):
+            item = Material(name=f"Item {i}", parent="Root", quantity_needed=1, stock=i, production_time=1, production_capacity=10)
+            root.add_child(item)
+            big_bom.add_material(item)
+        big_ghp = GHP(big_bom)
+        big_ghp.calculate_ghp([0] * 1000, [i % 7 for i in range(1000)], 1000)
+        big_mrp = MRP(big_bom, big_ghp, 1000, {})
+        big_mrp.calculate_mrp()
+        start = time.perf_counter()
+        repository.save_plan(big_mrp, note="1M cells")
+        print(f"Saved 1,000,000 MRP cells in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,191 @@
+import hashlib
+from collections import OrderedDict
+from .bom import BOM, Material
+from .ghp import GHP
+from .mrp import MRP, CalculationCancelled
+
+
+def fingerprint(value):
+    """ Return a short content hash of a value built from numbers, strings, tuples and lists. """
+    return hashlib.blake2b(repr(value).encode(), digest_size=16).digest()
+
+
+def estimate_table_bytes(table):
+    """ Rough memory footprint of an MRPTable (list objects plus their integers). """
+    return sum(56 + 36 * len(row) for row in table.rows())
+
+
+class PlanningSession:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        """
+        Initializes a planning session which caches calculated MRP tables.
+        Whole plans are cached by a fingerprint of all inputs, and single tables by a
+        fingerprint of the material and its demand, so a partially changed BOM reuses
+        the tables of every subtree whose inputs did not change.
+        :param max_bytes: Approximate memory bound of the cache; least recently used entries are evicted.
+        """
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()  # key -> (value, size in bytes)
+        self.cache_bytes = 0
+        self.plan_hits = 0
+        self.table_hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        self.cache.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        if key in self.cache:
+            self.cache_bytes -= self.cache.pop(key)[1]
+        self.cache[key] = (value, size)
+        self.cache_bytes += size
+
+        # Evict least recently used entries
+        while self.cache_bytes > self.max_bytes:
+            _, (_, old_size) = self.cache.popitem(last=False)
+            self.cache_bytes -= old_size
+
+    def clear(self):
+        """ Drop all cached results. """
+        self.cache.clear()
+        self.cache_bytes = 0
+
+    @staticmethod
+    def material_fingerprint(material, planned_delivery):
+        """ Fingerprint of everything besides demand that the MRP table of a material depends on. """
+        return fingerprint((
+            material.name,
+            material.parent,
+            material.quantity_needed,
+            material.stock,
+            material.production_time,
+            material.production_capacity,
+            tuple(planned_delivery) if planned_delivery is not None else None,
+        ))
+
+    def material_fingerprints(self, mrp_system):
+        """ Return the material fingerprint of every material of an MRP system, by name. """
+        return {
+            material.name: self.material_fingerprint(material, mrp_system.planned_delivery.get(material.name))
+            for material in mrp_system.bom.materials
+        }
+
+    def plan_fingerprint(self, mrp_system, material_keys=None):
+        """
+        Fingerprint of all inputs of an MRP calculation.
+        :param material_keys: The result of material_fingerprints, if already known.
+        """
+        if material_keys is None:
+            material_keys = self.material_fingerprints(mrp_system)
+        production = mrp_system.ghp.get_production()
+        materials = tuple(
+            (material_keys[material.name], tuple(child.name for child in material.children))
+            for material in mrp_system.bom.materials
+        )
+        return fingerprint((mrp_system.table_size, self.calendar_key(mrp_system), tuple(production), materials))
+
+    @staticmethod
+    def calendar_key(mrp_system):
+        """ The bucket lengths of the MRP calendar (None for uniform periods). """
+        return mrp_system.calendar.lengths if mrp_system.calendar is not None else None
+
+    def calculate_tables(self, mrp_system, is_cancelled=None):
+        """
+        Calculate the MRP tables of an MRP system, reusing cached results where possible.
+        The returned tables may be shared with other plans and must not be modified.
+        :param mrp_system: The MRP system holding the BOM, GHP, table size and planned deliveries.
+        :param is_cancelled: Optional callable; when it returns True the calculation stops with CalculationCancelled.
+        :return: The MRP tables by material name.
+        """
+        material_keys = self.material_fingerprints(mrp_system)
+        plan_key = ("plan", self.plan_fingerprint(mrp_system, material_keys))
+        cached_plan = self._get(plan_key)
+        if cached_plan is not None:
+            self.plan_hits += 1
+            return dict(cached_plan)
+
+        mrp_tables = {}
+        size = 0
+        for material in mrp_system.order_bom_by_level():
+            if is_cancelled is not None and is_cancelled():
+                raise CalculationCancelled("MRP calculation cancelled.")
+            if material.parent is None:
+                continue
+
+            demand = mrp_system.calculate_demand(material, mrp_tables)
+            table_key = (
+                "table",
+                material_keys[material.name],
+                fingerprint((self.calendar_key(mrp_system), demand)),
+            )
+            mrp_table = self._get(table_key)
+            if mrp_table is None:
+                self.misses += 1
+                mrp_table = mrp_system.net_material(material, demand)
+                self._put(table_key, mrp_table, estimate_table_bytes(mrp_table))
+            else:
+                self.table_hits += 1
+
+            mrp_tables[material.name] = mrp_table
+            size += estimate_table_bytes(mrp_table)
+
+        self._put(plan_key, dict(mrp_tables), size)
+        return mrp_tables
+
+    def recalculate(self, mrp_system, is_cancelled=None):
+        """
+        Recalculate an MRP system through the cache.
+        :return: The cells that differ from the previous tables (see MRP.diff_tables).
+        """
+        mrp_system.check_lead_times()
+        return mrp_system.replace_tables(self.calculate_tables(mrp_system, is_cancelled))
+
+    def create_plan(self, bom, demand, production, table_size, planned_deliveries, is_cancelled=None, calendar=None):
+        """
+        Calculate GHP and MRP for the given inputs.
+        :param bom: The Bill of Materials object.
+        :param demand: GHP demand of the level 0 material.
+        :param production: GHP production of the level 0 material.
+        :param table_size: The number of time periods.
+        :param planned_deliveries: Planned deliveries by material name.
+        :param is_cancelled: Optional cancellation callable.
+        :param calendar: Optional BucketCalendar of the periods.
+        :return: An MRP system with calculated tables.
+        """
+        ghp_system = GHP(bom)
+        ghp_system.calculate_ghp(demand, production, table_size)
+        mrp_system = MRP(bom, ghp_system, table_size, planned_deliveries, calendar)
+        self.recalculate(mrp_system, is_cancelled)
+        return mrp_system
+
+
+# Example of usage:
+if __name__ == "__main__":
+    table = Material(name="Table", stock=2, production_time=1)
+    countertop = Material(name="Countertop", parent="Table", quantity_needed=1, stock=22, production_time=3, production_capacity=40)
+    legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+    table.add_child(countertop)
+    table.add_child(legs)
+    bom = BOM()
+    bom.add_material(table)
+    bom.add_material(countertop)
+    bom.add_material(legs)
+
+    session = PlanningSession()
+    demand = [0, 0, 0, 0, 20, 0, 40, 0, 0, 0]
+    production = [0, 0, 0, 0, 28, 0, 30, 0, 0, 0]
+    session.create_plan(bom, demand, production, 10, {})
+
+    # Changing the planned delivery of Legs reuses the Countertop table
+    session.create_plan(bom, demand, production, 10, {"Legs": [0, 0, 0, 50, 0, 0, 0, 0, 0, 0]})
+
+    # Reverting to the first input is answered from the plan cache
+    mrp_system = session.create_plan(bom, demand, production, 10, {})
+    mrp_system.display_mrp()
+    print(f"Plan hits: {session.plan_hits}, table hits: {session.table_hits}, misses: {session.misses}")
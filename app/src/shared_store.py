@@ -0,0 +1,276 @@
+import json
+import os
+import struct
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+from .bom import BOM, Material
+from .ghp import GHP
+from .mrp import MRP, MRPTable
+
+# Block layout:
+#   header:  magic (8 bytes), item count, measure count, period count, index length (4 x int64)
+#   index:   UTF-8 JSON list of item names, padded to a multiple of 8 bytes
+#   data:    int64 values ordered item x measure x period (measures as in MRPTable.ROWS)
+MAGIC = b"MRPSHM01"
+HEADER = struct.Struct("<8s4q")
+VALUE_FORMAT = "q"
+VALUE_SIZE = 8
+
+
+class SharedTable:
+    """Read-only view of one material's MRP table inside a shared memory block.
+
+    Rows are memoryview slices of the block, so reading them never copies the
+    data. It offers the same row attributes as MRPTable.
+    """
+
+    def __init__(self, material_name, values, table_size):
+        self.material_name = material_name
+        self._values = values
+        self._table_size = table_size
+
+    def row(self, measure):
+        """ Return a zero-copy row by its position in MRPTable.ROWS. """
+        start = measure * self._table_size
+        return self._values[start:start + self._table_size]
+
+    def rows(self):
+        """ Return the table rows in display order. """
+        return [self.row(measure) for measure in range(len(MRPTable.ROWS))]
+
+    def __getattr__(self, name):
+        if name in MRPTable.ROWS:
+            return self.row(MRPTable.ROWS.index(name))
+        raise AttributeError(name)
+
+
+class SharedPlanView:
+    """A plan mapped from a shared memory block created by write_shared_plan."""
+
+    def __init__(self, name):
+        """
+        Attach to an existing block.
+        :param name: The name of the shared memory block.
+        """
+        self.shm = _attach(name)
+        magic, item_count, measure_count, table_size, index_length = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory block '{name}' does not contain an MRP plan.")
+        if measure_count != len(MRPTable.ROWS):
+            raise ValueError(f"Unexpected number of measures ({measure_count}) in shared memory block '{name}'.")
+
+        index_start = HEADER.size
+        self.material_names = json.loads(bytes(self.shm.buf[index_start:index_start + index_length]).decode())
+        self.table_size = table_size
+
+        data_start = index_start + _padded(index_length)
+        data_end = data_start + item_count * measure_count * table_size * VALUE_SIZE
+        self._values = self.shm.buf[data_start:data_end].cast(VALUE_FORMAT)
+
+        # Offsets of every item in the value array
+        item_size = measure_count * table_size
+        self.offsets = {name: i * item_size for i, name in enumerate(self.material_names)}
+        self.mrp_tables = {
+            name: SharedTable(name, self._values[offset:offset + item_size], table_size)
+            for name, offset in self.offsets.items()
+        }
+
+    def numpy_array(self):
+        """ Return the values as a NumPy array of shape (items, measures, periods) without copying. """
+        from ._optional import import_numpy
+        np = import_numpy()
+        return np.frombuffer(self._values, dtype=np.int64).reshape(
+            len(self.material_names), len(MRPTable.ROWS), self.table_size
+        )
+
+    def close(self):
+        """
+        Release the views and detach from the block (the block itself stays).
+        Rows obtained from the tables must not be referenced any more.
+        """
+        self.mrp_tables = {}
+        self._values.release()
+        self.shm.close()
+
+
+def _attach(name):
+    """ Attach to a block as a reader, leaving its cleanup to the owner. """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 every attaching process registers the block for cleanup at exit
+        # (on POSIX only; Windows has no resource tracker for shared memory)
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _padded(length):
+    return (length + VALUE_SIZE - 1) // VALUE_SIZE * VALUE_SIZE
+
+
+def write_shared_plan(mrp_tables, table_size, name=None):
+    """
+    Write calculated MRP tables into a new shared memory block.
+    The caller owns the block and must call close() and unlink() on it when the
+    readers are done.
+    :param mrp_tables: The MRP tables by material name.
+    :param table_size: The number of time periods.
+    :param name: Optional name of the block; a unique one is generated otherwise.
+    :return: The SharedMemory object.
+    """
+    material_names = list(mrp_tables)
+    index = json.dumps(material_names).encode()
+    measure_count = len(MRPTable.ROWS)
+    data_start = HEADER.size + _padded(len(index))
+    size = data_start + len(material_names) * measure_count * table_size * VALUE_SIZE
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+    HEADER.pack_into(shm.buf, 0, MAGIC, len(material_names), measure_count, table_size, len(index))
+    shm.buf[HEADER.size:HEADER.size + len(index)] = index
+
+    values = shm.buf[data_start:size].cast(VALUE_FORMAT)
+    offset = 0
+    for material_name in material_names:
+        for row in mrp_tables[material_name].rows():
+            values[offset:offset + table_size] = array(VALUE_FORMAT, row)
+            offset += table_size
+    values.release()
+    return shm
+
+
+# Writer handles kept open until a reader has attached (Windows only, see _hand_over)
+_held_blocks = {}
+
+
+def _hand_over(shm):
+    """
+    Pass the cleanup of a block to the caller and return its name. On POSIX the writer's
+    handle is closed and the block lives on under its name. Windows destroys a block with
+    its last handle, so there the handle stays open in this process until the caller has
+    attached and called release_shared_plan here.
+    """
+    block_name = shm.name
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+        shm.close()
+    else:
+        _held_blocks[block_name] = shm
+    return block_name
+
+
+def release_shared_plan(name):
+    """
+    Close the writer handle which _hand_over keeps on Windows; a no-op on POSIX. Run it in
+    the process which wrote the block (e.g. submit it to the same single-worker pool) once
+    the reader has attached or the block is not needed any more.
+    """
+    shm = _held_blocks.pop(name, None)
+    if shm is not None:
+        shm.close()
+
+
+def calculate_to_shared_memory(bom, demand, production, table_size, planned_deliveries, name=None):
+    """
+    Calculate GHP and MRP and publish the tables in shared memory. Intended to run
+    in a worker process: only the block name travels back to the caller.
+    :return: The name of the shared memory block.
+    """
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp(demand, production, table_size)
+    mrp_system = MRP(bom, ghp_system, table_size, planned_deliveries)
+    mrp_system.calculate_mrp()
+    return _hand_over(write_shared_plan(mrp_system.mrp_tables, table_size, name))
+
+
+def calculate_snapshot_to_shared_memory(snapshot, name=None):
+    """
+    Calculate a PlanSnapshot and publish its MRP tables in shared memory. A top-level
+    function, so it can be submitted to a process pool.
+    :return: The name of the shared memory block.
+    """
+    mrp_system = snapshot.calculate()
+    return _hand_over(write_shared_plan(mrp_system.mrp_tables, snapshot.table_size, name))
+
+
+def unlink_shared_plan(name):
+    """
+    Remove the name of a block handed over by a writer. Views attached before stay
+    valid; the memory is freed when the last of them is closed.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    shm.close()
+    shm.unlink()
+
+
+class SharedPlanMRP(MRP):
+    """An MRP system whose tables are the views of a SharedPlanView, so that MRPGUI
+    renders its sheets straight from the shared buffers.
+
+    The BOM, GHP and planned deliveries are those the plan was calculated from.
+    Planned deliveries can be edited as usual: recalculating (e.g. a fork) produces
+    ordinary tables, after which the view should be closed.
+    """
+
+    def __init__(self, view, bom, ghp, planned_delivery, calendar=None):
+        """
+        :param view: The SharedPlanView of the calculated tables.
+        :param bom: The Bill of Materials object.
+        :param ghp: The calculated GHP object.
+        :param planned_delivery: Planned deliveries by material name.
+        :param calendar: Optional BucketCalendar of the periods.
+        """
+        super().__init__(bom, ghp, view.table_size, planned_delivery, calendar)
+        self.view = view
+        self.mrp_tables = view.mrp_tables
+        self.is_current = True
+        self.check_lead_times()
+
+    @classmethod
+    def from_snapshot(cls, view, snapshot):
+        """ Wrap the view of a plan published by calculate_snapshot_to_shared_memory. """
+        mrp_system = snapshot.materialize()
+        return cls(view, mrp_system.bom, mrp_system.ghp, mrp_system.planned_delivery, mrp_system.calendar)
+
+    def close(self):
+        """
+        Detach from the shared block. The tables must not be read afterwards.
+        :return: False if rows are still referenced elsewhere (e.g. by a recalculation
+                 being cancelled); the mapping is then released together with them.
+        """
+        self.mrp_tables = {}
+        self.availability_indexes = {}
+        try:
+            self.view.close()
+        except BufferError:
+            return False
+        return True
+
+
+# Example of usage:
+if __name__ == "__main__":
+    from concurrent.futures import ProcessPoolExecutor
+
+    table = Material(name="Table", stock=2, production_time=1)
+    countertop = Material(name="Countertop", parent="Table", quantity_needed=1, stock=22, production_time=3, production_capacity=40)
+    legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+    table.add_child(countertop)
+    table.add_child(legs)
+    bom = BOM()
+    bom.add_material(table)
+    bom.add_material(countertop)
+    bom.add_material(legs)
+
+    demand = [0, 0, 0, 0, 20, 0, 40, 0, 0, 0]
+    production = [0, 0, 0, 0, 28, 0, 30, 0, 0, 0]
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        block_name = executor.submit(calculate_to_shared_memory, bom, demand, production, 10, {}).result()
+
+        # The caller owns the block once it has attached; the worker may then let go of it
+        view = SharedPlanView(block_name)
+        executor.submit(release_shared_plan, block_name).result()
+
+    print("Legs planned order:", list(view.mrp_tables["Legs"].planned_order))
+    view.close()
+    unlink_shared_plan(block_name)
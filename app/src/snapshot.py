@@ -0,0 +1,179 @@
+import threading
+from collections import namedtuple
+from .bom import BOM, Material
+from .ghp import GHP
+from .history import PlanState
+from .mrp import MRP
+
+# Marks a part of the snapshot which publish() takes over unchanged
+KEEP = object()
+
+# The frozen attributes of one material; children holds the names of its components in order.
+MaterialRecord = namedtuple(
+    "MaterialRecord",
+    ["name", "parent", "quantity_needed", "stock", "production_time", "production_capacity", "children"],
+)
+
+
+class BOMSnapshot(namedtuple("BOMSnapshot", ["materials"])):
+    """An immutable copy of a BOM: a tuple of MaterialRecords in BOM order."""
+
+    __slots__ = ()
+
+    @classmethod
+    def capture(cls, bom):
+        """ Freeze the current content of a BOM. Call it on the thread which edits the BOM. """
+        return cls(tuple(
+            MaterialRecord(
+                material.name,
+                material.parent,
+                material.quantity_needed,
+                material.stock,
+                material.production_time,
+                material.production_capacity,
+                tuple(child.name for child in material.children),
+            )
+            for material in bom.materials
+        ))
+
+    def materialize(self):
+        """ Return a new BOM with its own Material objects, which the caller may modify. """
+        materials = {
+            record.name: Material(
+                record.name, record.parent, record.quantity_needed, record.stock,
+                record.production_time, record.production_capacity,
+            )
+            for record in self.materials
+        }
+        bom = BOM()
+        for record in self.materials:
+            material = materials[record.name]
+            for child_name in record.children:
+                material.add_child(materials[child_name])
+            bom.add_material(material)
+        return bom
+
+
+class PlanSnapshot(namedtuple("PlanSnapshot", ["version", "bom", "state", "table_size", "calendar"])):
+    """One published version of everything a calculation reads: the BOM, the GHP
+    and MRP inputs (a PlanState), the number of periods and the bucket calendar.
+
+    Snapshots never change, so any number of threads can calculate from the same
+    snapshot without locks. They are also picklable and can be sent to worker
+    processes (see calculate_snapshot).
+    """
+
+    __slots__ = ()
+
+    def materialize(self):
+        """
+        Build a private, not yet calculated MRP system from the snapshot.
+        :return: The MRP system; its BOM, GHP and input lists belong to the caller.
+        """
+        bom = self.bom.materialize()
+        ghp_system = GHP(bom)
+        ghp_system.calculate_ghp(self.state.demand.to_list(), self.state.production.to_list(), self.table_size)
+        planned_deliveries = {name: row.to_list() for name, row in self.state.planned_deliveries.items()}
+        return MRP(bom, ghp_system, self.table_size, planned_deliveries, self.calendar)
+
+    def calculate(self, planning_session=None, is_cancelled=None):
+        """
+        Calculate GHP and MRP for the snapshot.
+        :param planning_session: Optional PlanningSession reused across snapshots (one per thread).
+        :param is_cancelled: Optional cancellation callable.
+        :return: A calculated MRP system private to the caller.
+        """
+        mrp_system = self.materialize()
+        if planning_session is not None:
+            planning_session.recalculate(mrp_system, is_cancelled)
+        else:
+            mrp_system.calculate_mrp(is_cancelled)
+        return mrp_system
+
+
+def calculate_snapshot(snapshot):
+    """
+    Calculate the MRP tables of a snapshot. A top-level function, so it can be
+    submitted to a process pool.
+    :return: The MRP tables by material name.
+    """
+    return snapshot.calculate().mrp_tables
+
+
+class SnapshotStore:
+    def __init__(self):
+        """
+        Initializes the holder of the latest published PlanSnapshot.
+        Readers call current() without taking a lock: replacing the reference is
+        atomic, so they see either the old or the new snapshot, never a mix.
+        Only writers serialize among themselves.
+        """
+        self._current = None
+        self._write_lock = threading.Lock()
+
+    def current(self):
+        """ Return the latest snapshot, or None before the first publish. """
+        return self._current
+
+    def is_latest(self, snapshot):
+        """ Return True if no newer snapshot was published since the given one. """
+        current = self._current
+        return current is not None and current.version == snapshot.version
+
+    def publish(self, bom=None, state=None, table_size=None, calendar=KEEP):
+        """
+        Publish a new version. Omitted parts are taken over from the current snapshot.
+        :param bom: A BOM (captured now) or a BOMSnapshot.
+        :param state: The PlanState with the GHP and MRP inputs.
+        :param table_size: The number of time periods.
+        :param calendar: The BucketCalendar, or None for uniform periods.
+        :return: The published snapshot.
+        """
+        if isinstance(bom, BOM):
+            bom = BOMSnapshot.capture(bom)
+        with self._write_lock:
+            previous = self._current
+            if previous is None:
+                if bom is None or state is None or table_size is None:
+                    raise ValueError("The first snapshot needs a BOM, a plan state and a table size.")
+                snapshot = PlanSnapshot(1, bom, state, table_size, None if calendar is KEEP else calendar)
+            else:
+                snapshot = PlanSnapshot(
+                    previous.version + 1,
+                    bom if bom is not None else previous.bom,
+                    state if state is not None else previous.state,
+                    table_size if table_size is not None else previous.table_size,
+                    previous.calendar if calendar is KEEP else calendar,
+                )
+            self._current = snapshot
+        return snapshot
+
+
+# Example of usage:
+if __name__ == "__main__":
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    table = Material(name="Table", stock=2, production_time=1)
+    countertop = Material(name="Countertop", parent="Table", quantity_needed=1, stock=22, production_time=3, production_capacity=40)
+    legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+    table.add_child(countertop)
+    table.add_child(legs)
+    bom = BOM()
+    bom.add_material(table)
+    bom.add_material(countertop)
+    bom.add_material(legs)
+
+    store = SnapshotStore()
+    state = PlanState.from_lists([0, 0, 0, 0, 20, 0, 40, 0, 0, 0], [0, 0, 0, 0, 28, 0, 30, 0, 0, 0], {})
+    first = store.publish(bom, state, 10)
+
+    # Editing the live BOM does not affect the published snapshot
+    legs.stock = 500
+    second = store.publish(bom, state.with_planned_delivery("Countertop", 2, 40))
+
+    with ThreadPoolExecutor(max_workers=2) as threads, ProcessPoolExecutor(max_workers=1) as processes:
+        old_plan = threads.submit(lambda: first.calculate())
+        new_tables = processes.submit(calculate_snapshot, second)
+        print(f"Version {first.version} - Legs planned order:", old_plan.result().mrp_tables["Legs"].planned_order)
+        print(f"Version {second.version} - Legs planned order:", new_tables.result()["Legs"].planned_order)
+    print("Latest version:", store.current().version)
@@ -0,0 +1,331 @@
+import time
+from collections import namedtuple
+from .bom import BOM, Material
+from .ghp import GHP
+from .mrp import MRP, CalculationCancelled
+from .session import PlanningSession
+
+# The outcome of ProductionSolver.solve. shortage is in unit-periods: the units missing in
+# each period of the GHP and MRP tables, summed over the periods, so a unit missing for three
+# periods counts three times. The plan is feasible when it is 0.
+SolverResult = namedtuple(
+    "SolverResult",
+    ["production", "feasible", "shortage", "total_production", "inventory",
+     "iterations", "evaluations", "elapsed", "mrp_system"],
+)
+
+OBJECTIVES = ("production", "inventory")
+
+# The number of production rates ProductionSolver.level tries
+LEVELLING_STEPS = 20
+
+
+def missing_unit_periods(row):
+    """ Return the unit-periods missing in a row of availability (the sum of its negative values). """
+    return -sum(value for value in row if value < 0)
+
+
+class ProductionSolver:
+    def __init__(self, bom, demand, table_size, planned_deliveries=None, calendar=None,
+                 planning_session=None, objective="production", max_iterations=200, time_limit=10.0,
+                 max_shift=None, levelling=True):
+        """
+        Initializes the search for a GHP production row which leaves no shortage in the
+        GHP and MRP tables at the lowest total production (or inventory).
+        :param bom: The Bill of Materials object.
+        :param demand: GHP demand of the level 0 material.
+        :param table_size: The number of time periods.
+        :param planned_deliveries: Planned deliveries by material name.
+        :param calendar: Optional BucketCalendar of the periods.
+        :param planning_session: Optional PlanningSession evaluating the candidates; plans
+                                 differing in a few periods reuse most of its cached tables.
+        :param objective: "production" minimizes the total production, then the inventory;
+                          "inventory" the other way round. Shortages always come first.
+        :param max_iterations: The most improving moves made before the search stops.
+        :param time_limit: The most seconds spent searching.
+        :param max_shift: The most periods production is moved by in one move
+                          (default: the cumulative lead time of the level 0 material, at least 1).
+        :param levelling: Whether a starting production which leaves shortages is levelled first (see level).
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}'.")
+        if bom.level_0_material is None:
+            raise ValueError("No level 0 material found in BOM.")
+        self.bom = bom
+        self.demand = list(demand[:table_size])
+        self.table_size = table_size
+        self.planned_deliveries = planned_deliveries or {}
+        self.calendar = calendar
+        self.session = planning_session if planning_session is not None else PlanningSession()
+        self.objective = objective
+        self.max_iterations = max_iterations
+        self.time_limit = time_limit
+        self.levelling = levelling
+
+        level_0_material = bom.level_0_material
+        lead_time = bom.get_cumulative_lead_time(level_0_material.name)
+        self.max_shift = max_shift if max_shift is not None else max(lead_time, 1)
+
+        # The lead time from releasing an order of each material to finishing the level 0
+        # material: the production times along its path. Production in an earlier period
+        # cannot get that material in time unless it is in stock (see lead_time_warnings).
+        path_lead_times = {level_0_material.name: level_0_material.production_time}
+        stack = list(level_0_material.children)
+        while stack:
+            material = stack.pop()
+            path_lead_times[material.name] = path_lead_times[material.parent] + material.production_time
+            stack.extend(material.children)
+
+        starts = calendar.start if calendar is not None else (lambda period: period)
+        self.earliest = {
+            name: next((t for t in range(table_size) if starts(t) >= path_lead_time), table_size)
+            for name, path_lead_time in path_lead_times.items()
+        }
+        # For shortages of the level 0 material, the cumulative lead time of the whole BOM
+        self.earliest[None] = next((t for t in range(table_size) if starts(t) >= lead_time), table_size)
+
+        self.ghp = None
+        self.mrp_system = None
+        self.tables = {}  # The MRP tables which self.shortages were counted in
+        self.shortages = {}  # Missing unit-periods by material name, for the current MRP tables
+        self.evaluations = 0
+
+    def lot_for_lot(self):
+        """
+        Return the production which covers each shortage of the level 0 material in the period
+        it occurs. No production row has a lower total, and none keeps less stock in any period.
+        """
+        production = [0] * self.table_size
+        available = self.bom.level_0_material.stock
+        for t, value in enumerate(self.demand):
+            available -= value
+            if available < 0:
+                production[t] = -available
+                available = 0
+        return production
+
+    def leveled(self, production, rate):
+        """
+        Return the production with at most rate units in each period; the excess is made in
+        the periods before, so the level 0 material is still available when it is needed.
+        Production which does not fit after the first period is left in the first period.
+        """
+        leveled = [0] * self.table_size
+        carry = 0
+        for t in range(self.table_size - 1, -1, -1):
+            needed = production[t] + carry
+            leveled[t] = min(rate, needed)
+            carry = needed - leveled[t]
+        leveled[0] += carry
+        return leveled
+
+    def level(self, production, cost, start_time, is_cancelled=None):
+        """
+        Repair a production row which leaves shortages by levelling it. Components are made
+        in lots and a material releases its next lot only once the previous one is received, so
+        a material cannot keep up with production peaks which need a lot more often than every
+        production time. Each period's production is capped at decreasing rates, between the
+        peak of the row and its average over the periods which meet the cumulative lead time.
+        :return: The production and cost of the best rate, the given ones if none is better.
+        """
+        # The GHP holds the production row it was calculated with and update_cell changes it,
+        # so the starting row is copied before the candidates are entered
+        production = list(production)
+        peak = max(production)
+        periods = max(self.table_size - self.earliest[None], 1)
+        lowest = max(-(-sum(production) // periods), 1)
+        step = max((peak - lowest) // LEVELLING_STEPS, 1)
+        best_production, best_cost = production, cost
+        for rate in range(peak - step, lowest - 1, -step):
+            if is_cancelled is not None and is_cancelled():
+                raise CalculationCancelled("Production search cancelled.")
+            if time.perf_counter() - start_time >= self.time_limit:
+                break
+            candidate = self.leveled(production, rate)
+            for t, value in enumerate(candidate):
+                if value != self.ghp.get_production()[t]:
+                    self.ghp.update_cell("production", t, value)
+            candidate_cost = self.evaluate()
+            if candidate_cost < best_cost:
+                best_production, best_cost = candidate, candidate_cost
+
+        for t, value in enumerate(best_production):
+            if value != self.ghp.get_production()[t]:
+                self.ghp.update_cell("production", t, value)
+        self.evaluate()
+        return best_production, best_cost
+
+    def evaluate(self):
+        """
+        Recalculate the MRP tables for the current GHP production through the planning
+        session and return the cost: (shortage, total production, inventory), with the last
+        two swapped for the inventory objective.
+        """
+        self.evaluations += 1
+        self.mrp_system.mrp_tables = self.session.calculate_tables(self.mrp_system)
+
+        # Tables answered from the session cache are the same objects as before; only the
+        # recalculated ones are scanned for shortages
+        for material_name, table in self.mrp_system.mrp_tables.items():
+            known = self.tables.get(material_name)
+            if known is not table:
+                self.tables[material_name] = table
+                self.shortages[material_name] = missing_unit_periods(table.available)
+
+        availability = self.availability()
+        shortage = missing_unit_periods(availability) + sum(self.shortages.values())
+        total_production = sum(self.ghp.get_production())
+        inventory = sum(value for value in availability if value > 0)
+        if self.objective == "inventory":
+            return shortage, inventory, total_production
+        return shortage, total_production, inventory
+
+    def availability(self):
+        """ Return the GHP availability row of the level 0 material. """
+        return self.ghp.get_availability()
+
+    def move(self, source, target, quantity):
+        """ Move production between two periods, updating the GHP availability index in O(log T). """
+        production = self.ghp.get_production()
+        self.ghp.update_cell("production", source, production[source] - quantity)
+        self.ghp.update_cell("production", target, production[target] + quantity)
+
+    def first_shortages(self, count):
+        """
+        Return up to count (period, material name) pairs of the earliest shortages, the level
+        0 material (None) included. Later shortages are often caused by the earlier ones.
+        """
+        shortages = []
+        availability = self.availability()
+        t = next((t for t, value in enumerate(availability) if value < 0), None)
+        if t is not None:
+            shortages.append((t, None))
+        for material_name, missing in self.shortages.items():
+            if missing:
+                available = self.mrp_system.mrp_tables[material_name].available
+                shortages.append((next(t for t, value in enumerate(available) if value < 0), material_name))
+        shortages.sort(key=lambda shortage: shortage[0])
+        return shortages[:count]
+
+    def candidate_moves(self):
+        """
+        Yield (source, target, quantity) moves worth evaluating.
+        With shortages, production which feeds the earliest shortages is moved earlier, so
+        the orders of the short material start sooner. A shortage of a material in period t
+        comes from production up to period t plus the material's path lead time, and
+        production is never moved before the period from which the path lead time can be met.
+        Without shortages, production is moved later to keep less stock, as far as the GHP
+        availability allows.
+        """
+        production = self.ghp.get_production()
+        shortages = self.first_shortages(3)
+        if shortages:
+            moves = {}
+            for t, material_name in shortages:
+                earliest = self.earliest[material_name]
+                for source in range(max(t - self.max_shift, 0), min(t + max(earliest, 1), self.table_size - 1) + 1):
+                    if not production[source]:
+                        continue
+                    for target in range(max(source - self.max_shift, earliest), source):
+                        # Short moves close to the shortage first
+                        rank = (source - target, abs(source - t))
+                        for quantity in (production[source], (production[source] + 1) // 2):
+                            move = (source, target, quantity)
+                            moves[move] = min(moves.get(move, rank), rank)
+            yield from sorted(moves, key=moves.get)
+            return
+
+        availability = self.availability()
+        for source in range(self.table_size - 1, -1, -1):
+            if not production[source]:
+                continue
+            # Production can be delayed by what stays in stock in the periods it is delayed over
+            slack = production[source]
+            for target in range(source + 1, min(source + self.max_shift, self.table_size - 1) + 1):
+                slack = min(slack, availability[target - 1])
+                if slack <= 0:
+                    break
+                yield source, target, slack
+
+    def solve(self, production=None, is_cancelled=None):
+        """
+        Search for the production row. Starting from the given row (default: lot_for_lot),
+        levelled when it leaves shortages (see level), the first candidate move which lowers the cost is kept, until no move improves,
+        max_iterations moves were made or time_limit expired.
+        :param production: Optional production row to start from.
+        :param is_cancelled: Optional callable; when it returns True the search stops with CalculationCancelled.
+        :return: A SolverResult; its mrp_system holds the GHP and MRP tables of the best production.
+        """
+        start_time = time.perf_counter()
+        production = list(production) if production is not None else self.lot_for_lot()
+        self.ghp = GHP(self.bom)
+        self.ghp.calculate_ghp(self.demand, production, self.table_size, calendar=self.calendar)
+        self.mrp_system = MRP(self.bom, self.ghp, self.table_size, self.planned_deliveries, self.calendar)
+        self.tables = {}
+        self.shortages = {}
+        self.evaluations = 0
+
+        cost = self.evaluate()
+        if cost[0] and self.levelling:
+            production, cost = self.level(production, cost, start_time, is_cancelled)
+        iterations = 0
+        improved = True
+        while improved and iterations < self.max_iterations and time.perf_counter() - start_time < self.time_limit:
+            improved = False
+            for source, target, quantity in list(self.candidate_moves()):
+                if is_cancelled is not None and is_cancelled():
+                    raise CalculationCancelled("Production search cancelled.")
+                self.move(source, target, quantity)
+                candidate_cost = self.evaluate()
+                if candidate_cost < cost:
+                    # Keep the first improving move and look around the new production
+                    cost = candidate_cost
+                    iterations += 1
+                    improved = True
+                    break
+                self.move(target, source, quantity)
+                if time.perf_counter() - start_time >= self.time_limit:
+                    break
+
+        # Leave the MRP tables of the best production in the result, with its lead time warnings
+        cost = self.evaluate()
+        self.mrp_system.check_lead_times()
+        self.mrp_system.replace_tables(self.mrp_system.mrp_tables)
+        shortage = cost[0]
+        total_production = sum(self.ghp.get_production())
+        inventory = sum(value for value in self.availability() if value > 0)
+        return SolverResult(
+            list(self.ghp.get_production()), shortage == 0, shortage, total_production, inventory,
+            iterations, self.evaluations, time.perf_counter() - start_time, self.mrp_system,
+        )
+
+
+# Example of usage:
+if __name__ == "__main__":
+    import random
+
+    # 500 items; components are made in lots at least as large as their parent's
+    random.seed(1)
+    bom = BOM()
+    root = Material(name="Product", stock=20, production_time=1)
+    bom.add_material(root)
+    materials = [root]
+    for i in range(499):
+        parent = random.choice(materials[:max(1, len(materials) // 4)])
+        item = Material(name=f"Item {i}", parent=parent.name, quantity_needed=1, stock=random.randint(0, 100),
+                        production_time=random.randint(1, 2),
+                        production_capacity=max(parent.production_capacity, 80) * random.choice([1, 2]))
+        parent.add_child(item)
+        bom.add_material(item)
+        materials.append(item)
+
+    random.seed(101)
+    demand = [0] * 10 + [random.choice([0, 10, 20, 40, 60, 80]) for _ in range(42)]
+    lot_for_lot = ProductionSolver(bom, demand, 52, max_iterations=0, levelling=False).solve()
+    print(f"Lot-for-lot production: {lot_for_lot.shortage} unit-periods short")
+
+    result = ProductionSolver(bom, demand, 52).solve()
+    print(f"Feasible: {result.feasible}, shortage: {result.shortage} unit-periods, production: {result.total_production}, "
+          f"inventory: {result.inventory}")
+    print(f"{result.iterations} moves, {result.evaluations} evaluations in {result.elapsed:.2f} s")
+    print("Production:", result.production)
@@ -0,0 +1,88 @@
+import json
+from .bom import BOM, Material
+from .ghp import GHP
+from .mrp import MRP, MRPTable
+
+
+class JsonLinesSink:
+    """Writes MRP tables to a file, one JSON object per line, as they are calculated.
+
+    Use it as the sink of MRP.calculate_mrp_streaming:
+
+        with JsonLinesSink("plan.jsonl") as sink:
+            mrp_system.calculate_mrp_streaming(sink)
+    """
+
+    def __init__(self, path):
+        """
+        :param path: The file to write (overwritten).
+        """
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8")
+        self.count = 0
+
+    def __call__(self, mrp_table):
+        record = {"material": mrp_table.material_name}
+        for row in MRPTable.ROWS:
+            record[row] = getattr(mrp_table, row)
+        self.file.write(json.dumps(record, separators=(",", ":")))
+        self.file.write("\n")
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_tables(path, material_names=None):
+    """
+    Stream MRP tables back from a file written by JsonLinesSink.
+    :param path: The file to read.
+    :param material_names: Optional collection of names; other tables are skipped.
+    :return: A generator of MRPTable objects.
+    """
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if material_names is not None and record["material"] not in material_names:
+                continue
+            mrp_table = MRPTable(record["material"], 0)
+            for row in MRPTable.ROWS:
+                setattr(mrp_table, row, record[row])
+            yield mrp_table
+
+
+# Example of usage:
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    table = Material(name="Table", stock=2, production_time=1)
+    countertop = Material(name="Countertop", parent="Table", quantity_needed=1, stock=22, production_time=3, production_capacity=40)
+    wooden_plate = Material(name="Wooden Plate", parent="Countertop", quantity_needed=1, stock=10, production_time=1, production_capacity=50)
+    legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+    table.add_child(countertop)
+    table.add_child(legs)
+    countertop.add_child(wooden_plate)
+    bom = BOM()
+    bom.add_material(table)
+    bom.add_material(countertop)
+    bom.add_material(wooden_plate)
+    bom.add_material(legs)
+
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp([0, 0, 0, 0, 20, 0, 40, 0, 0, 0], [0, 0, 0, 0, 28, 0, 30, 0, 0, 0], 10)
+    mrp_system = MRP(bom, ghp_system, 10, {})
+
+    path = os.path.join(tempfile.gettempdir(), "mrp_plan.jsonl")
+    with JsonLinesSink(path) as sink:
+        mrp_system.calculate_mrp_streaming(sink)
+
+    for mrp_table in read_tables(path, {"Wooden Plate"}):
+        print(mrp_table.material_name, "planned order:", mrp_table.planned_order)
+    os.remove(path)
@@ -0,0 +1,118 @@
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from .bom import BOM, Material
+from .ghp import GHP
+from .mrp import MRP
+
+# One planned order: released in period release, received in period receipt (table_size if after the horizon).
+OrderBar = namedtuple("OrderBar", ["item", "release", "receipt", "quantity"])
+
+
+class TimelineIndex:
+    def __init__(self, mrp_system):
+        """
+        Index the planned orders of a calculated MRP system for drawing a timeline.
+        Each item's orders are kept sorted by release period, so the orders of any
+        window of periods are found by bisection instead of a scan.
+        :param mrp_system: The calculated MRP system.
+        """
+        if not mrp_system.is_current:
+            mrp_system.calculate_mrp()
+        self.table_size = mrp_system.table_size
+        self.items = list(mrp_system.mrp_tables)
+        bom = getattr(mrp_system, "bom", None)
+        materials = {material.name: material for material in bom.materials} if bom is not None else {}
+
+        # Per item: release periods, bars, running total of quantities and the longest bar
+        self.releases = []
+        self.bars = []
+        self.quantity_totals = []
+        self.max_lengths = []
+        for item in self.items:
+            table = mrp_system.mrp_tables[item]
+            material = materials.get(item)
+            production_time = material.production_time if material is not None else 0
+
+            releases, bars, totals = [], [], [0]
+            max_length = 0
+            for release, quantity in enumerate(table.planned_order):
+                if not quantity:
+                    continue
+                if hasattr(mrp_system, "shift_period"):
+                    receipt = mrp_system.shift_period(release, production_time)
+                else:
+                    receipt = min(release + production_time, self.table_size)
+                releases.append(release)
+                bars.append(OrderBar(item, release, receipt, quantity))
+                totals.append(totals[-1] + quantity)
+                max_length = max(max_length, receipt - release)
+
+            self.releases.append(releases)
+            self.bars.append(bars)
+            self.quantity_totals.append(totals)
+            self.max_lengths.append(max_length)
+
+    def __len__(self):
+        return len(self.items)
+
+    def order_count(self):
+        """ Return the number of planned orders of all items. """
+        return sum(len(releases) for releases in self.releases)
+
+    def visible_bars(self, row, first, last):
+        """
+        Return the orders of an item which overlap periods first..last.
+        :param row: The index of the item.
+        """
+        releases = self.releases[row]
+        start = bisect_left(releases, first - self.max_lengths[row])
+        end = bisect_right(releases, last)
+        return [bar for bar in self.bars[row][start:end] if bar.receipt >= first]
+
+    def buckets(self, row, first, last, size):
+        """
+        Aggregate the orders of an item into buckets of a number of periods, for drawing
+        when the timeline is zoomed out. Every bucket overlapping periods first..last is
+        counted whole. Buckets are aligned to multiples of size, so they stay put while panning.
+        :return: A list of (first period, count, quantity) for every non-empty bucket.
+        """
+        releases = self.releases[row]
+        totals = self.quantity_totals[row]
+        result = []
+        start = first - first % size
+        index = bisect_left(releases, start)
+        while start <= last and index < len(releases):
+            if releases[index] >= start + size:
+                # Jump to the bucket of the next order
+                start = releases[index] - releases[index] % size
+                continue
+            end = bisect_left(releases, start + size, index)
+            result.append((start, end - index, totals[end] - totals[index]))
+            index = end
+            start += size
+        return result
+
+
+# Example of usage:
+if __name__ == "__main__":
+    import random
+    import time
+
+    bom = BOM()
+    root = Material(name="Root", production_time=1)
+    bom.add_material(root)
+    for i in range(500):
+        item = Material(name=f"Item {i}", parent="Root", quantity_needed=1, stock=0,
+                        production_time=random.randint(1, 5), production_capacity=10)
+        root.add_child(item)
+        bom.add_material(item)
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp([0] * 1000, [random.choice([0, 0, 0, 10]) for _ in range(1000)], 1000)
+    mrp_system = MRP(bom, ghp_system, 1000, {})
+    mrp_system.calculate_mrp()
+
+    start = time.perf_counter()
+    index = TimelineIndex(mrp_system)
+    print(f"Indexed {index.order_count()} orders in {time.perf_counter() - start:.2f} s")
+    print("Orders of Item 0 overlapping periods 100-110:", index.visible_bars(0, 100, 110))
+    print("Item 0 by 100 periods (first, count, quantity):", index.buckets(0, 0, 999, 100)[:3])
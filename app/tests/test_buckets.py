@@ -0,0 +1,90 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.buckets import BucketCalendar
+from src.ghp import GHP
+from src.mrp import MRP
+
+
+class BucketCalendarTest(unittest.TestCase):
+    def test_shift(self):
+        """ A positive span always ends in a later bucket, starting once the span has elapsed. """
+        rng = random.Random(37)
+        for _ in range(200):
+            calendar = BucketCalendar([rng.choice([1, 1, 2, 7, 30]) for _ in range(rng.randint(1, 20))])
+            for bucket in range(len(calendar)):
+                for days in range(0, 40):
+                    shifted = calendar.shift(bucket, days)
+                    end = calendar.start(bucket) + days
+                    if days > 0:
+                        self.assertGreater(shifted, bucket)
+                    if shifted < len(calendar):
+                        self.assertGreaterEqual(calendar.start(shifted), end)
+                    if shifted > 0:
+                        self.assertLess(calendar.start(shifted - 1), end if days else end + 1)
+
+                    # Offsetting backwards gives the bucket containing the first day of the span
+                    back = calendar.shift(bucket, -days)
+                    if calendar.start(bucket) - days >= 0:
+                        self.assertLessEqual(calendar.start(back), calendar.start(bucket) - days)
+                        self.assertLessEqual(calendar.shift(back, days), bucket)
+                    else:
+                        self.assertEqual(back, 0)
+
+    def test_for_horizon_covers_the_horizon(self):
+        for horizon in (1, 13, 14, 15, 90, 91, 365, 730):
+            calendar = BucketCalendar.for_horizon(horizon)
+            self.assertGreaterEqual(calendar.horizon, horizon)
+            self.assertLess(calendar.horizon - calendar.lengths[-1], horizon)
+            self.assertEqual(len(calendar.labels()), len(calendar))
+
+    def test_bucket_of(self):
+        calendar = BucketCalendar([1, 3, 6])
+        self.assertEqual([calendar.bucket_of(day) for day in range(-1, 11)], [0, 0, 1, 1, 1, 2, 2, 2, 2, 2, 2, 3])
+        self.assertEqual(calendar.labels(), ["1", "2-4", "5-10"])
+        with self.assertRaises(ValueError):
+            BucketCalendar([1, 0])
+
+    def test_uniform_calendar_matches_plain_periods(self):
+        rng = random.Random(38)
+        for _ in range(100):
+            table_size = rng.randint(1, 14)
+            bom = BOM()
+            root = Material(name="m0", stock=rng.randint(0, 30), production_time=rng.randint(0, 2))
+            bom.add_material(root)
+            materials = [root]
+            for i in range(1, rng.randint(2, 8)):
+                parent = rng.choice(materials)
+                material = Material(
+                    name=f"m{i}", parent=parent.name, quantity_needed=rng.randint(1, 3), stock=rng.randint(0, 100),
+                    production_time=rng.randint(0, 3), production_capacity=rng.randint(1, 150),
+                )
+                parent.add_child(material)
+                bom.add_material(material)
+                materials.append(material)
+            ghp_system = GHP(bom)
+            ghp_system.calculate_ghp([0] * table_size, [rng.choice([0, 10, 30]) for _ in range(table_size)], table_size)
+
+            plain = MRP(bom, ghp_system, table_size, {})
+            plain.calculate_mrp()
+            bucketed = MRP(bom, ghp_system, table_size, {}, BucketCalendar.uniform(table_size))
+            bucketed.calculate_mrp()
+            self.assertEqual(
+                {name: table.rows() for name, table in bucketed.mrp_tables.items()},
+                {name: table.rows() for name, table in plain.mrp_tables.items()},
+            )
+
+    def test_calendar_length_must_match(self):
+        bom = BOM()
+        bom.add_material(Material(name="m0"))
+        with self.assertRaises(ValueError):
+            MRP(bom, GHP(bom), 5, {}, BucketCalendar.uniform(4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.history import CHUNK_SIZE, EditHistory, PersistentMap, PersistentRow, PlanState
+
+
+def random_edit(rng, state, table_size, materials):
+    """ Return a state with one random input changed, and the plain (row, material, period, value) edit. """
+    period = rng.randrange(table_size)
+    value = rng.choice([0, 5, 10, 40])
+    row = rng.choice(["demand", "production", "planned_delivery"])
+    if row == "planned_delivery":
+        material_name = rng.choice(materials)
+        return state.with_planned_delivery(material_name, period, value), (row, material_name, period, value)
+    return state.with_ghp_value(row, period, value), (row, None, period, value)
+
+
+def as_lists(state):
+    """ Return the plain content of a state. """
+    return (
+        state.demand.to_list(),
+        state.production.to_list(),
+        {name: row.to_list() for name, row in state.planned_deliveries.items()},
+    )
+
+
+def without_empty_rows(lists):
+    """ Drop delivery rows of zeros; a material without a row has no deliveries either. """
+    demand, production, planned_deliveries = lists
+    return demand, production, {name: row for name, row in planned_deliveries.items() if any(row)}
+
+
+def apply_changes(lists, changes):
+    """ Apply the result of PlanState.changes_from to plain lists, like MainWindow.apply_changes. """
+    demand, production, planned_deliveries = lists
+    rows = {"demand": demand, "production": production}
+    for row, material_name, period, value in changes:
+        if row == "planned_delivery":
+            planned_deliveries.setdefault(material_name, [0] * len(demand))[period] = value
+        else:
+            rows[row][period] = value
+
+
+class PersistentRowTest(unittest.TestCase):
+    def test_set_shares_unchanged_chunks(self):
+        values = list(range(3 * CHUNK_SIZE + 5))
+        row = PersistentRow.from_list(values)
+        changed = row.set(CHUNK_SIZE + 1, -1)
+
+        self.assertEqual(row.to_list(), values)  # The old version is unchanged
+        self.assertEqual(changed[CHUNK_SIZE + 1], -1)
+        self.assertIs(changed.chunks[0], row.chunks[0])
+        self.assertIsNot(changed.chunks[1], row.chunks[1])
+        self.assertIs(changed.chunks[3], row.chunks[3])
+        self.assertEqual(changed.changed_indexes(row), [CHUNK_SIZE + 1])
+        self.assertIs(row.set(0, 0), row)  # Setting the same value keeps the row
+
+    def test_index_out_of_range(self):
+        row = PersistentRow.from_list([1, 2, 3])
+        with self.assertRaises(IndexError):
+            row[3]
+        with self.assertRaises(IndexError):
+            row.set(-1, 0)
+
+    def test_map_set_copies_one_bucket(self):
+        values = {f"m{i}": i for i in range(50)}
+        mapping = PersistentMap.from_dict(values)
+        changed = mapping.set("m7", -7)
+
+        self.assertEqual(dict(mapping.items()), values)
+        self.assertEqual(changed["m7"], -7)
+        self.assertEqual(changed.changed_keys(mapping), ["m7"])
+        self.assertEqual(sum(a is not b for a, b in zip(changed.buckets, mapping.buckets)), 1)
+
+
+class EditHistoryTest(unittest.TestCase):
+    def test_undo_redo_restores_every_state(self):
+        """ Walking the history with changes_from reproduces every recorded state. """
+        rng = random.Random(32)
+        table_size = 2 * CHUNK_SIZE + 3
+        materials = ["Legs", "Countertop", "Screws"]
+        history = EditHistory()
+        history.reset(PlanState.from_lists([0] * table_size, [0] * table_size, {"Legs": [0] * table_size}))
+        recorded = [as_lists(history.current())]
+        for _ in range(60):
+            state, _ = random_edit(rng, history.current(), table_size, materials)
+            history.push(state)
+            recorded.append(as_lists(state))
+
+        # The inputs shown in the GUI follow the history through the changes only
+        shown = as_lists(history.current())
+        for expected in reversed(recorded[:-1]):
+            current = history.current()
+            state = history.undo()
+            apply_changes(shown, state.changes_from(current))
+            self.assertEqual(without_empty_rows(shown), without_empty_rows(expected))
+        self.assertIsNone(history.undo())
+
+        for expected in recorded[1:]:
+            current = history.current()
+            state = history.redo()
+            apply_changes(shown, state.changes_from(current))
+            self.assertEqual(without_empty_rows(shown), without_empty_rows(expected))
+        self.assertIsNone(history.redo())
+
+    def test_push_after_undo_discards_redo(self):
+        history = EditHistory()
+        first = PlanState.from_lists([0, 0], [0, 0], {})
+        history.reset(first)
+        second = first.with_ghp_value("demand", 0, 5)
+        history.push(second)
+        history.undo()
+        third = first.with_ghp_value("production", 1, 7)
+        history.push(third)
+
+        self.assertIs(history.current(), third)
+        self.assertFalse(history.can_redo())
+        self.assertIs(history.undo(), first)
+
+    def test_oldest_states_are_dropped(self):
+        history = EditHistory(max_steps=3)
+        state = PlanState.from_lists([0] * 4, [0] * 4, {})
+        history.reset(state)
+        for period in range(4):
+            state = state.with_ghp_value("production", period, 1)
+            history.push(state)
+
+        self.assertEqual(len(history.states), 3)
+        self.assertEqual(history.current().production.to_list(), [1, 1, 1, 1])
+        history.undo()
+        history.undo()
+        self.assertFalse(history.can_undo())
+        self.assertEqual(history.current().production.to_list(), [1, 1, 0, 0])
+
+    def test_unknown_row(self):
+        state = PlanState.from_lists([0], [0], {})
+        with self.assertRaises(ValueError):
+            state.with_ghp_value("availability", 0, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
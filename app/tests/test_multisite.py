@@ -0,0 +1,87 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.multisite import MultiSiteMRP, TransferLane
+from src.snapshot import BOMSnapshot
+
+
+def build_bom(rng, size):
+    bom = BOM()
+    root = Material(name="m0", stock=rng.randint(0, 30), production_time=rng.randint(0, 2))
+    bom.add_material(root)
+    materials = [root]
+    for i in range(1, size):
+        parent = rng.choice(materials)
+        material = Material(
+            name=f"m{i}", parent=parent.name, quantity_needed=rng.randint(1, 3), stock=rng.randint(0, 100),
+            production_time=rng.randint(0, 3), production_capacity=rng.randint(1, 150),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+    return bom
+
+
+class MultiSiteMRPTest(unittest.TestCase):
+    def test_per_site_matches_arrays(self):
+        """ The single-site fallback gives the results of the array netting, site inputs included. """
+        rng = random.Random(41)
+        for _ in range(50):
+            table_size = rng.randint(1, 12)
+            bom = build_bom(rng, rng.randint(1, 8))
+            sites = [f"s{i}" for i in range(rng.randint(1, 4))]
+            production = {
+                site: [rng.choice([0, 0, 10, 30]) for _ in range(table_size)] for site in sites if rng.random() < 0.8
+            }
+            stock = {
+                material.name: {site: rng.randint(0, 100) for site in sites if rng.random() < 0.5}
+                for material in bom.materials if rng.random() < 0.7
+            }
+            production_times = {
+                material.name: {site: rng.randint(0, 3) for site in sites if rng.random() < 0.5}
+                for material in bom.materials if rng.random() < 0.5
+            }
+            planned_deliveries = {
+                material.name: {site: [rng.choice([0, 0, 20]) for _ in range(table_size)] for site in sites}
+                for material in bom.materials if rng.random() < 0.3
+            }
+
+            before = BOMSnapshot.capture(bom)
+            results = []
+            for scalar_sites in (0, len(sites) + 1):
+                mrp_system = MultiSiteMRP(bom, table_size, sites, production, stock, planned_deliveries,
+                                          production_times, scalar_sites=scalar_sites)
+                mrp_system.calculate_mrp()
+                results.append({
+                    name: {row: values.tolist() for row, values in arrays.items()}
+                    for name, arrays in mrp_system.results.items()
+                })
+                self.assertEqual(mrp_system.transfers, [])
+            self.assertEqual(results[1], results[0])
+
+            # The site stock and production times never reach the BOM itself
+            self.assertEqual(BOMSnapshot.capture(bom), before)
+
+    def test_few_sites_with_lanes_transfer(self):
+        """ Sites connected by lanes are netted together even below the fallback threshold. """
+        bom = BOM()
+        table = Material(name="Table", stock=0, production_time=1)
+        legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=0, production_time=2, production_capacity=120)
+        table.add_child(legs)
+        bom.add_material(table)
+        bom.add_material(legs)
+        mrp_system = MultiSiteMRP(
+            bom, 6, ["Plant", "Warehouse"], {"Plant": [0, 0, 0, 10, 0, 0]},
+            stock={"Legs": {"Warehouse": 100}}, lanes=[TransferLane("Warehouse", "Plant", 1)],
+        )
+        mrp_system.calculate_mrp()
+        self.assertEqual(mrp_system.transfers, [("Legs", "Warehouse", "Plant", 1, 2, 40)])
+        self.assertEqual(mrp_system.results["Legs"]["planned_order"].tolist(), [[0] * 6, [0] * 6])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.ghp import GHP
+from src.mrp import MRP
+from src.net_change import InventoryTransaction, NetChangeMRP
+from src.snapshot import BOMSnapshot
+
+
+def build_plan(rng, table_size):
+    """ Return a random BOM and GHP; parents are created before their components. """
+    bom = BOM()
+    root = Material(name="m0", stock=rng.randint(0, 50), production_time=rng.randint(0, 3))
+    bom.add_material(root)
+    materials = [root]
+    for i in range(1, rng.randint(2, 12)):
+        parent = rng.choice(materials)
+        material = Material(
+            name=f"m{i}", parent=parent.name, quantity_needed=rng.randint(1, 4), stock=rng.randint(0, 150),
+            production_time=rng.randint(0, 3), production_capacity=rng.randint(1, 200),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+
+    ghp_system = GHP(bom)
+    production = [rng.choice([0, 0, 10, 25, 60]) for _ in range(table_size)]
+    ghp_system.calculate_ghp([0] * table_size, production, table_size)
+    return bom, ghp_system
+
+
+def random_transaction(rng, bom, table_size):
+    material = rng.choice([material for material in bom.materials if material.parent is not None])
+    kind = rng.choice(["receipt", "issue", "stock"])
+    delta = rng.randint(1, 120)
+    return InventoryTransaction(material.name, rng.randrange(table_size), -delta if kind == "issue" else delta, kind)
+
+
+class NetChangeTest(unittest.TestCase):
+    def test_matches_regeneration(self):
+        """ After every transaction the net-change tables equal a full recalculation. """
+        rng = random.Random(35)
+        for _ in range(200):
+            table_size = rng.randint(1, 16)
+            bom, ghp_system = build_plan(rng, table_size)
+            initial_stock = {material.name: material.stock for material in bom.materials}
+            stock = dict(initial_stock)
+            planned_deliveries = {}
+            net_change = NetChangeMRP(MRP(bom, ghp_system, table_size, {}))
+
+            for _ in range(rng.randint(1, 6)):
+                transaction = random_transaction(rng, bom, table_size)
+                net_change.apply(transaction)
+                if transaction.kind == "stock":
+                    stock[transaction.item] += transaction.delta
+                else:
+                    row = planned_deliveries.setdefault(transaction.item, [0] * table_size)
+                    row[transaction.period] += transaction.delta
+
+                # Regenerate from scratch with the stock and deliveries posted so far
+                regenerated_bom = BOMSnapshot.capture(bom).materialize()
+                for material in regenerated_bom.materials:
+                    material.stock = stock[material.name]
+                regenerated = MRP(
+                    regenerated_bom, ghp_system, table_size,
+                    {name: list(row) for name, row in planned_deliveries.items()},
+                )
+                regenerated.calculate_mrp()
+                for name, table in regenerated.mrp_tables.items():
+                    self.assertEqual(net_change.mrp_system.mrp_tables[name].rows(), table.rows(), (name, transaction))
+
+            # Stock transactions change only the netting copy of the BOM
+            self.assertEqual({material.name: material.stock for material in bom.materials}, initial_stock)
+
+    def test_stock_leaves_live_bom_unchanged(self):
+        rng = random.Random(36)
+        bom, ghp_system = build_plan(rng, 8)
+        stock = {material.name: material.stock for material in bom.materials}
+        net_change = NetChangeMRP(MRP(bom, ghp_system, 8, {}))
+        item = bom.materials[1].name
+
+        net_change.apply(InventoryTransaction(item, 0, 40, "stock"))
+        self.assertEqual({material.name: material.stock for material in bom.materials}, stock)
+        self.assertEqual(net_change.materials[item].stock, stock[item] + 40)
+
+    def test_apply_leaves_source_inputs_unchanged(self):
+        """ Transactions change neither the caller's deliveries nor the tables calculated before. """
+        rng = random.Random(37)
+        bom, ghp_system = build_plan(rng, 10)
+        item = bom.materials[1].name
+        planned_deliveries = {item: [0, 5, 0, 0, 0, 0, 0, 0, 0, 0]}
+        mrp_system = MRP(bom, ghp_system, 10, planned_deliveries)
+        mrp_system.calculate_mrp()
+        tables = dict(mrp_system.mrp_tables)
+        rows = {name: [list(row) for row in table.rows()] for name, table in tables.items()}
+
+        net_change = NetChangeMRP(mrp_system)
+        net_change.apply(InventoryTransaction(item, 2, 70, "receipt"))
+        net_change.apply(InventoryTransaction(item, 0, 30, "stock"))
+
+        self.assertEqual(planned_deliveries, {item: [0, 5, 0, 0, 0, 0, 0, 0, 0, 0]})
+        self.assertEqual(net_change.mrp_system.planned_delivery[item][2], 70)
+        for name, table in tables.items():
+            self.assertEqual([list(row) for row in table.rows()], rows[name], name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.buckets import BucketCalendar
+from src.orders import aggregate_orders
+
+LINES = [
+    "Table,0,3",
+    "Chair,1,7",
+    "Table,4,2",
+    "Table,4,5",
+    "Table,9,1",
+    "Table,-1,50",  # Outside the horizon
+    "Table,12,50",
+]
+
+
+class AggregateOrdersTest(unittest.TestCase):
+    def write(self, text):
+        """ Write an order file which is removed after the test; return its path. """
+        file = tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8")
+        with file:
+            file.write(text)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def aggregate(self, path, **kwargs):
+        """ Aggregate with every warning turned into an error. """
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            return aggregate_orders(path, **kwargs)
+
+    def test_header_is_skipped(self):
+        with_header = self.write("item,day,quantity\n" + "\n".join(LINES) + "\n")
+        without_header = self.write("\n".join(LINES) + "\n")
+        expected = [3, 7, 0, 0, 7, 0, 0, 0, 0, 1]
+        self.assertEqual(self.aggregate(with_header, table_size=10), expected)
+        self.assertEqual(self.aggregate(without_header, table_size=10), expected)
+        self.assertEqual(self.aggregate(with_header, table_size=10, item="Table"), [3, 0, 0, 0, 7, 0, 0, 0, 0, 1])
+
+    def test_empty_and_header_only_files(self):
+        for text in ("", "item,day,quantity\n", "item,day,quantity", "\n\n"):
+            path = self.write(text)
+            self.assertEqual(self.aggregate(path, table_size=3), [0, 0, 0], repr(text))
+            self.assertEqual(self.aggregate(path, table_size=3, item="Table"), [0, 0, 0], repr(text))
+
+    def test_chunk_boundaries(self):
+        """ Lines split across blocks, and blocks holding only the header, give the same demand. """
+        path = self.write("item,day,quantity\n" + "\n".join(LINES))  # No newline at the end
+        expected = self.aggregate(path, table_size=10)
+        for chunk_bytes in (1, 5, 18, 19, 20, 64):
+            self.assertEqual(self.aggregate(path, table_size=10, chunk_bytes=chunk_bytes), expected, chunk_bytes)
+            self.assertEqual(
+                self.aggregate(path, table_size=10, item="Table", chunk_bytes=chunk_bytes),
+                self.aggregate(path, table_size=10, item="Table"),
+                chunk_bytes,
+            )
+
+    def test_calendar_buckets(self):
+        # Buckets of 1, 3 and 6 days: days 0 | 1-3 | 4-9; day 12 lies beyond the horizon
+        calendar = BucketCalendar([1, 3, 6])
+        path = self.write("item,day,quantity\n" + "\n".join(LINES) + "\n")
+        self.assertEqual(self.aggregate(path, calendar=calendar), [3, 7, 8])
+        self.assertEqual(self.aggregate(path, calendar=calendar, item="Table", chunk_bytes=7), [3, 0, 8])
+
+    def test_table_size_or_calendar_required(self):
+        with self.assertRaises(ValueError):
+            aggregate_orders(self.write("Table,0,1\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.ghp import GHP
+from src.mrp import MRP, MRPTable
+from src.repository import PlanRepository
+
+
+def build_bom(rng, size):
+    bom = BOM()
+    root = Material(name="m0", stock=rng.randint(0, 30), production_time=rng.randint(0, 2))
+    bom.add_material(root)
+    materials = [root]
+    for i in range(1, size):
+        parent = rng.choice(materials)
+        material = Material(
+            name=f"m{i}", parent=parent.name, quantity_needed=rng.randint(1, 3), stock=rng.randint(0, 100),
+            production_time=rng.randint(0, 3), production_capacity=rng.randint(1, 150),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+    return bom
+
+
+def build_plan(rng, bom, table_size, planned_deliveries=None):
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp([0] * table_size, [rng.choice([0, 0, 10, 30]) for _ in range(table_size)], table_size)
+    mrp_system = MRP(bom, ghp_system, table_size, planned_deliveries or {})
+    mrp_system.calculate_mrp()
+    return mrp_system
+
+
+def subtree(material):
+    """ A material and its descendants, parents before children in depth-first order. """
+    yield material
+    for child in material.children:
+        yield from subtree(child)
+
+
+def describe(materials):
+    return [
+        (m.name, m.parent, m.quantity_needed, m.stock, m.production_time, m.production_capacity,
+         [child.name for child in m.children])
+        for m in materials
+    ]
+
+
+def tables_of(mrp_system):
+    return {name: table.rows() for name, table in mrp_system.mrp_tables.items()}
+
+
+class PlanRepositoryTest(unittest.TestCase):
+    def setUp(self):
+        self.repository = PlanRepository()
+
+    def tearDown(self):
+        self.repository.close()
+
+    def test_bom_round_trip(self):
+        rng = random.Random(42)
+        for _ in range(30):
+            bom = build_bom(rng, rng.randint(1, 12))
+            bom_id = self.repository.save_bom(bom)
+            self.assertEqual(describe(self.repository.load_bom(bom_id).materials), describe(subtree(bom.materials[0])))
+
+    def test_load_subtree(self):
+        """ Loading from a material gives exactly its descendants, in the saved order, rooted at level 0. """
+        rng = random.Random(43)
+        for _ in range(30):
+            bom = build_bom(rng, rng.randint(2, 12))
+            bom_id = self.repository.save_bom(bom)
+            root = rng.choice(bom.materials)
+            loaded = self.repository.load_bom(bom_id, root.name)
+
+            expected = [
+                (m.name, None if m is root else m.parent, 0 if m is root else m.quantity_needed, m.stock,
+                 m.production_time, m.production_capacity, [child.name for child in m.children])
+                for m in subtree(root)
+            ]
+            self.assertEqual(describe(loaded.materials), expected)
+
+        with self.assertRaises(ValueError):
+            self.repository.load_bom(bom_id, "missing")
+        with self.assertRaises(ValueError):
+            self.repository.load_bom(bom_id + 1)
+
+    def test_plan_round_trip(self):
+        rng = random.Random(44)
+        for _ in range(10):
+            table_size = rng.randint(1, 12)
+            mrp_system = build_plan(rng, build_bom(rng, rng.randint(2, 8)), table_size)
+            run_id = self.repository.save_plan(mrp_system, note="run")
+
+            loaded = self.repository.load_plan(run_id)
+            self.assertEqual(tables_of(loaded), tables_of(mrp_system))
+            self.assertEqual(loaded.ghp.get_tables(), mrp_system.ghp.get_tables())
+
+            # A window of periods of some materials
+            names = rng.sample(sorted(mrp_system.mrp_tables), rng.randint(1, len(mrp_system.mrp_tables)))
+            first = rng.randrange(table_size)
+            last = rng.randrange(first, table_size)
+            window = self.repository.load_tables(run_id, names, first, last)
+            self.assertEqual(sorted(window), sorted(names))
+            for name, table in window.items():
+                for measure in MRPTable.ROWS:
+                    self.assertEqual(
+                        getattr(table, measure), list(getattr(mrp_system.mrp_tables[name], measure)[first:last + 1])
+                    )
+
+    def test_diff_runs(self):
+        """ The diff lists exactly the cells which differ, with None for items missing from a run. """
+        rng = random.Random(45)
+        for _ in range(10):
+            table_size = rng.randint(1, 10)
+            bom = build_bom(rng, rng.randint(2, 8))
+            old = build_plan(rng, bom, table_size)
+            deliveries = {rng.choice(bom.materials).name: [rng.choice([0, 20]) for _ in range(table_size)]}
+            new = build_plan(rng, bom, table_size, deliveries)
+            old_run = self.repository.save_plan(old)
+            new_run = self.repository.save_plan(new)
+
+            expected = sorted(
+                (name, t, measure, getattr(old.mrp_tables[name], measure)[t], getattr(new.mrp_tables[name], measure)[t])
+                for name in new.mrp_tables
+                for measure in MRPTable.ROWS
+                for t in range(table_size)
+                if getattr(old.mrp_tables[name], measure)[t] != getattr(new.mrp_tables[name], measure)[t]
+            )
+            self.assertEqual(sorted(self.repository.diff_runs(old_run, new_run)), expected)
+            self.assertEqual(self.repository.diff_runs(new_run, new_run), [])
+
+        # An item in the old run only: its non-NULL cells are reported against None
+        small_bom = build_bom(rng, 1)
+        small_run = self.repository.save_plan(build_plan(rng, small_bom, table_size))
+        changes = self.repository.diff_runs(new_run, small_run)
+        removed = [change for change in changes if change[0] != "m0"]
+        self.assertTrue(removed)
+        self.assertTrue(all(change[4] is None for change in removed))
+
+    def test_fingerprint_dedupe(self):
+        """ Saving a plan without a BOM id reuses the saved version with the same content. """
+        rng = random.Random(46)
+        bom = build_bom(rng, 6)
+        self.assertIsNone(self.repository.find_bom(bom))
+        first_run = self.repository.save_plan(build_plan(rng, bom, 6))
+        bom_id = self.repository.find_bom(bom)
+        self.assertIsNotNone(bom_id)
+
+        second_run = self.repository.save_plan(build_plan(rng, bom, 6))
+        runs = {run[0]: run[1] for run in self.repository.list_runs()}
+        self.assertEqual(runs[first_run], bom_id)
+        self.assertEqual(runs[second_run], bom_id)
+        self.assertEqual(self.repository.connection.execute("SELECT COUNT(*) FROM boms").fetchone()[0], 1)
+
+        # A changed BOM is a new version; the latest version of the same content is found
+        bom.materials[-1].stock += 1
+        self.assertIsNone(self.repository.find_bom(bom))
+        changed_run = self.repository.save_plan(build_plan(rng, bom, 6))
+        self.assertNotEqual(dict((run[0], run[1]) for run in self.repository.list_runs())[changed_run], bom_id)
+        newer_id = self.repository.save_bom(bom)
+        self.assertEqual(self.repository.find_bom(bom), newer_id)
+        self.assertEqual([run[0] for run in self.repository.list_runs(bom_id)], [second_run, first_run])
+
+
+if __name__ == "__main__":
+    unittest.main()
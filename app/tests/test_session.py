@@ -0,0 +1,117 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.ghp import GHP
+from src.mrp import MRP
+from src.session import PlanningSession, estimate_table_bytes
+
+
+def build_bom(rng):
+    """ Return a random BOM; parents are created before their components. """
+    bom = BOM()
+    root = Material(name="m0", stock=rng.randint(0, 50), production_time=rng.randint(0, 3))
+    bom.add_material(root)
+    materials = [root]
+    for i in range(1, rng.randint(2, 10)):
+        parent = rng.choice(materials)
+        material = Material(
+            name=f"m{i}", parent=parent.name, quantity_needed=rng.randint(1, 4), stock=rng.randint(0, 150),
+            production_time=rng.randint(0, 3), production_capacity=rng.randint(1, 200),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+    return bom
+
+
+def calculate(bom, production, planned_deliveries):
+    """ Return the MRP tables of a plain calculation, without a session. """
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp([0] * len(production), production, len(production))
+    mrp_system = MRP(bom, ghp_system, len(production), planned_deliveries)
+    mrp_system.calculate_mrp()
+    return mrp_system.mrp_tables
+
+
+class PlanningSessionTest(unittest.TestCase):
+    def test_matches_plain_calculation(self):
+        """ Cached tables equal a plain calculation, however the inputs change between plans. """
+        rng = random.Random(31)
+        session = PlanningSession()
+        for _ in range(50):
+            bom = build_bom(rng)
+            table_size = rng.randint(1, 12)
+            for _ in range(4):
+                production = [rng.choice([0, 0, 15, 40]) for _ in range(table_size)]
+                material = rng.choice(bom.materials[1:])
+                planned_deliveries = {material.name: [rng.choice([0, 0, 30]) for _ in range(table_size)]}
+                mrp_system = session.create_plan(bom, [0] * table_size, production, table_size, planned_deliveries)
+                expected = calculate(bom, production, planned_deliveries)
+                self.assertEqual(
+                    {name: table.rows() for name, table in mrp_system.mrp_tables.items()},
+                    {name: table.rows() for name, table in expected.items()},
+                )
+
+    def test_changed_delivery_reuses_other_tables(self):
+        table = Material(name="Table", stock=2, production_time=1)
+        countertop = Material(name="Countertop", parent="Table", quantity_needed=1, stock=22, production_time=3, production_capacity=40)
+        legs = Material(name="Legs", parent="Table", quantity_needed=4, stock=40, production_time=2, production_capacity=120)
+        table.add_child(countertop)
+        table.add_child(legs)
+        bom = BOM()
+        for material in (table, countertop, legs):
+            bom.add_material(material)
+        demand = [0, 0, 0, 0, 20, 0, 40, 0, 0, 0]
+        production = [0, 0, 0, 0, 28, 0, 30, 0, 0, 0]
+
+        session = PlanningSession()
+        first = session.create_plan(bom, demand, production, 10, {})
+        self.assertEqual((session.plan_hits, session.table_hits, session.misses), (0, 0, 2))
+
+        # Only the Legs table depends on its planned delivery
+        second = session.create_plan(bom, demand, production, 10, {"Legs": [0, 0, 0, 50, 0, 0, 0, 0, 0, 0]})
+        self.assertEqual((session.plan_hits, session.table_hits, session.misses), (0, 1, 3))
+        self.assertIs(second.mrp_tables["Countertop"], first.mrp_tables["Countertop"])
+        self.assertIsNot(second.mrp_tables["Legs"], first.mrp_tables["Legs"])
+
+        # Reverted inputs are answered from the plan cache
+        third = session.create_plan(bom, demand, production, 10, {})
+        self.assertEqual(session.plan_hits, 1)
+        self.assertIs(third.mrp_tables["Legs"], first.mrp_tables["Legs"])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        rng = random.Random(32)
+        bom = build_bom(rng)
+        plans = [[rng.randint(1, 60) for _ in range(8)] for _ in range(6)]
+
+        # Room for about two plans with their tables
+        tables = calculate(bom, plans[0], {})
+        plan_bytes = sum(estimate_table_bytes(table) for table in tables.values())
+        session = PlanningSession(max_bytes=4 * plan_bytes + 1)
+
+        for production in plans:
+            session.create_plan(bom, [0] * 8, production, 8, {})
+            self.assertLessEqual(session.cache_bytes, session.max_bytes)
+            self.assertEqual(session.cache_bytes, sum(size for _, size in session.cache.values()))
+
+        # The latest plan is still cached, the first one was evicted
+        session.create_plan(bom, [0] * 8, plans[-1], 8, {})
+        self.assertEqual(session.plan_hits, 1)
+        session.create_plan(bom, [0] * 8, plans[0], 8, {})
+        self.assertEqual(session.plan_hits, 1)
+
+    def test_entries_larger_than_the_bound_are_not_cached(self):
+        rng = random.Random(33)
+        bom = build_bom(rng)
+        session = PlanningSession(max_bytes=10)
+        session.create_plan(bom, [0] * 8, [20] * 8, 8, {})
+        self.assertEqual((len(session.cache), session.cache_bytes), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
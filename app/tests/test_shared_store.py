@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.ghp import GHP
+from src.mrp import MRP, MRPTable
+from src.shared_store import SharedPlanView, unlink_shared_plan, write_shared_plan
+
+
+def build_plan(rng, size, table_size):
+    bom = BOM()
+    root = Material(name="m0", stock=rng.randint(0, 30), production_time=rng.randint(0, 2))
+    bom.add_material(root)
+    materials = [root]
+    for i in range(1, size):
+        parent = rng.choice(materials)
+        material = Material(
+            name=f"m{i}", parent=parent.name, quantity_needed=rng.randint(1, 3), stock=rng.randint(0, 100),
+            production_time=rng.randint(0, 3), production_capacity=rng.randint(1, 150),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+    ghp_system = GHP(bom)
+    ghp_system.calculate_ghp([0] * table_size, [rng.choice([0, 10, 30]) for _ in range(table_size)], table_size)
+    mrp_system = MRP(bom, ghp_system, table_size, {})
+    mrp_system.calculate_mrp()
+    return mrp_system
+
+
+class SharedPlanViewTest(unittest.TestCase):
+    def test_diff_against_list_tables(self):
+        """ Shared tables compare by value with ordinary ones, in both directions. """
+        rng = random.Random(34)
+        for _ in range(10):
+            table_size = rng.randint(1, 12)
+            mrp_system = build_plan(rng, rng.randint(2, 8), table_size)
+            shm = write_shared_plan(mrp_system.mrp_tables, table_size)
+            try:
+                view = SharedPlanView(shm.name)
+                self.assertEqual(MRP.diff_tables(view.mrp_tables, mrp_system.mrp_tables), {})
+                self.assertEqual(MRP.diff_tables(mrp_system.mrp_tables, view.mrp_tables), {})
+
+                # One changed cell is the only change found
+                name = rng.choice(sorted(mrp_system.mrp_tables))
+                row = rng.randrange(len(MRPTable.ROWS))
+                period = rng.randrange(table_size)
+                changed = mrp_system.mrp_tables[name]
+                values = list(getattr(changed, MRPTable.ROWS[row]))
+                values[period] += 1
+                setattr(changed, MRPTable.ROWS[row], values)
+                self.assertEqual(MRP.diff_tables(view.mrp_tables, mrp_system.mrp_tables), {name: [(row, period)]})
+                view.close()
+            finally:
+                shm.close()
+                unlink_shared_plan(shm.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.mrp import CalculationCancelled
+from src.solver import ProductionSolver, missing_unit_periods
+from gui.planning_worker import PlanningWorker
+
+try:
+    from gui.main_window import MainWindow
+except ImportError:
+    MainWindow = None
+
+
+def build_bom(rng, size):
+    bom = BOM()
+    root = Material(name="m0", stock=rng.randint(0, 30), production_time=rng.randint(0, 2))
+    bom.add_material(root)
+    materials = [root]
+    for i in range(1, size):
+        parent = rng.choice(materials)
+        material = Material(
+            name=f"m{i}", parent=parent.name, quantity_needed=rng.randint(1, 3), stock=rng.randint(0, 100),
+            production_time=rng.randint(0, 3), production_capacity=rng.randint(1, 150),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+    return bom
+
+
+class FakeWidget:
+    """ Collects after() callbacks, which the test runs in place of the Tk main loop. """
+
+    def __init__(self):
+        self.callbacks = {}
+        self.next_id = 0
+
+    def after(self, ms, callback):
+        self.next_id += 1
+        self.callbacks[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def run(self, worker):
+        """ Run the callbacks until the worker is idle. """
+        for _ in range(10000):
+            if not self.callbacks:
+                return
+            callback_id = min(self.callbacks)
+            self.callbacks.pop(callback_id)()
+            if not worker.is_busy():
+                return
+            worker.thread.join(0.001)
+        raise AssertionError("The worker did not finish.")
+
+
+class ProductionSolverTest(unittest.TestCase):
+    def test_result_matches_its_tables(self):
+        """ The reported shortage and totals are those of the returned GHP and MRP tables. """
+        rng = random.Random(46)
+        for _ in range(20):
+            table_size = rng.randint(4, 12)
+            bom = build_bom(rng, rng.randint(1, 6))
+            demand = [rng.choice([0, 0, 10, 30]) for _ in range(table_size)]
+            solver = ProductionSolver(bom, demand, table_size, max_iterations=20)
+            result = solver.solve()
+
+            ghp_tables = result.mrp_system.ghp.get_tables()
+            self.assertEqual(ghp_tables["production"], result.production)
+            shortage = missing_unit_periods(ghp_tables["availability"]) + sum(
+                missing_unit_periods(table.available) for table in result.mrp_system.mrp_tables.values()
+            )
+            self.assertEqual(result.shortage, shortage)
+            self.assertEqual(result.feasible, shortage == 0)
+            self.assertEqual(result.total_production, sum(result.production))
+            self.assertEqual(result.inventory, sum(value for value in ghp_tables["availability"] if value > 0))
+
+            # The search never ends worse than lot-for-lot
+            lot_for_lot = ProductionSolver(bom, demand, table_size, max_iterations=0, levelling=False).solve()
+            self.assertLessEqual(
+                (result.shortage, result.total_production, result.inventory),
+                (lot_for_lot.shortage, lot_for_lot.total_production, lot_for_lot.inventory),
+            )
+
+    def test_finds_feasible_plan(self):
+        """ A component with a long production time needs the production moved earlier. """
+        bom = BOM()
+        product = Material(name="Product", stock=0, production_time=1)
+        part = Material(name="Part", parent="Product", quantity_needed=1, stock=10, production_time=3,
+                        production_capacity=20)
+        product.add_child(part)
+        bom.add_material(product)
+        bom.add_material(part)
+        demand = [0, 0, 0, 0, 0, 0, 0, 20, 0, 20]
+
+        lot_for_lot = ProductionSolver(bom, demand, 10, max_iterations=0, levelling=False).solve()
+        result = ProductionSolver(bom, demand, 10).solve()
+        self.assertTrue(result.feasible)
+        self.assertEqual(result.total_production, lot_for_lot.total_production)
+        self.assertTrue(all(value >= 0 for value in result.mrp_system.mrp_tables["Part"].available))
+
+    def test_cancelled(self):
+        rng = random.Random(47)
+        bom = build_bom(rng, 5)
+        with self.assertRaises(CalculationCancelled):
+            ProductionSolver(bom, [10] * 8, 8).solve(is_cancelled=lambda: True)
+
+
+@unittest.skipIf(MainWindow is None, "ttkbootstrap is not installed")
+class ApplySolutionTest(unittest.TestCase):
+    class Window:
+        """ The parts of MainWindow which apply_solution uses. """
+
+        def __init__(self, inputs, production):
+            self.inputs = inputs
+            self.messages = []
+            self.shown = []
+            self.values = []
+            self.ghp_system = self
+            self.ghp_gui = self
+            self.history = self
+            self.production = production
+
+        def solver_inputs(self):
+            return self.inputs
+
+        def show_status(self, message):
+            self.messages.append(message)
+
+        def show_mrp(self, mrp_system, table_size):
+            self.shown.append((mrp_system, table_size))
+
+        def get_production(self):
+            return self.production
+
+        def set_value(self, row, period, value):
+            self.values.append((row, period, value))
+
+        def current(self):
+            return None
+
+    def solve(self):
+        bom = BOM()
+        bom.add_material(Material(name="Product", stock=0, production_time=1))
+        return ProductionSolver(bom, [0, 0, 10, 0], 4).solve()
+
+    def test_discarded_after_edit(self):
+        result = self.solve()
+        inputs = ([0, 0, 10, 0], [0, 0, 0, 0], {}, None, None)
+        window = self.Window(([0, 0, 15, 0], [0, 0, 0, 0], {}, None, None), [0, 0, 0, 0])
+        MainWindow.apply_solution(window, result, 4, inputs)
+        self.assertEqual(window.values, [])
+        self.assertEqual(window.shown, [])
+        self.assertEqual(len(window.messages), 1)
+        self.assertIn("discarded", window.messages[0])
+
+    def test_applied_without_edit(self):
+        result = self.solve()
+        inputs = ([0, 0, 10, 0], [0, 0, 0, 0], {}, None, None)
+        window = self.Window(inputs, [0, 0, 0, 0])
+        MainWindow.apply_solution(window, result, 4, inputs)
+        self.assertEqual(
+            window.values, [("production", t, value) for t, value in enumerate(result.production) if value]
+        )
+        self.assertEqual(window.shown, [(result.mrp_system, 4)])
+        self.assertNotIn("discarded", window.messages[-1])
+
+
+class PlanningWorkerTest(unittest.TestCase):
+    def test_superseded_job_is_cancelled(self):
+        widget = FakeWidget()
+        worker = PlanningWorker(widget)
+        events = []
+        worker.submit(lambda is_cancelled: 1, lambda result: events.append(("done", 1)),
+                      on_cancel=lambda: events.append("cancelled 1"))
+        worker.submit(lambda is_cancelled: 2, lambda result: events.append(("done", result)),
+                      on_cancel=lambda: events.append("cancelled 2"))
+        widget.run(worker)
+        self.assertEqual(events, ["cancelled 1", ("done", 2)])
+
+        # A finished job is not told about later submissions
+        worker.submit(lambda is_cancelled: 3, lambda result: events.append(("done", result)), debounce=False)
+        widget.run(worker)
+        self.assertEqual(events, ["cancelled 1", ("done", 2), ("done", 3)])
+
+    def test_cancel(self):
+        widget = FakeWidget()
+        worker = PlanningWorker(widget)
+        events = []
+        worker.submit(lambda is_cancelled: 1, lambda result: events.append("done"), debounce=False,
+                      on_cancel=lambda: events.append("cancelled"))
+        worker.cancel()
+        worker.cancel()
+        widget.run(worker)
+        self.assertEqual(events, ["cancelled"])
+        self.assertFalse(worker.is_busy())
+
+
+if __name__ == "__main__":
+    unittest.main()
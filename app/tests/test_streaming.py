@@ -0,0 +1,94 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.bom import BOM, Material
+from src.ghp import GHP
+from src.mrp import MRP, CalculationCancelled
+from src.streaming import JsonLinesSink, read_tables
+
+
+def build_plan(rng, table_size):
+    """ Return a random BOM, its material levels and a GHP; parents are created before their components. """
+    bom = BOM()
+    root = Material(name="m0", stock=rng.randint(0, 50), production_time=rng.randint(0, 3))
+    bom.add_material(root)
+    materials = [root]
+    levels = {"m0": 0}
+    for i in range(1, rng.randint(2, 14)):
+        parent = rng.choice(materials)
+        material = Material(
+            name=f"m{i}", parent=parent.name, quantity_needed=rng.randint(1, 4), stock=rng.randint(0, 150),
+            production_time=rng.randint(0, 3), production_capacity=rng.randint(1, 200),
+        )
+        parent.add_child(material)
+        bom.add_material(material)
+        materials.append(material)
+        levels[material.name] = levels[parent.name] + 1
+
+    ghp_system = GHP(bom)
+    production = [rng.choice([0, 0, 10, 25, 60]) for _ in range(table_size)]
+    ghp_system.calculate_ghp([0] * table_size, production, table_size)
+    return bom, levels, ghp_system
+
+
+class StreamingTest(unittest.TestCase):
+    def setUp(self):
+        file = tempfile.NamedTemporaryFile(suffix=".jsonl", delete=False)
+        file.close()
+        self.path = file.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_round_trip_matches_calculate_mrp(self):
+        rng = random.Random(36)
+        for _ in range(100):
+            table_size = rng.randint(1, 16)
+            bom, levels, ghp_system = build_plan(rng, table_size)
+            deliveries = {bom.materials[-1].name: [rng.choice([0, 0, 40]) for _ in range(table_size)]}
+
+            streamed = MRP(bom, ghp_system, table_size, deliveries)
+            with JsonLinesSink(self.path) as sink:
+                count = streamed.calculate_mrp_streaming(sink)
+            self.assertEqual(streamed.mrp_tables, {})  # Nothing is kept in memory
+            self.assertEqual(count, sink.count)
+            self.assertEqual(count, len(bom.materials) - 1)
+
+            calculated = MRP(bom, ghp_system, table_size, deliveries)
+            calculated.calculate_mrp()
+            tables = list(read_tables(self.path))
+            self.assertEqual(
+                {table.material_name: table.rows() for table in tables},
+                {name: table.rows() for name, table in calculated.mrp_tables.items()},
+            )
+
+            # Tables are written level by level
+            written_levels = [levels[table.material_name] for table in tables]
+            self.assertEqual(written_levels, sorted(written_levels))
+
+    def test_read_selected_tables(self):
+        bom, _, ghp_system = build_plan(random.Random(37), 10)
+        with JsonLinesSink(self.path) as sink:
+            MRP(bom, ghp_system, 10, {}).calculate_mrp_streaming(sink)
+        wanted = {bom.materials[1].name, "missing"}
+        self.assertEqual([table.material_name for table in read_tables(self.path, wanted)], [bom.materials[1].name])
+
+    def test_cancelled(self):
+        bom, _, ghp_system = build_plan(random.Random(38), 10)
+        with JsonLinesSink(self.path) as sink:
+            with self.assertRaises(CalculationCancelled):
+                MRP(bom, ghp_system, 10, {}).calculate_mrp_streaming(sink, is_cancelled=lambda: True)
+        self.assertEqual(sink.count, 0)
+
+    def test_bom_without_level_0_material(self):
+        bom = BOM()
+        ghp_system = GHP(bom)
+        with JsonLinesSink(self.path) as sink:
+            self.assertEqual(MRP(bom, ghp_system, 5, {}).calculate_mrp_streaming(sink), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()